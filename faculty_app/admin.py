@@ -1,16 +1,23 @@
+import time
+
+from django.conf import settings
 from django.contrib import admin, messages
-from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from django.db import transaction
+from .deletion import deactivate_users
+from .jobs import enqueue_job
 from .models import (
     Attendance,
     AttendanceSession,
+    BackgroundJob,
     ClassRoom,
     MasterFaculty,
+    OutboundEmail,
     RollingQRToken,
     Section,
     Teacher,
+    TimetableSlot,
 )
+from .provisioning import DEFAULT_ACCOUNT_PASSWORD, provision_students, provision_teachers, section_shortfalls
 
 
 @admin.register(MasterFaculty)
@@ -35,38 +42,13 @@ class MasterFacultyAdmin(admin.ModelAdmin):
 
     @admin.action(description="Create teacher accounts for selected faculty")
     def create_teacher_accounts(self, request, queryset):
-        created = 0
-        skipped = 0
-        default_password = "Pass@123"
-        password_hash = make_password(default_password)
-
-        for master in queryset:
-            teacher_exists = Teacher.objects.filter(enrollment_id=master.enrollment_id).exists()
-            if teacher_exists:
-                skipped += 1
-                continue
-
-            user, _ = User.objects.update_or_create(
-                username=master.enrollment_id,
-                defaults={
-                    "email": master.email,
-                    "password": password_hash,
-                },
-            )
-            Teacher.objects.create(
-                user=user,
-                name=master.name,
-                enrollment_id=master.enrollment_id,
-                department=master.department,
-                designation=master.designation,
-                mail_verified=True,
-                is_registered=True,
-            )
-            created += 1
-
+        started = time.perf_counter()
+        created, skipped = provision_teachers(queryset)
+        elapsed = time.perf_counter() - started
         self.message_user(
             request,
-            f"Teacher accounts created: {created}, skipped(existing): {skipped}. Default password: {default_password}",
+            f"Teacher accounts created: {created}, skipped(existing): {skipped} in {elapsed:.2f}s. "
+            f"Default password: {DEFAULT_ACCOUNT_PASSWORD}",
             level=messages.SUCCESS,
         )
 
@@ -86,11 +68,19 @@ class TeacherAdmin(admin.ModelAdmin):
     @admin.action(description="Delete selected teachers and linked user accounts")
     def delete_teachers_with_user_accounts(self, request, queryset):
         ids = list(queryset.values_list("id", flat=True))
-        users = list(queryset.values_list("user_id", flat=True))
-        ClassRoom.objects.filter(teacher_id__in=ids).delete()
-        Teacher.objects.filter(id__in=ids).delete()
-        User.objects.filter(id__in=users).delete()
-        self.message_user(request, f"Deleted {len(ids)} teachers and linked user accounts.", level=messages.SUCCESS)
+        # Cascading through classes/sessions/attendance can take long: lock the accounts now,
+        # remove the rows in short batches from the job worker.
+        user_ids = list(queryset.values_list("user_id", flat=True))
+        deactivate_users(user_ids)
+        job = enqueue_job(
+            BackgroundJob.KIND_DELETE_TEACHERS, {"teacher_ids": ids, "user_ids": user_ids}, requested_by=request.user
+        )
+        self.message_user(
+            request,
+            f"Accounts of {len(ids)} teachers disabled; background job #{job.id} deletes them "
+            f"with their classes and attendance (see Background jobs for progress).",
+            level=messages.SUCCESS,
+        )
 
     def delete_model(self, request, obj):
         user_id = obj.user_id
@@ -111,48 +101,52 @@ class SectionAdmin(admin.ModelAdmin):
     actions = ("create_students_up_to_strength",)
 
     @admin.action(description="Insert students up to expected strength (per selected section)")
-    @transaction.atomic
     def create_students_up_to_strength(self, request, queryset):
-        from student_app.models import Student
-
-        default_password = "Pass@123"
-        password_hash = make_password(default_password)
-        max_roll = Student.objects.order_by("-roll").values_list("roll", flat=True).first() or 2300000
-        created_total = 0
-
-        for section in queryset:
-            current = Student.objects.filter(section=section).count()
-            needed = max(section.expected_strength - current, 0)
-            for idx in range(1, needed + 1):
-                max_roll += 1
-                roll = max_roll
-                username = str(roll)
-                email = f"{roll}@kiit.ac.in"
-                student_name = f"Student {section.code}-{current + idx:02d}"
-
-                user = User.objects.create(username=username, email=email, password=password_hash)
-                Student.objects.create(
-                    user=user,
-                    name=student_name,
-                    roll=roll,
-                    section=section,
-                    mail_verified=True,
-                    face_verified=False,
-                )
-                created_total += 1
+        section_ids = list(queryset.values_list("id", flat=True))
+        needed = sum(shortfall for _, _, shortfall in section_shortfalls(section_ids))
+        if needed > getattr(settings, "PROVISIONING_INLINE_LIMIT", 2000):
+            # Too large for one admin request: let the job worker insert it with progress.
+            job = enqueue_job(
+                BackgroundJob.KIND_PROVISION_STUDENTS,
+                {"section_ids": section_ids},
+                requested_by=request.user,
+            )
+            self.message_user(
+                request,
+                f"Queued background job #{job.id} to insert {needed} students (see Background jobs for progress). "
+                f"Default password: {DEFAULT_ACCOUNT_PASSWORD}",
+                level=messages.SUCCESS,
+            )
+            return
 
+        started = time.perf_counter()
+        created_total = provision_students(section_ids)
+        elapsed = time.perf_counter() - started
         self.message_user(
             request,
-            f"Inserted {created_total} students. Default password: {default_password}",
+            f"Inserted {created_total} students in {elapsed:.2f}s. Default password: {DEFAULT_ACCOUNT_PASSWORD}",
             level=messages.SUCCESS,
         )
 
 
+class TimetableSlotInline(admin.TabularInline):
+    model = TimetableSlot
+    extra = 0
+
+
 @admin.register(ClassRoom)
 class ClassRoomAdmin(admin.ModelAdmin):
     list_display = ("subject_name", "section", "teacher", "start_time", "end_time", "is_active")
     search_fields = ("subject_name", "section__code", "teacher__name", "teacher__enrollment_id")
     list_filter = ("section", "is_active")
+    inlines = (TimetableSlotInline,)
+
+
+@admin.register(TimetableSlot)
+class TimetableSlotAdmin(admin.ModelAdmin):
+    list_display = ("classroom", "weekday", "start_time", "end_time", "is_active")
+    search_fields = ("classroom__subject_name", "classroom__section__code")
+    list_filter = ("weekday", "is_active")
 
 
 @admin.register(AttendanceSession)
@@ -174,3 +168,22 @@ class AttendanceAdmin(admin.ModelAdmin):
     list_display = ("session", "student", "status", "qr_scanned_at", "face_checked_at", "marked_at")
     search_fields = ("student__roll", "student__name", "session__id")
     list_filter = ("status",)
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "progress", "requested_by", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = (
+        "progress", "message", "error", "result_file", "started_at", "finished_at", "lease_until", "attempts"
+    )
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("id", "to_email", "subject", "status", "attempts", "latency_ms", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("to_email",)
+    # Bodies carry OTPs: keep them out of the admin.
+    exclude = ("body",)
+    readonly_fields = ("attempts", "last_error", "sent_at", "latency_ms")
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class FacultyConfig(AppConfig):
     name = 'faculty_app'
+
+    def ready(self):
+        # Register signal receivers (cache invalidation).
+        from . import signals  # noqa: F401
@@ -0,0 +1,434 @@
+"""
+Cold storage for past semesters
+Old sessions with their attendance rows are moved out of the live tables into one uncompressed,
+column-oriented NumPy archive (.npz) per semester, then deleted in batches. Range exports and
+report jobs read archived semesters next to the live tables. Members are stored, not deflated,
+so readers memory-map the columns and only touch the pages of the rows they index.
+
+Archive layout (every entry is one column array):
+- `meta`: JSON string (format version, semester, date span, row counts, status vocabulary)
+- `session_*`: one row per session, sorted by (classroom_id, started_at)
+- `index_classroom_id` / `index_offsets`: embedded index; sessions of index_classroom_id[i] are
+  rows index_offsets[i]:index_offsets[i + 1]
+- `session_attendance_offsets`: attendance rows of session row j are
+  session_attendance_offsets[j]:session_attendance_offsets[j + 1]
+- `attendance_*`: one row per attendance record, grouped by session in session order
+"""
+import json
+import os
+import struct
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+
+from .deletion import delete_in_batches
+from .models import Attendance, AttendanceSession, RollingQRToken
+
+FORMAT_VERSION = 1
+STATUSES = [value for value, _label in Attendance.STATUS_CHOICES]
+_STATUS_CODES = {value: code for code, value in enumerate(STATUSES)}
+
+SESSION_COLUMNS = ("id", "classroom_id", "teacher_id", "session_date", "started_at", "ended_at", "qr_validity_seconds")
+ATTENDANCE_COLUMNS = (
+    "session_id", "student_id", "status", "qr_scanned_at", "face_checked_at", "marked_at", "face_score"
+)
+_NAT = np.datetime64("NaT", "us")
+
+
+def _archive_dir():
+    return Path(getattr(settings, "ATTENDANCE_ARCHIVE_ROOT", settings.BASE_DIR / "attendance_archive"))
+
+
+def archive_root():
+    """Directory holding the semester archives (created on demand)."""
+    root = _archive_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def semester_bounds(day):
+    """(first day, last day, key) of the semester containing `day`: Jan-Jun is S1, Jul-Dec is S2."""
+    if day.month <= 6:
+        return date(day.year, 1, 1), date(day.year, 6, 30), f"{day.year}-S1"
+    return date(day.year, 7, 1), date(day.year, 12, 31), f"{day.year}-S2"
+
+
+def semesters_between(first_day, last_day):
+    """Semester bounds covering [first_day, last_day], oldest first."""
+    day = first_day
+    while day <= last_day:
+        start, end, key = semester_bounds(day)
+        yield start, end, key
+        day = end + timedelta(days=1)
+
+
+def archive_path(key):
+    return archive_root() / f"attendance-{key}.npz"
+
+
+def _to_us(value):
+    """Aware datetime -> numpy datetime64[us] in UTC (NaT for None)."""
+    if value is None:
+        return _NAT
+    return np.datetime64(value.astimezone(dt_timezone.utc).replace(tzinfo=None), "us")
+
+
+def _from_us(value):
+    """numpy datetime64[us] (UTC) -> aware datetime, None for NaT."""
+    if np.isnat(value):
+        return None
+    return value.astype(datetime).replace(tzinfo=dt_timezone.utc)
+
+
+def _empty_columns():
+    return {
+        "session": {
+            "id": np.empty(0, np.int64),
+            "classroom_id": np.empty(0, np.int64),
+            "teacher_id": np.empty(0, np.int64),
+            "session_date": np.empty(0, "datetime64[D]"),
+            "started_at": np.empty(0, "datetime64[us]"),
+            "ended_at": np.empty(0, "datetime64[us]"),
+            "qr_validity_seconds": np.empty(0, np.int32),
+            "token_count": np.empty(0, np.int32),
+        },
+        "attendance": {
+            "session_id": np.empty(0, np.int64),
+            "student_id": np.empty(0, np.int64),
+            "status": np.empty(0, np.uint8),
+            "qr_scanned_at": np.empty(0, "datetime64[us]"),
+            "face_checked_at": np.empty(0, "datetime64[us]"),
+            "marked_at": np.empty(0, "datetime64[us]"),
+            "face_score": np.empty(0, np.float32),
+        },
+    }
+
+
+def open_arrays(path):
+    """
+    {name: array} for every member of an archive, memory-mapped instead of read.
+    np.load ignores mmap_mode for .npz files, so stored members are located inside the zip and
+    mapped directly. Deflated members (archives written by savez_compressed), scalars and empty
+    arrays are read eagerly.
+    """
+    arrays = {}
+    raw = None
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as handle:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if info.compress_type == zipfile.ZIP_STORED:
+                # Local file header: 30 fixed bytes, then the file name and extra field.
+                handle.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack("<HH", handle.read(4))
+                handle.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(handle)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+                if shape and 0 not in shape and not dtype.hasobject:
+                    if raw is None:
+                        raw = np.memmap(path, np.uint8, mode="r")
+                    start = handle.tell()
+                    size = int(np.prod(shape)) * dtype.itemsize
+                    arrays[name] = raw[start:start + size].view(dtype).reshape(
+                        shape, order="F" if fortran_order else "C"
+                    )
+                    continue
+            with archive.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member)
+    return arrays
+
+
+def read_columns(path):
+    """Load an archive back into {'session': {...}, 'attendance': {...}} column dicts."""
+    columns = _empty_columns()
+    with np.load(path) as data:
+        for table, table_columns in columns.items():
+            for name in table_columns:
+                table_columns[name] = data[f"{table}_{name}"]
+    return columns
+
+
+def collect_columns(session_qs, chunk_size=5000):
+    """Read sessions (with token counts) and their attendance rows from the live tables as columns."""
+    columns = _empty_columns()
+    sessions = list(session_qs.order_by().values_list(*SESSION_COLUMNS))
+    if not sessions:
+        return columns
+    session_ids = [row[0] for row in sessions]
+    token_counts = dict(
+        RollingQRToken.objects.filter(session__in=session_qs)
+        .order_by()
+        .values("session_id")
+        .annotate(count=Count("id"))
+        .values_list("session_id", "count")
+    )
+
+    session = columns["session"]
+    session["id"] = np.array(session_ids, np.int64)
+    session["classroom_id"] = np.array([row[1] for row in sessions], np.int64)
+    session["teacher_id"] = np.array([row[2] for row in sessions], np.int64)
+    session["session_date"] = np.array([row[3] for row in sessions], "datetime64[D]")
+    session["started_at"] = np.array([_to_us(row[4]) for row in sessions], "datetime64[us]")
+    session["ended_at"] = np.array([_to_us(row[5]) for row in sessions], "datetime64[us]")
+    session["qr_validity_seconds"] = np.array([row[6] for row in sessions], np.int32)
+    session["token_count"] = np.array([token_counts.get(session_id, 0) for session_id in session_ids], np.int32)
+
+    # Attendance can be large: convert chunk by chunk instead of holding all rows as tuples.
+    parts = {name: [] for name in ATTENDANCE_COLUMNS}
+    rows = Attendance.objects.filter(session__in=session_qs).order_by().values_list(*ATTENDANCE_COLUMNS)
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _append_attendance(parts, chunk)
+            chunk = []
+    if chunk:
+        _append_attendance(parts, chunk)
+    for name, arrays in parts.items():
+        if arrays:
+            columns["attendance"][name] = np.concatenate(arrays)
+    return columns
+
+
+def _append_attendance(parts, rows):
+    parts["session_id"].append(np.array([row[0] for row in rows], np.int64))
+    parts["student_id"].append(np.array([row[1] for row in rows], np.int64))
+    parts["status"].append(np.array([_STATUS_CODES[row[2]] for row in rows], np.uint8))
+    for position, name in ((3, "qr_scanned_at"), (4, "face_checked_at"), (5, "marked_at")):
+        parts[name].append(np.array([_to_us(row[position]) for row in rows], "datetime64[us]"))
+    parts["face_score"].append(np.array([np.nan if row[6] is None else row[6] for row in rows], np.float32))
+
+
+def merge_columns(old, new):
+    """
+    Combine an existing archive with newly collected rows. Sessions present in both (a run that
+    wrote the file but was interrupted before deleting) keep the freshly read version.
+    """
+    keep_sessions = ~np.isin(old["session"]["id"], new["session"]["id"])
+    keep_attendance = ~np.isin(old["attendance"]["session_id"], new["session"]["id"])
+    merged = _empty_columns()
+    for table, keep in (("session", keep_sessions), ("attendance", keep_attendance)):
+        for name in merged[table]:
+            merged[table][name] = np.concatenate([old[table][name][keep], new[table][name]])
+    return merged
+
+
+def write_archive(path, key, columns, first_day, last_day):
+    """Sort, index and write the columns (via a temporary file, so readers never see half a file)."""
+    session = columns["session"]
+    attendance = columns["attendance"]
+
+    order = np.lexsort((session["started_at"], session["classroom_id"]))
+    session = {name: values[order] for name, values in session.items()}
+    class_ids, first_rows = np.unique(session["classroom_id"], return_index=True)
+    index_offsets = np.append(first_rows, len(session["id"])).astype(np.int64)
+
+    # Attendance grouped by session, in archive session order.
+    by_id = np.argsort(session["id"])
+    session_rows = by_id[np.searchsorted(session["id"], attendance["session_id"], sorter=by_id)]
+    order = np.argsort(session_rows, kind="stable")
+    attendance = {name: values[order] for name, values in attendance.items()}
+    counts = np.bincount(session_rows, minlength=len(session["id"]))
+    attendance_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "semester": key,
+        "first_day": first_day.isoformat(),
+        "last_day": last_day.isoformat(),
+        "sessions": int(len(session["id"])),
+        "attendance": int(len(attendance["session_id"])),
+        "statuses": STATUSES,
+    }
+    arrays = {"meta": np.array(json.dumps(meta))}
+    arrays.update({f"session_{name}": values for name, values in session.items()})
+    arrays.update({f"attendance_{name}": values for name, values in attendance.items()})
+    arrays["index_classroom_id"] = class_ids
+    arrays["index_offsets"] = index_offsets
+    arrays["session_attendance_offsets"] = attendance_offsets
+
+    temporary = path.with_suffix(".tmp.npz")
+    with open(temporary, "wb") as handle:
+        # Uncompressed so readers can memory-map the columns (see open_arrays()).
+        np.savez(handle, **arrays)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+    return meta
+
+
+def archive_semester(session_qs, key, first_day, last_day, dry_run=False, size=None, pause=None, on_batch=None):
+    """
+    Archive the given (closed, in-semester) sessions into the semester file, then delete them
+    from the live tables in batches: attendance rows, QR tokens, sessions.
+    Returns (sessions, attendance rows) archived.
+    """
+    columns = collect_columns(session_qs)
+    archived = (len(columns["session"]["id"]), len(columns["attendance"]["session_id"]))
+    if dry_run or not archived[0]:
+        return archived
+
+    path = archive_path(key)
+    if path.exists():
+        columns = merge_columns(read_columns(path), columns)
+    write_archive(path, key, columns, first_day, last_day)
+
+    # Only delete what the file on disk provably holds.
+    with np.load(path) as data:
+        stored = data["session_id"]
+    live_ids = np.fromiter(session_qs.order_by().values_list("id", flat=True), np.int64)
+    if not np.isin(live_ids, stored).all():
+        raise RuntimeError(f"{path.name} does not contain every archived session; live rows were left in place.")
+
+    for queryset in (
+        Attendance.objects.filter(session__in=session_qs),
+        RollingQRToken.objects.filter(session__in=session_qs),
+        AttendanceSession.objects.filter(id__in=session_qs.values("id")),
+    ):
+        delete_in_batches(queryset, size=size, pause=pause, on_batch=on_batch)
+    return archived
+
+
+def archived_semesters(date_from=None, date_to=None):
+    """Paths of the semester archives overlapping [date_from, date_to]."""
+    root = _archive_dir()
+    paths = []
+    if not root.is_dir():
+        return paths
+    for path in sorted(root.glob("attendance-*.npz")):
+        if path.name.endswith(".tmp.npz"):
+            continue
+        start, end, _key = semester_bounds(_semester_day(path))
+        if (date_to and start > date_to) or (date_from and end < date_from):
+            continue
+        paths.append(path)
+    return paths
+
+
+def _semester_day(path):
+    year, half = path.stem.removeprefix("attendance-").split("-S")
+    return date(int(year), 1 if half == "1" else 7, 1)
+
+
+class SemesterArchive:
+    """
+    One archive file opened for reading; columns are memory-mapped on first use, so a class's
+    sessions only read the index and the rows it points at.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            self._data = open_arrays(self.path)
+            self.meta = json.loads(str(self._data["meta"]))
+        return self._data
+
+    def session_rows(self, classroom_id, date_from=None, date_to=None):
+        """Archive row numbers of a class's sessions in the date range, oldest first."""
+        data = self._load()
+        class_ids = data["index_classroom_id"]
+        position = np.searchsorted(class_ids, classroom_id)
+        if position >= len(class_ids) or class_ids[position] != classroom_id:
+            return np.empty(0, np.int64)
+        first, last = int(data["index_offsets"][position]), int(data["index_offsets"][position + 1])
+        rows = np.arange(first, last)
+        dates = data["session_session_date"][first:last]
+        keep = np.ones(len(rows), bool)
+        if date_from:
+            keep &= dates >= np.datetime64(date_from, "D")
+        if date_to:
+            keep &= dates <= np.datetime64(date_to, "D")
+        return rows[keep]
+
+    def has_attendance(self, classroom_ids, date_from=None, date_to=None):
+        offsets = self._load()["session_attendance_offsets"]
+        for classroom_id in classroom_ids:
+            rows = self.session_rows(classroom_id, date_from, date_to)
+            if (offsets[rows + 1] > offsets[rows]).any():
+                return True
+        return False
+
+    def sessions(self, classroom_id, date_from=None, date_to=None):
+        """
+        Unsaved AttendanceSession instances shaped like prefetch_for_export() output:
+        each carries `export_rows` (unsaved Attendance instances) and `archived = True`.
+        """
+        data = self._load()
+        statuses = self.meta["statuses"]
+        offsets = data["session_attendance_offsets"]
+        result = []
+        for row in self.session_rows(classroom_id, date_from, date_to).tolist():
+            session = AttendanceSession(
+                id=int(data["session_id"][row]),
+                classroom_id=classroom_id,
+                teacher_id=int(data["session_teacher_id"][row]),
+                session_date=data["session_session_date"][row].astype(date),
+                started_at=_from_us(data["session_started_at"][row]),
+                ended_at=_from_us(data["session_ended_at"][row]),
+                is_live=False,
+                qr_validity_seconds=int(data["session_qr_validity_seconds"][row]),
+            )
+            session.archived = True
+            span = slice(offsets[row], offsets[row + 1])
+            session.export_rows = [
+                Attendance(
+                    session_id=session.id,
+                    student_id=student_id,
+                    status=statuses[status],
+                    qr_scanned_at=_from_us(scanned),
+                    face_checked_at=_from_us(checked),
+                    marked_at=_from_us(marked),
+                    face_score=None if np.isnan(score) else float(score),
+                )
+                for student_id, status, scanned, checked, marked, score in zip(
+                    data["attendance_student_id"][span].tolist(),
+                    data["attendance_status"][span].tolist(),
+                    data["attendance_qr_scanned_at"][span],
+                    data["attendance_face_checked_at"][span],
+                    data["attendance_marked_at"][span],
+                    data["attendance_face_score"][span],
+                )
+            ]
+            result.append(session)
+        return result
+
+
+class ArchiveReader:
+    """The semester archives overlapping one report's date range (each file loaded at most once)."""
+
+    def __init__(self, date_from=None, date_to=None):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.archives = [SemesterArchive(path) for path in archived_semesters(date_from, date_to)]
+
+    def __bool__(self):
+        return bool(self.archives)
+
+    def has_attendance(self, classroom_ids):
+        return any(archive.has_attendance(classroom_ids, self.date_from, self.date_to) for archive in self.archives)
+
+    def extend_export_sessions(self, classroom):
+        """
+        Add the class's archived sessions run by its current teacher to the prefetched
+        `export_sessions` (kept oldest first).
+        """
+        archived = [
+            session
+            for archive in self.archives
+            for session in archive.sessions(classroom.id, self.date_from, self.date_to)
+            if session.teacher_id == classroom.teacher_id
+        ]
+        if archived:
+            classroom.export_sessions = sorted(
+                archived + list(classroom.export_sessions), key=lambda session: session.started_at
+            )
+        return classroom
@@ -0,0 +1,104 @@
+"""
+Dashboard class-card data
+Card lists are cached per teacher and per section; time-dependent status is applied by views at render time.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ClassRoom
+
+SCOPE_TEACHER = "teacher"
+SCOPE_SECTION = "section"
+
+
+def _ttl():
+    return getattr(settings, "DASHBOARD_CACHE_TTL", 3600)
+
+
+def _version_key(scope, obj_id):
+    return f"sams:cards:{scope}:{obj_id}:version"
+
+
+def cards_version(scope, obj_id):
+    """
+    Current cache version for one teacher/section.
+    Data and template fragments are keyed by it, so bumping it invalidates both.
+    """
+    key = _version_key(scope, obj_id)
+    version = cache.get(key)
+    if version is None:
+        # Time-based seed: an evicted version never falls back to an older, stale one.
+        version = time.time_ns()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_cards_version(scope, obj_ids):
+    """Invalidate cached cards (and fragments) for the given teacher/section ids."""
+    stamp = time.time_ns()
+    cache.set_many({_version_key(scope, obj_id): stamp for obj_id in set(obj_ids) if obj_id}, None)
+
+
+def _cached_cards(scope, obj_id, build):
+    key = f"sams:cards:{scope}:{obj_id}:{cards_version(scope, obj_id)}"
+    cards = cache.get(key)
+    if cards is None:
+        cards = build()
+        cache.set(key, cards, _ttl())
+    return cards
+
+
+def teacher_class_cards(teacher_id):
+    """Active class cards for a teacher, without status (cached)."""
+    def build():
+        class_qs = (
+            ClassRoom.objects.filter(teacher_id=teacher_id, is_active=True)
+            .select_related("section")
+            .order_by("start_time", "subject_name")
+        )
+        return [
+            {
+                "id": class_obj.id,
+                "subject_name": class_obj.subject_name,
+                "section_code": class_obj.section.code,
+                "start_time": class_obj.start_time,
+                "end_time": class_obj.end_time,
+            }
+            for class_obj in class_qs
+        ]
+
+    return _cached_cards(SCOPE_TEACHER, teacher_id, build)
+
+
+def section_class_cards(section_id):
+    """Active class cards for a section, without status (cached)."""
+    def build():
+        class_qs = (
+            ClassRoom.objects.filter(section_id=section_id, is_active=True)
+            .select_related("section", "teacher")
+            .order_by("start_time", "subject_name")
+        )
+        return [
+            {
+                "id": class_obj.id,
+                "subject_name": class_obj.subject_name,
+                "section_code": class_obj.section.code,
+                "teacher_name": class_obj.teacher.name,
+                "start_time": class_obj.start_time,
+                "end_time": class_obj.end_time,
+            }
+            for class_obj in class_qs
+        ]
+
+    return _cached_cards(SCOPE_SECTION, section_id, build)
+
+
+def status_signature(cards):
+    """Short key describing the current badges and time windows, used to vary card fragments."""
+    return "".join(
+        f"{card['status_text'][:1]}{card['start_time']:%H%M}" if card["start_time"] else card["status_text"][:1]
+        for card in cards
+    )
@@ -0,0 +1,106 @@
+"""
+Chunked cascade deletion
+Teachers and students own large trees (classes -> sessions -> tokens/attendance).
+Children are removed bottom-up in bounded batches, one short transaction each, so the
+database write lock is released between batches and live scans keep flowing.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Attendance, AttendanceSession, ClassRoom, RollingQRToken, Teacher, TimetableSlot
+
+
+def batch_size():
+    return getattr(settings, "DELETION_BATCH_SIZE", 1000)
+
+
+def batch_pause():
+    return getattr(settings, "DELETION_BATCH_PAUSE_SECONDS", 0.05)
+
+
+def deactivate_users(user_ids):
+    """Block logins right away; the rows themselves are removed later by the job."""
+    return User.objects.filter(id__in=user_ids).update(is_active=False)
+
+
+def delete_in_batches(queryset, size=None, pause=None, on_batch=None):
+    """
+    Delete the rows of `queryset` `size` at a time, each batch in its own transaction.
+    `on_batch(deleted)` is called after every batch. Returns the number of rows deleted.
+    """
+    size = size or batch_size()
+    pause = batch_pause() if pause is None else pause
+    model = queryset.model
+    total = 0
+    while True:
+        ids = list(queryset.order_by().values_list("id", flat=True)[:size])
+        if not ids:
+            return total
+        with transaction.atomic():
+            model.objects.filter(id__in=ids).delete()
+        total += len(ids)
+        if on_batch:
+            on_batch(len(ids))
+        if pause:
+            time.sleep(pause)
+
+
+def run_plan(plan, size=None, pause=None, progress=None):
+    """
+    Execute [(label, queryset)] in order. Totals are counted up front so
+    `progress(done, total, label)` can report a percentage. Returns {label: deleted}.
+    """
+    counts = [(label, queryset, queryset.count()) for label, queryset in plan]
+    total = sum(count for _, _, count in counts) or 1
+    done = 0
+    deleted = {}
+    for label, queryset, _ in counts:
+        def on_batch(count, label=label):
+            nonlocal done
+            done += count
+            if progress:
+                progress(done, total, label)
+
+        deleted[label] = delete_in_batches(queryset, size, pause, on_batch)
+    return deleted
+
+
+def _plan_user_ids(model, ids, user_ids):
+    """
+    Accounts to remove: those still linked to the rows, plus `user_ids` recorded when the job was
+    queued, so a run resumed after the profile rows are gone still deletes the accounts.
+    """
+    linked = model.objects.filter(id__in=ids).values_list("user_id", flat=True)
+    return sorted(set(linked) | set(user_ids or ()))
+
+
+def teacher_deletion_plan(teacher_ids, user_ids=None):
+    """Bottom-up querysets removing teachers, everything they own and their user accounts."""
+    user_ids = _plan_user_ids(Teacher, teacher_ids, user_ids)
+    owned_sessions = Q(teacher_id__in=teacher_ids) | Q(classroom__teacher_id__in=teacher_ids)
+    session_ids = AttendanceSession.objects.filter(owned_sessions).values("id")
+    return [
+        ("attendance", Attendance.objects.filter(session_id__in=session_ids)),
+        ("qr tokens", RollingQRToken.objects.filter(session_id__in=session_ids)),
+        ("sessions", AttendanceSession.objects.filter(owned_sessions)),
+        ("timetable slots", TimetableSlot.objects.filter(classroom__teacher_id__in=teacher_ids)),
+        ("classes", ClassRoom.objects.filter(teacher_id__in=teacher_ids)),
+        ("teachers", Teacher.objects.filter(id__in=teacher_ids)),
+        ("users", User.objects.filter(id__in=user_ids)),
+    ]
+
+
+def student_deletion_plan(student_ids, user_ids=None):
+    """Bottom-up querysets removing students, their attendance rows and their user accounts."""
+    from student_app.models import Student
+
+    user_ids = _plan_user_ids(Student, student_ids, user_ids)
+    return [
+        ("attendance", Attendance.objects.filter(student_id__in=student_ids)),
+        ("students", Student.objects.filter(id__in=student_ids)),
+        ("users", User.objects.filter(id__in=user_ids)),
+    ]
@@ -0,0 +1,273 @@
+"""
+Attendance export engine
+Builds Excel-compatible (.xls HTML table) sheets and streams them as ZIP archives
+"""
+import zipfile
+
+from django.db.models import F, OuterRef, Prefetch, Subquery
+from django.utils import timezone
+from django.utils.html import escape
+
+from .archive import ArchiveReader
+from .models import Attendance, AttendanceSession, ClassRoom
+
+SHEET_CONTENT_TYPE = "application/vnd.ms-excel; charset=utf-8"
+ZIP_CONTENT_TYPE = "application/zip"
+
+# Characters Windows/Excel refuse in file names.
+_UNSAFE_FILENAME_CHARS = '\\/:*?"<>|'
+
+
+def safe_filename(raw_name, fallback):
+    """Strip characters that are invalid in file names; use fallback if nothing is left."""
+    cleaned = "".join(ch for ch in raw_name if ch not in _UNSAFE_FILENAME_CHARS).strip()
+    return cleaned or fallback
+
+
+def sheet_basename(classroom):
+    """Download name used for a class sheet: <SectionCode>-<SubjectName>."""
+    return safe_filename(f"{classroom.section.code}-{classroom.subject_name}", f"attendance_{classroom.id}")
+
+
+def _stamp_parts(row):
+    # Attendance time is the face match time when present, else the scan time.
+    stamp = row.marked_at or row.qr_scanned_at
+    if not stamp:
+        return "", ""
+    local_stamp = timezone.localtime(stamp)
+    return local_stamp.strftime("%Y-%m-%d"), local_stamp.strftime("%H:%M:%S")
+
+
+def render_session_sheet(classroom, teacher_name, session, students, attendance_map):
+    """
+    Render one session of a class as an Excel-compatible HTML table.
+    `attendance_map` maps student_id -> attendance row; missing students are absent.
+    """
+    rows = []
+    present_count = 0
+    for student in students:
+        row = attendance_map.get(student.id)
+        status = "ABSENT"
+        attendance_date = ""
+        attendance_time = ""
+        if row:
+            status = row.status.upper()
+            attendance_date, attendance_time = _stamp_parts(row)
+            if row.status == Attendance.STATUS_PRESENT:
+                present_count += 1
+        rows.append(
+            "<tr>"
+            f"<td>{student.roll}</td>"
+            f"<td>{escape(student.name or '')}</td>"
+            f"<td>{escape(classroom.subject_name)}</td>"
+            f"<td>{escape(classroom.section.code)}</td>"
+            f"<td>{attendance_date}</td>"
+            f"<td>{attendance_time}</td>"
+            f"<td>{status}</td>"
+            "</tr>"
+        )
+
+    strength = len(students)
+    absent_count = strength - present_count
+    started_local = timezone.localtime(session.started_at)
+    ended_local = timezone.localtime(session.ended_at).strftime("%Y-%m-%d %H:%M:%S") if session.ended_at else "LIVE"
+
+    html = [
+        "<html><head><meta charset='utf-8'></head><body>",
+        "<table border='1'>",
+        f"<tr><td><b>Class Name</b></td><td>{escape(classroom.subject_name)}</td></tr>",
+        f"<tr><td><b>Teacher</b></td><td>{escape(teacher_name)}</td></tr>",
+        f"<tr><td><b>Section</b></td><td>{escape(classroom.section.code)}</td></tr>",
+        f"<tr><td><b>Session ID</b></td><td>{session.id}</td></tr>",
+        f"<tr><td><b>Session Date</b></td><td>{started_local.strftime('%Y-%m-%d')}</td></tr>",
+        f"<tr><td><b>Started At</b></td><td>{started_local.strftime('%H:%M:%S')}</td></tr>",
+        f"<tr><td><b>Ended At</b></td><td>{ended_local}</td></tr>",
+        "<tr><td colspan='7'></td></tr>",
+        "<tr>"
+        "<th>Roll No</th><th>Student Name</th><th>Class Name</th><th>Section</th>"
+        "<th>Attendance Date</th><th>Attendance Time</th><th>Status</th>"
+        "</tr>",
+    ]
+    html.extend(rows)
+    html.extend(
+        [
+            "<tr><td colspan='7'></td></tr>",
+            f"<tr><td><b>Class Strength</b></td><td>{strength}</td><td colspan='5'></td></tr>",
+            f"<tr><td><b>Present</b></td><td>{present_count}</td><td colspan='5'></td></tr>",
+            f"<tr><td><b>Absent</b></td><td>{absent_count}</td><td colspan='5'></td></tr>",
+            "</table></body></html>",
+        ]
+    )
+    return "".join(html)
+
+
+def render_range_sheet(classroom, teacher_name, sessions, students, attendance_by_session, date_from=None, date_to=None):
+    """
+    Render many sessions of a class as one student x session matrix.
+    `attendance_by_session` maps session_id -> {student_id: attendance row}.
+    """
+    span = len(sessions) + 4
+    html = [
+        "<html><head><meta charset='utf-8'></head><body>",
+        "<table border='1'>",
+        f"<tr><td><b>Class Name</b></td><td>{escape(classroom.subject_name)}</td></tr>",
+        f"<tr><td><b>Teacher</b></td><td>{escape(teacher_name)}</td></tr>",
+        f"<tr><td><b>Section</b></td><td>{escape(classroom.section.code)}</td></tr>",
+        f"<tr><td><b>From</b></td><td>{date_from or ''}</td></tr>",
+        f"<tr><td><b>To</b></td><td>{date_to or ''}</td></tr>",
+        f"<tr><td><b>Sessions</b></td><td>{len(sessions)}</td></tr>",
+        f"<tr><td colspan='{span}'></td></tr>",
+    ]
+
+    header = ["<tr><th>Roll No</th><th>Student Name</th>"]
+    for session in sessions:
+        started_local = timezone.localtime(session.started_at)
+        header.append(f"<th>{started_local.strftime('%Y-%m-%d %H:%M')}</th>")
+    header.append("<th>Present</th><th>Percentage</th></tr>")
+    html.append("".join(header))
+
+    for student in students:
+        cells = [f"<tr><td>{student.roll}</td><td>{escape(student.name or '')}</td>"]
+        present_count = 0
+        for session in sessions:
+            row = attendance_by_session.get(session.id, {}).get(student.id)
+            if row and row.status == Attendance.STATUS_PRESENT:
+                present_count += 1
+            cells.append(f"<td>{row.status.upper() if row else 'ABSENT'}</td>")
+        percentage = f"{(present_count * 100.0 / len(sessions)):.1f}" if sessions else ""
+        cells.append(f"<td>{present_count}</td><td>{percentage}</td></tr>")
+        html.append("".join(cells))
+
+    html.extend(
+        [
+            f"<tr><td colspan='{span}'></td></tr>",
+            f"<tr><td><b>Class Strength</b></td><td>{len(students)}</td></tr>",
+            "</table></body></html>",
+        ]
+    )
+    return "".join(html)
+
+
+def prefetch_for_export(class_qs, date_from=None, date_to=None):
+    """
+    Attach roster and attendance data to a ClassRoom queryset in a fixed number of queries.
+    Without a date range only the latest session per class is loaded. Only sessions run by the
+    class's current teacher are exported, as in the per-class download.
+    Each class gets `export_sessions` (oldest first) with `export_rows` on every session.
+    """
+    session_qs = AttendanceSession.objects.filter(teacher_id=F("classroom__teacher_id")).order_by("started_at")
+    if date_from or date_to:
+        if date_from:
+            session_qs = session_qs.filter(session_date__gte=date_from)
+        if date_to:
+            session_qs = session_qs.filter(session_date__lte=date_to)
+    else:
+        latest_session = (
+            AttendanceSession.objects.filter(classroom=OuterRef("classroom_id"), teacher=OuterRef("teacher_id"))
+            .order_by("-started_at")
+            .values("id")[:1]
+        )
+        session_qs = session_qs.filter(id=Subquery(latest_session))
+
+    from student_app.models import Student
+
+    return class_qs.select_related("section", "teacher").prefetch_related(
+        Prefetch(
+            "section__students",
+            queryset=Student.objects.only("id", "roll", "name", "section_id").order_by("roll"),
+        ),
+        Prefetch(
+            "sessions",
+            queryset=session_qs.prefetch_related(
+                Prefetch(
+                    "attendance_records",
+                    queryset=Attendance.objects.only(
+                        "id", "session_id", "student_id", "status", "qr_scanned_at", "marked_at", "face_score"
+                    ),
+                    to_attr="export_rows",
+                )
+            ),
+            to_attr="export_sessions",
+        ),
+    )
+
+
+def teacher_export_classes(teacher, date_from=None, date_to=None):
+    """All classes owned by a teacher, prefetched for export."""
+    class_qs = ClassRoom.objects.filter(teacher=teacher).order_by("section__code", "subject_name")
+    return prefetch_for_export(class_qs, date_from, date_to)
+
+
+def iter_class_sheets(classes, date_from=None, date_to=None, used_names=None, archives=None):
+    """
+    Yield (filename, html) for each prefetched class that has at least one session to report.
+    Single-session layout without a range, student x session matrix with one; range sheets
+    include sessions moved to the semester archives. Sessions nobody scanned stay in the sheet
+    (everyone absent), so percentages are taken over every lecture held.
+    Pass a shared `used_names` set (and ArchiveReader) when one ZIP is built from several batches.
+    """
+    used_names = set() if used_names is None else used_names
+    if archives is None and (date_from or date_to):
+        archives = ArchiveReader(date_from, date_to)
+    for classroom in classes:
+        if archives:
+            archives.extend_export_sessions(classroom)
+        sessions = classroom.export_sessions
+        if not sessions:
+            continue
+
+        basename = sheet_basename(classroom)
+        if basename in used_names:
+            basename = f"{basename}-{classroom.id}"
+        used_names.add(basename)
+
+        teacher_name = classroom.teacher.name or classroom.teacher.enrollment_id
+        students = list(classroom.section.students.all())
+        attendance_by_session = {
+            session.id: {row.student_id: row for row in session.export_rows} for session in sessions
+        }
+        if date_from or date_to:
+            html = render_range_sheet(
+                classroom, teacher_name, sessions, students, attendance_by_session, date_from, date_to
+            )
+        else:
+            session = sessions[-1]
+            html = render_session_sheet(classroom, teacher_name, session, students, attendance_by_session[session.id])
+        yield f"{basename}.xls", html
+
+
+class _ZipChunkBuffer:
+    """Write-only, non-seekable file object that hands written bytes back to the caller."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries):
+    """
+    Stream a ZIP archive built from (filename, text) entries.
+    Compressed bytes are yielded after every member, so the archive is never held whole.
+    """
+    buffer = _ZipChunkBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in entries:
+            with archive.open(name, mode="w") as member:
+                member.write(content.encode("utf-8"))
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+    tail = buffer.drain()
+    if tail:
+        yield tail
@@ -0,0 +1,323 @@
+"""
+CSV importers for onboarding data
+Rows are streamed and handled in chunks: validate, diff against existing rows by natural key,
+then bulk insert/update inside one transaction per chunk. Memory stays bounded by the chunk size.
+"""
+import csv
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.dateparse import parse_time
+
+from sams_main.profiles import ROLE_STUDENT, invalidate_role_profiles
+
+from .dashboard import SCOPE_SECTION, SCOPE_TEACHER, bump_cards_version
+from .models import ClassRoom, MasterFaculty, Section, Teacher
+from .provisioning import DEFAULT_ACCOUNT_PASSWORD, bulk_create_users
+from .timetable import bump_timetable_version
+
+
+class RowError(ValueError):
+    """Validation error for one CSV row."""
+
+
+def _required(row, column):
+    value = (row.get(column) or "").strip()
+    if not value:
+        raise RowError(f"'{column}' is required")
+    return value
+
+
+def _optional(row, column):
+    return (row.get(column) or "").strip()
+
+
+def iter_chunks(rows, size):
+    """Yield lists of (line_number, row) without materializing the whole file."""
+    numbered = enumerate(rows, start=2)  # line 1 is the header
+    while True:
+        chunk = list(islice(numbered, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Importer:
+    """
+    Base importer. Subclasses define `required_columns`, `clean(row) -> (key, values)`
+    and `apply(records)` where records maps key -> values for one chunk.
+    """
+
+    required_columns = ()
+    max_reported_errors = 50
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.stats = Counter()
+        self.errors = []
+
+    def check_header(self, fieldnames):
+        missing = [column for column in self.required_columns if column not in (fieldnames or ())]
+        if missing:
+            raise RowError(f"Missing column(s): {', '.join(missing)}")
+
+    def process_chunk(self, chunk):
+        records = {}
+        for line_number, row in chunk:
+            self.stats["read"] += 1
+            try:
+                key, values = self.clean(row)
+            except RowError as exc:
+                self.stats["invalid"] += 1
+                if len(self.errors) < self.max_reported_errors:
+                    self.errors.append(f"line {line_number}: {exc}")
+                continue
+            if key in records:
+                # Later rows for the same key win.
+                self.stats["duplicate"] += 1
+            records[key] = values
+        if not records:
+            return
+        with transaction.atomic():
+            self.apply(records)
+            if not self.dry_run:
+                # Each chunk commits on its own (a later one may fail): drop its caches once it has.
+                transaction.on_commit(self.invalidate)
+
+    def diff(self, records, existing):
+        """
+        Split records into (new keys, changed instances, changed field names).
+        Changed instances already carry the new values.
+        """
+        to_create, to_update, changed_fields = [], [], set()
+        for key, values in records.items():
+            instance = existing.get(key)
+            if instance is None:
+                to_create.append(key)
+                continue
+            changed = [field for field, value in values.items() if getattr(instance, field) != value]
+            if not changed:
+                self.stats["unchanged"] += 1
+                continue
+            for field in changed:
+                setattr(instance, field, values[field])
+            changed_fields.update(changed)
+            to_update.append(instance)
+        self.stats["created"] += len(to_create)
+        self.stats["updated"] += len(to_update)
+        return to_create, to_update, changed_fields
+
+    def run(self, handle, chunk_size, on_chunk=None):
+        reader = csv.DictReader(handle)
+        self.check_header(reader.fieldnames)
+        for chunk in iter_chunks(reader, chunk_size):
+            self.process_chunk(chunk)
+            if on_chunk:
+                on_chunk(self.stats)
+        return self.stats
+
+    def invalidate(self):
+        """Hook run after each committed chunk (cache invalidation for what apply() wrote)."""
+
+
+class FacultyImporter(Importer):
+    """MasterFaculty rows keyed by enrollment_id."""
+
+    required_columns = ("enrollment_id", "name", "email", "department", "designation")
+
+    def clean(self, row):
+        enrollment_id = _required(row, "enrollment_id")
+        if len(enrollment_id) > 20:
+            raise RowError("enrollment_id longer than 20 characters")
+        email = _required(row, "email")
+        if "@" not in email:
+            raise RowError(f"invalid email '{email}'")
+        return enrollment_id, {
+            "name": _required(row, "name"),
+            "email": email,
+            "department": _required(row, "department"),
+            "designation": _required(row, "designation"),
+        }
+
+    def apply(self, records):
+        existing = {master.enrollment_id: master for master in MasterFaculty.objects.filter(enrollment_id__in=records)}
+        to_create, to_update, changed_fields = self.diff(records, existing)
+        if self.dry_run:
+            return
+        MasterFaculty.objects.bulk_create(
+            [MasterFaculty(enrollment_id=key, **records[key]) for key in to_create]
+        )
+        if to_update:
+            MasterFaculty.objects.bulk_update(to_update, sorted(changed_fields))
+
+
+class StudentImporter(Importer):
+    """
+    Students keyed by roll (columns: roll, name, section_code, optional email).
+    New students get a user account with the default password, like the admin bulk insert.
+    """
+
+    required_columns = ("roll", "name", "section_code")
+
+    def __init__(self, dry_run=False, password=DEFAULT_ACCOUNT_PASSWORD):
+        super().__init__(dry_run)
+        self.password_hash = make_password(password)
+        self._section_ids = {}
+        self._touched_users = set()
+
+    def _section_id(self, code):
+        if code not in self._section_ids:
+            self._section_ids[code] = Section.objects.filter(code=code).values_list("id", flat=True).first()
+        return self._section_ids[code]
+
+    def clean(self, row):
+        try:
+            roll = int(_required(row, "roll"))
+        except ValueError:
+            raise RowError(f"roll '{row.get('roll')}' is not a number")
+        section_code = _required(row, "section_code")
+        section_id = self._section_id(section_code)
+        if section_id is None:
+            raise RowError(f"unknown section '{section_code}'")
+        return roll, {
+            "name": _required(row, "name")[:50],
+            "section_id": section_id,
+            "_email": _optional(row, "email") or f"{roll}@kiit.ac.in",
+        }
+
+    def apply(self, records):
+        from student_app.models import Student
+
+        emails = {roll: values.pop("_email") for roll, values in records.items()}
+        existing = {
+            student.roll: student
+            for student in Student.objects.filter(roll__in=records).only("id", "roll", "name", "section_id", "user_id")
+        }
+        to_create, to_update, changed_fields = self.diff(records, existing)
+        if self.dry_run:
+            return
+
+        if to_create:
+            # Reuse accounts that already exist for a roll (e.g. a half-finished earlier import).
+            user_ids = dict(
+                User.objects.filter(username__in=[str(roll) for roll in to_create]).values_list("username", "id")
+            )
+            new_users = bulk_create_users(
+                [(str(roll), emails[roll]) for roll in to_create if str(roll) not in user_ids], self.password_hash
+            )
+            user_ids.update((user.username, user.pk) for user in new_users)
+            Student.objects.bulk_create(
+                [
+                    Student(user_id=user_ids[str(roll)], roll=roll, mail_verified=True, **records[roll])
+                    for roll in to_create
+                ]
+            )
+        if to_update:
+            Student.objects.bulk_update(to_update, sorted(changed_fields))
+            # Section changes must reach the cached request.student profiles.
+            self._touched_users.update(student.user_id for student in to_update)
+
+    def invalidate(self):
+        if self._touched_users:
+            invalidate_role_profiles(ROLE_STUDENT, self._touched_users)
+            self._touched_users = set()
+
+
+class ClassImporter(Importer):
+    """
+    Class cards keyed by section_code + subject_name
+    (columns: section_code, subject_name, teacher_enrollment_id, optional start_time, end_time).
+    """
+
+    required_columns = ("section_code", "subject_name", "teacher_enrollment_id")
+
+    def __init__(self, dry_run=False):
+        super().__init__(dry_run)
+        self._section_ids = {}
+        self._teacher_ids = {}
+        self._touched_sections = set()
+        self._touched_teachers = set()
+
+    def _lookup(self, cache, model, field, value):
+        if value not in cache:
+            cache[value] = model.objects.filter(**{field: value}).values_list("id", flat=True).first()
+        return cache[value]
+
+    def clean(self, row):
+        section_code = _required(row, "section_code")
+        subject_name = _required(row, "subject_name")[:120]
+        section_id = self._lookup(self._section_ids, Section, "code", section_code)
+        if section_id is None:
+            raise RowError(f"unknown section '{section_code}'")
+        enrollment_id = _required(row, "teacher_enrollment_id")
+        teacher_id = self._lookup(self._teacher_ids, Teacher, "enrollment_id", enrollment_id)
+        if teacher_id is None:
+            raise RowError(f"unknown teacher '{enrollment_id}'")
+
+        times = []
+        for column in ("start_time", "end_time"):
+            raw = _optional(row, column)
+            try:
+                value = parse_time(raw) if raw else None
+            except ValueError:
+                value = None
+            if raw and value is None:
+                raise RowError(f"invalid {column} '{raw}'")
+            times.append(value)
+        start_time, end_time = times
+        if (start_time is None) != (end_time is None):
+            raise RowError("start_time and end_time must be given together")
+        if start_time and end_time <= start_time:
+            raise RowError("end_time must be after start_time")
+
+        return (section_id, subject_name), {
+            "teacher_id": teacher_id,
+            "start_time": start_time,
+            "end_time": end_time,
+            "is_active": True,
+        }
+
+    def apply(self, records):
+        section_ids = {section_id for section_id, _ in records}
+        subjects = {subject for _, subject in records}
+        existing = {
+            (classroom.section_id, classroom.subject_name): classroom
+            for classroom in ClassRoom.objects.filter(section_id__in=section_ids, subject_name__in=subjects)
+        }
+        previous_teachers = {classroom.id: classroom.teacher_id for classroom in existing.values()}
+        to_create, to_update, changed_fields = self.diff(records, existing)
+        if self.dry_run:
+            return
+        ClassRoom.objects.bulk_create(
+            [ClassRoom(section_id=section_id, subject_name=subject, **records[(section_id, subject)])
+             for section_id, subject in to_create]
+        )
+        if to_update:
+            ClassRoom.objects.bulk_update(to_update, sorted(changed_fields))
+
+        # bulk writes send no signals: collect owners whose cached cards changed.
+        for section_id, subject in to_create:
+            self._touched_sections.add(section_id)
+            self._touched_teachers.add(records[(section_id, subject)]["teacher_id"])
+        for classroom in to_update:
+            self._touched_sections.add(classroom.section_id)
+            self._touched_teachers.update({classroom.teacher_id, previous_teachers[classroom.id]})
+
+    def invalidate(self):
+        if not (self._touched_sections or self._touched_teachers):
+            return
+        bump_cards_version(SCOPE_SECTION, self._touched_sections)
+        bump_cards_version(SCOPE_TEACHER, self._touched_teachers)
+        bump_timetable_version()
+        self._touched_sections = set()
+        self._touched_teachers = set()
+
+
+IMPORTERS = {
+    "faculty": FacultyImporter,
+    "students": StudentImporter,
+    "classes": ClassImporter,
+}
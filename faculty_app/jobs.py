@@ -0,0 +1,264 @@
+"""
+Background job runner
+Handlers are registered per BackgroundJob.kind and executed by the `run_jobs` command.
+"""
+import traceback
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from sams_main.replicas import use_replica
+
+from .archive import ArchiveReader
+from .deletion import run_plan, student_deletion_plan, teacher_deletion_plan
+from .exports import iter_class_sheets, iter_zip, prefetch_for_export
+from .models import BackgroundJob, ClassRoom, job_lease_until
+from .provisioning import provision_students
+
+# kind -> callable(job) returning a short completion message
+JOB_HANDLERS = {}
+
+REPORT_SCOPE_TEACHER = "teacher"
+REPORT_SCOPE_DEPARTMENT = "department"
+REPORT_SCOPE_CAMPUS = "campus"
+REPORT_SCOPES = (REPORT_SCOPE_TEACHER, REPORT_SCOPE_DEPARTMENT, REPORT_SCOPE_CAMPUS)
+
+# Classes prefetched per round-trip batch while building a report.
+REPORT_CLASS_BATCH = 25
+
+
+def register_job(kind):
+    """Decorator registering a handler for one BackgroundJob kind."""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def results_root():
+    """Directory where job result files are written (created on demand)."""
+    root = Path(getattr(settings, "JOB_RESULTS_ROOT", settings.BASE_DIR / "job_results"))
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def result_path(job):
+    """Absolute path of a job's result file, or None when it has none."""
+    if not job.result_file:
+        return None
+    return results_root() / job.result_file
+
+
+def enqueue_job(kind, params=None, requested_by=None):
+    """Queue a job for the worker and return it."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return BackgroundJob.objects.create(kind=kind, params=params or {}, requested_by=requested_by)
+
+
+def _claimable(now):
+    """Queued jobs, and running jobs whose worker stopped renewing the lease (crashed or killed)."""
+    expired = Q(lease_until__lt=now) | Q(lease_until__isnull=True)
+    return Q(status=BackgroundJob.STATUS_QUEUED) | (Q(status=BackgroundJob.STATUS_RUNNING) & expired)
+
+
+def fail_abandoned_jobs():
+    """Mark jobs FAILED whose lease ran out after JOB_MAX_ATTEMPTS runs (e.g. a job that kills its worker)."""
+    now = timezone.now()
+    max_attempts = getattr(settings, "JOB_MAX_ATTEMPTS", 3)
+    return BackgroundJob.objects.filter(
+        Q(status=BackgroundJob.STATUS_RUNNING),
+        Q(lease_until__lt=now) | Q(lease_until__isnull=True),
+        attempts__gte=max_attempts,
+    ).update(
+        status=BackgroundJob.STATUS_FAILED,
+        message=f"Failed: worker stopped responding ({max_attempts} attempts).",
+        lease_until=None,
+        finished_at=now,
+    )
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest claimable job to RUNNING under a fresh lease and return it.
+    Jobs left RUNNING by a dead worker are taken again once their lease expires.
+    The conditional UPDATE lets several workers share one queue safely; where the backend
+    supports SKIP LOCKED the oldest unclaimed row is locked and taken in one transaction.
+    """
+    fail_abandoned_jobs()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = (
+                BackgroundJob.objects.select_for_update(skip_locked=True)
+                .filter(_claimable(timezone.now()))
+                .order_by("created_at")
+                .first()
+            )
+            if job is not None:
+                job.status = BackgroundJob.STATUS_RUNNING
+                job.started_at = timezone.now()
+                job.lease_until = job_lease_until()
+                job.attempts += 1
+                job.save(update_fields=["status", "started_at", "lease_until", "attempts"])
+            return job
+
+    candidates = (
+        BackgroundJob.objects.filter(_claimable(timezone.now()))
+        .order_by("created_at")
+        .values_list("id", flat=True)[:10]
+    )
+    for job_id in candidates:
+        claimed = BackgroundJob.objects.filter(_claimable(timezone.now()), id=job_id).update(
+            status=BackgroundJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+            lease_until=job_lease_until(),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return BackgroundJob.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """Execute one claimed job and record its final state."""
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind '{job.kind}'.")
+        message = handler(job) or "Completed."
+    except Exception as exc:
+        job.status = BackgroundJob.STATUS_FAILED
+        job.message = f"Failed: {exc}"[:255]
+        job.error = traceback.format_exc()
+    else:
+        job.status = BackgroundJob.STATUS_DONE
+        job.progress = 100
+        job.message = message[:255]
+    job.finished_at = timezone.now()
+    job.lease_until = None
+    job.save(update_fields=["status", "progress", "message", "error", "result_file", "finished_at", "lease_until"])
+    return job
+
+
+def semester_start(day):
+    """First day of the semester containing `day` (Jan-Jun or Jul-Dec)."""
+    return date(day.year, 1 if day.month <= 6 else 7, 1)
+
+
+def report_params(scope, teacher=None, date_from=None, date_to=None):
+    """
+    Normalized params for an attendance report job.
+    Defaults to the current semester so a job never silently spans all history.
+    """
+    if scope not in REPORT_SCOPES:
+        raise ValueError(f"Unknown report scope: {scope}")
+    today = timezone.localdate()
+    date_to = date_to or today
+    date_from = date_from or semester_start(date_to)
+    params = {
+        "scope": scope,
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+    }
+    if teacher is not None:
+        params["teacher_id"] = teacher.id
+        params["department"] = teacher.department
+    return params
+
+
+def _report_classes(params):
+    scope = params.get("scope", REPORT_SCOPE_TEACHER)
+    class_qs = ClassRoom.objects.all()
+    if scope == REPORT_SCOPE_TEACHER:
+        class_qs = class_qs.filter(teacher_id=params["teacher_id"])
+    elif scope == REPORT_SCOPE_DEPARTMENT:
+        class_qs = class_qs.filter(teacher__department=params["department"])
+    return class_qs.order_by("section__code", "subject_name")
+
+
+@register_job(BackgroundJob.KIND_ATTENDANCE_REPORT)
+def build_attendance_report(job):
+    """
+    Write a ZIP with one session-matrix sheet per class in scope.
+    Uses the same export engine as the dashboard downloads, batching classes for progress updates.
+    Reads come from the replica when one is configured.
+    """
+    with use_replica():
+        return _build_attendance_report(job)
+
+
+def _build_attendance_report(job):
+    params = job.params
+    date_from = parse_date(params["date_from"])
+    date_to = parse_date(params["date_to"])
+    class_ids = list(_report_classes(params).values_list("id", flat=True))
+    total = len(class_ids)
+    # Archived semesters in range are opened once and shared by all batches.
+    archives = ArchiveReader(date_from, date_to)
+
+    def entries():
+        used_names = set()
+        for offset in range(0, total, REPORT_CLASS_BATCH):
+            batch_ids = class_ids[offset:offset + REPORT_CLASS_BATCH]
+            batch = prefetch_for_export(
+                ClassRoom.objects.filter(id__in=batch_ids).order_by("section__code", "subject_name"),
+                date_from,
+                date_to,
+            )
+            yield from iter_class_sheets(batch, date_from, date_to, used_names, archives)
+            done = min(offset + REPORT_CLASS_BATCH, total)
+            job.set_progress(done * 100 / total, f"Processed {done} of {total} classes")
+
+    relative = Path("reports") / f"attendance_{params.get('scope')}_{job.id}.zip"
+    target = results_root() / relative
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(target, "wb") as handle:
+            for chunk in iter_zip(entries()):
+                handle.write(chunk)
+    except BaseException:
+        # Never leave a truncated archive behind for a failed (or re-claimed) job.
+        target.unlink(missing_ok=True)
+        raise
+
+    job.result_file = relative.as_posix()
+    return f"Report ready: {total} classes, {date_from} to {date_to}."
+
+
+@register_job(BackgroundJob.KIND_PROVISION_STUDENTS)
+def provision_students_job(job):
+    """Fill sections up to expected strength in batches, reporting progress per batch."""
+    def progress(done, total):
+        job.set_progress(done * 100 / total, f"Created {done} of {total} students")
+
+    created = provision_students(job.params["section_ids"], progress=progress)
+    return f"Inserted {created} students."
+
+
+def _deletion_progress(job):
+    def progress(done, total, label):
+        job.set_progress(done * 100 / total, f"Deleting {label}: {done} of {total} rows")
+    return progress
+
+
+def _deletion_summary(deleted):
+    return "Deleted " + ", ".join(f"{count} {label}" for label, count in deleted.items()) + "."
+
+
+@register_job(BackgroundJob.KIND_DELETE_TEACHERS)
+def delete_teachers_job(job):
+    """Remove teachers and everything they own in short batches (children first)."""
+    plan = teacher_deletion_plan(job.params["teacher_ids"], job.params.get("user_ids"))
+    return _deletion_summary(run_plan(plan, progress=_deletion_progress(job)))
+
+
+@register_job(BackgroundJob.KIND_DELETE_STUDENTS)
+def delete_students_job(job):
+    """Remove students, their attendance rows and accounts in short batches."""
+    plan = student_deletion_plan(job.params["student_ids"], job.params.get("user_ids"))
+    return _deletion_summary(run_plan(plan, progress=_deletion_progress(job)))
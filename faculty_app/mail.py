@@ -0,0 +1,152 @@
+"""
+Email outbox
+Views enqueue messages; `send_queued_emails` delivers them in batches over one SMTP connection.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+# Seconds a worker may hold claimed rows before another worker can retry them.
+SEND_LEASE_SECONDS = 300
+
+
+def _default_from_email():
+    return getattr(settings, "EMAIL_HOST_USER", "") or "noreply@sams.local"
+
+
+def enqueue_email(subject, body, to_email, from_email=None, expires_in=None):
+    """
+    Queue one message and return immediately (a single INSERT).
+    expires_in (seconds) drops the message instead of sending it late, e.g. an OTP nobody can use anymore.
+    """
+    message = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        to_email=to_email,
+        from_email=from_email or _default_from_email(),
+        expires_at=timezone.now() + timedelta(seconds=expires_in) if expires_in else None,
+    )
+    if getattr(settings, "EMAIL_OUTBOX_EAGER", False):
+        # Development/test convenience: deliver right after the surrounding transaction commits.
+        transaction.on_commit(deliver_due_emails)
+    return message
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, "EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30)
+    cap = getattr(settings, "EMAIL_OUTBOX_RETRY_MAX_SECONDS", 3600)
+    return timedelta(seconds=min(cap, base * (2 ** max(attempts - 1, 0))))
+
+
+def _retry_or_fail(message, error, max_attempts):
+    """
+    Reschedule a message after a failed attempt, or mark it failed.
+    A retry that would land past the message's expiry is not scheduled. Returns True when retried.
+    """
+    message.last_error = str(error)[:2000]
+    next_attempt_at = timezone.now() + _retry_delay(message.attempts)
+    if message.attempts >= max_attempts or (message.expires_at and next_attempt_at >= message.expires_at):
+        message.status = OutboundEmail.STATUS_FAILED
+        return False
+    message.status = OutboundEmail.STATUS_QUEUED
+    message.next_attempt_at = next_attempt_at
+    return True
+
+
+def claim_due_emails(batch_size):
+    """
+    Lease up to batch_size due messages to this worker.
+    Rows stuck in SENDING past their lease (crashed worker) are picked up again.
+    """
+    now = timezone.now()
+    due = OutboundEmail.objects.filter(
+        Q(status=OutboundEmail.STATUS_QUEUED) | Q(status=OutboundEmail.STATUS_SENDING),
+        next_attempt_at__lte=now,
+    ).order_by("next_attempt_at")
+    lease_until = now + timedelta(seconds=SEND_LEASE_SECONDS)
+    with transaction.atomic():
+        if transaction.get_connection().features.has_select_for_update_skip_locked:
+            # PostgreSQL/MySQL: rows another worker is claiming are skipped, not waited on.
+            due = due.select_for_update(skip_locked=True)
+        due_ids = list(due.values_list("id", flat=True)[:batch_size])
+        if not due_ids:
+            return []
+        # Conditional update: rows leased by a concurrent worker in the meantime are skipped.
+        OutboundEmail.objects.filter(id__in=due_ids, next_attempt_at__lte=now).exclude(
+            status__in=(OutboundEmail.STATUS_SENT, OutboundEmail.STATUS_FAILED)
+        ).update(status=OutboundEmail.STATUS_SENDING, next_attempt_at=lease_until)
+    return list(
+        OutboundEmail.objects.filter(
+            id__in=due_ids,
+            status=OutboundEmail.STATUS_SENDING,
+            next_attempt_at=lease_until,
+        )
+    )
+
+
+def deliver_due_emails(batch_size=None):
+    """
+    Send one batch of due messages over a single backend connection.
+    Returns (sent, retried, failed) counts.
+    """
+    batch_size = batch_size or getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50)
+    max_attempts = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+    messages = claim_due_emails(batch_size)
+    if not messages:
+        return 0, 0, 0
+
+    sent = retried = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for message in messages:
+            if message.expires_at and message.expires_at <= timezone.now():
+                message.status = OutboundEmail.STATUS_FAILED
+                message.last_error = "Expired before delivery."
+                failed += 1
+                continue
+            email = EmailMessage(
+                subject=message.subject,
+                body=message.body,
+                from_email=message.from_email,
+                to=[message.to_email],
+                connection=connection,
+            )
+            message.attempts += 1
+            try:
+                # Per-message call on the shared connection so one bad recipient doesn't fail the batch.
+                connection.send_messages([email])
+            except Exception as exc:
+                if _retry_or_fail(message, exc, max_attempts):
+                    retried += 1
+                else:
+                    failed += 1
+            else:
+                message.status = OutboundEmail.STATUS_SENT
+                message.sent_at = timezone.now()
+                message.latency_ms = (message.sent_at - message.created_at).total_seconds() * 1000
+                message.last_error = ""
+                sent += 1
+    except Exception as exc:
+        # Connection could not be opened: reschedule everything not yet handled, under the same limits.
+        for message in messages:
+            if message.status == OutboundEmail.STATUS_SENDING:
+                message.attempts += 1
+                if _retry_or_fail(message, exc, max_attempts):
+                    retried += 1
+                else:
+                    failed += 1
+    finally:
+        connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        messages,
+        ["status", "attempts", "next_attempt_at", "last_error", "sent_at", "latency_ms"],
+    )
+    return sent, retried, failed
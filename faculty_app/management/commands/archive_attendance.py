@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from faculty_app.archive import archive_path, archive_semester, semester_bounds, semesters_between
+from faculty_app.models import AttendanceSession
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed attendance sessions older than a cutoff (with their attendance rows and QR tokens) "
+        "into one compressed columnar archive per semester, then delete them from the live tables in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            help="Archive sessions dated before YYYY-MM-DD (default: start of the current semester).",
+        )
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows deleted per transaction.")
+        parser.add_argument("--pause", type=float, default=None, help="Seconds to sleep between delete batches.")
+        parser.add_argument("--dry-run", action="store_true", help="Count what would be archived, change nothing.")
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            cutoff = parse_date(options["before"])
+            if cutoff is None:
+                raise CommandError("--before must use YYYY-MM-DD format.")
+        else:
+            cutoff, _end, _key = semester_bounds(timezone.localdate())
+
+        candidates = AttendanceSession.objects.filter(session_date__lt=cutoff, is_live=False)
+        oldest = candidates.aggregate(oldest=Min("session_date"))["oldest"]
+        if oldest is None:
+            self.stdout.write(f"No closed sessions before {cutoff}.")
+            return
+
+        totals = [0, 0]
+        started = time.monotonic()
+        for first_day, last_day, key in semesters_between(oldest, cutoff):
+            session_qs = candidates.filter(session_date__gte=first_day, session_date__lte=last_day)
+            sessions, rows = archive_semester(
+                session_qs,
+                key,
+                first_day,
+                last_day,
+                dry_run=options["dry_run"],
+                size=options["batch_size"],
+                pause=options["pause"],
+            )
+            if not sessions:
+                continue
+            totals[0] += sessions
+            totals[1] += rows
+            target = "would be archived" if options["dry_run"] else f"-> {archive_path(key)}"
+            self.stdout.write(f"{key}: {sessions} session(s), {rows} attendance row(s) {target}")
+
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {totals[0]} session(s) and {totals[1]} attendance row(s) "
+                f"before {cutoff} in {time.monotonic() - started:.2f}s."
+            )
+        )
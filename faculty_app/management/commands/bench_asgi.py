@@ -0,0 +1,261 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import ThreadSensitiveContext
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from faculty_app.deletion import run_plan, student_deletion_plan, teacher_deletion_plan
+from faculty_app.models import AttendanceSession, ClassRoom, RollingQRToken, Section, Teacher
+from student_app.admission import AdmissionController
+from student_app.face_stub import STUB_EMBEDDING, stub_capture_b64, stub_face_models
+from student_app.models import Student
+
+MODE_WSGI = "wsgi"
+MODE_ASGI = "asgi"
+BENCH_PREFIX = "bench-asgi-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent-connection benchmark for the attendance endpoints: the same student storm "
+        "(scan + face verification, teacher polling the QR) through the WSGI handler with a fixed "
+        "worker-thread pool and through the ASGI handler on one event loop. Face inference is stubbed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=200, help="Concurrent student connections.")
+        parser.add_argument("--wsgi-threads", type=int, default=16, help="Worker threads of the WSGI run.")
+        parser.add_argument("--inference-ms", type=float, default=150, help="Simulated face inference time.")
+        parser.add_argument("--inference-slots", type=int, default=4, help="Concurrent inference runs admitted.")
+        parser.add_argument("--inference-queue", type=int, default=64, help="Inference requests allowed to wait.")
+        parser.add_argument("--inference-wait", type=float, default=30.0, help="Seconds a request may wait for a slot.")
+        parser.add_argument("--qr-polls", type=int, default=50, help="Teacher QR polls issued during the storm.")
+        parser.add_argument("--modes", default=f"{MODE_WSGI},{MODE_ASGI}", help="Comma-separated: wsgi, asgi.")
+
+    def handle(self, *args, **options):
+        modes = [name.strip() for name in options["modes"].split(",") if name.strip()]
+        unknown = set(modes) - {MODE_WSGI, MODE_ASGI}
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(sorted(unknown))}")
+        if User.objects.filter(username__startswith=BENCH_PREFIX).exists():
+            raise CommandError(f"Leftover '{BENCH_PREFIX}*' users found; remove them before benchmarking.")
+
+        results = []
+        teacher, classroom, students = self.seed(options["students"])
+        try:
+            with override_settings(RATELIMIT_ENABLE=False):
+                for mode in modes:
+                    session, token = self.open_session(classroom)
+                    results.append(self.run_mode(mode, teacher, session, token, students, options))
+        finally:
+            self.cleanup(teacher, classroom.section, students)
+
+        self.stdout.write(
+            f"{'mode':<5} {'req/s':>8} {'scan p50':>9} {'scan p95':>9} {'face p50':>9} {'face p95':>9} "
+            f"{'qr p50':>8} {'qr p95':>8} {'503s':>5} {'errors':>6} {'in-flight':>9}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:<5} {row['throughput']:>8.1f} {row['scan'][0]:>9.1f} {row['scan'][1]:>9.1f} "
+                f"{row['verify'][0]:>9.1f} {row['verify'][1]:>9.1f} {row['qr'][0]:>8.1f} {row['qr'][1]:>8.1f} "
+                f"{row['shed']:>5} {row['errors']:>6} {row['peak_in_flight']:>9}"
+            )
+        self.stdout.write("Latencies in ms; in-flight = peak requests being handled at the same time.")
+
+    def seed(self, count):
+        password = make_password(None)
+        with transaction.atomic():
+            teacher_user = User.objects.create(username=f"{BENCH_PREFIX}teacher", password=password)
+            teacher = Teacher.objects.create(
+                user=teacher_user, name="Bench", enrollment_id=f"{BENCH_PREFIX}T", department="CSE", designation="AP"
+            )
+            section = Section.objects.create(name="Bench", code=f"{BENCH_PREFIX}S", expected_strength=count)
+            classroom = ClassRoom.objects.create(subject_name="Bench", section=section, teacher=teacher)
+            User.objects.bulk_create(
+                [User(username=f"{BENCH_PREFIX}{idx}", password=password) for idx in range(count)]
+            )
+            user_ids = User.objects.filter(username__startswith=BENCH_PREFIX).exclude(id=teacher_user.id)
+            max_roll = Student.objects.order_by("-roll").values_list("roll", flat=True).first() or 0
+            Student.objects.bulk_create(
+                [
+                    Student(
+                        user_id=user_id, name=f"S{idx}", roll=max_roll + idx + 1, section=section,
+                        mail_verified=True, face_embedding=STUB_EMBEDDING, face_verified=True,
+                    )
+                    for idx, user_id in enumerate(user_ids.values_list("id", flat=True))
+                ]
+            )
+        students = list(Student.objects.filter(section=section).select_related("user"))
+        return teacher, classroom, students
+
+    def open_session(self, classroom):
+        """A fresh live session per mode, so every student scans again."""
+        AttendanceSession.objects.filter(classroom=classroom, is_live=True).update(is_live=False)
+        session = AttendanceSession.objects.create(classroom=classroom, teacher=classroom.teacher)
+        token = RollingQRToken.objects.create(session=session, expires_at=timezone.now() + timedelta(hours=1))
+        return session, token.token
+
+    def cleanup(self, teacher, section, students):
+        run_plan(student_deletion_plan([student.id for student in students]), pause=0)
+        run_plan(teacher_deletion_plan([teacher.id]), pause=0)
+        section.delete()
+
+    def run_mode(self, mode, teacher, session, token_value, students, options):
+        controller = AdmissionController(
+            max_concurrency=options["inference_slots"],
+            max_queue=options["inference_queue"],
+            max_wait=options["inference_wait"],
+            initial_service_time=options["inference_ms"] / 1000,
+        )
+        executor = ThreadPoolExecutor(
+            max_workers=options["inference_slots"] + options["inference_queue"], thread_name_prefix="face"
+        )
+        stats = {"scan": [], "verify": [], "qr": [], "shed": 0, "errors": 0, "in_flight": 0, "peak_in_flight": 0}
+        lock = threading.Lock()
+        urls = {
+            "scan": reverse("scanAttendanceQr"),
+            "verify": reverse("verifyAttendanceFace"),
+            "qr": reverse("currentQrToken", args=[session.id]),
+        }
+        payload = {"token": token_value, "classroom_id": session.classroom_id}
+        image = stub_capture_b64()
+
+        def started():
+            with lock:
+                stats["in_flight"] += 1
+                stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+
+        def finished(name, arrived, response):
+            """Record one response; latency counts from when the client connected, queueing included."""
+            with lock:
+                stats["in_flight"] -= 1
+                if response.status_code == 503:
+                    stats["shed"] += 1
+                elif response.status_code != 200:
+                    stats["errors"] += 1
+                else:
+                    stats[name].append((time.perf_counter() - arrived) * 1000)
+            return response
+
+        patches = (
+            mock.patch("student_app.views.get_face_models", return_value=stub_face_models(options["inference_ms"])),
+            mock.patch("student_app.views.face_admission", return_value=controller),
+            mock.patch("student_app.views.face_executor", return_value=executor),
+        )
+        for patch in patches:
+            patch.start()
+        try:
+            runner = self.run_wsgi if mode == MODE_WSGI else self.run_asgi_storm
+            requests, elapsed = runner(teacher, students, urls, payload, image, started, finished, options)
+        finally:
+            for patch in patches:
+                patch.stop()
+            executor.shutdown()
+
+        def percentiles(samples):
+            ordered = sorted(samples) or [0.0]
+            return statistics.median(ordered), ordered[int(0.95 * (len(ordered) - 1))]
+
+        return {
+            "mode": mode,
+            "throughput": requests / elapsed,
+            "scan": percentiles(stats["scan"]),
+            "verify": percentiles(stats["verify"]),
+            "qr": percentiles(stats["qr"]),
+            "shed": stats["shed"],
+            "errors": stats["errors"],
+            "peak_in_flight": stats["peak_in_flight"],
+        }
+
+    def run_wsgi(self, teacher, students, urls, payload, image, started, finished, options):
+        """Every student connects at once; only --wsgi-threads requests are served at a time."""
+        clients = {}
+        for student in students:
+            clients[student.id] = Client()
+            clients[student.id].force_login(student.user)
+        teacher_client = Client()
+        teacher_client.force_login(teacher.user)
+
+        def student_flow(student, arrived):
+            client = clients[student.id]
+            try:
+                started()
+                response = finished("scan", arrived, client.post(urls["scan"], payload, content_type="application/json"))
+                if response.status_code != 200:
+                    return 1
+                body = {"attendance_id": response.json()["attendance_id"], "image": image}
+                started()
+                finished("verify", time.perf_counter(), client.post(urls["verify"], body, content_type="application/json"))
+                return 2
+            finally:
+                close_old_connections()
+
+        def qr_poll(arrived):
+            try:
+                started()
+                finished("qr", arrived, teacher_client.get(urls["qr"]))
+                return 1
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=options["wsgi_threads"]) as pool:
+            arrived = time.perf_counter()
+            polls = [pool.submit(qr_poll, arrived) for _ in range(options["qr_polls"])]
+            flows = [pool.submit(student_flow, student, arrived) for student in students]
+            requests = sum(future.result() for future in flows + polls)
+        return requests, time.perf_counter() - arrived
+
+    def run_asgi_storm(self, *args):
+        return asyncio.run(self.run_asgi(*args))
+
+    async def run_asgi(self, teacher, students, urls, payload, image, started, finished, options):
+        """Every student connection is an open task on one event loop, as under an ASGI worker."""
+        clients = {}
+        for student in students:
+            clients[student.id] = AsyncClient()
+            await clients[student.id].aforce_login(student.user)
+        teacher_client = AsyncClient()
+        await teacher_client.aforce_login(teacher.user)
+
+        async def request(name, arrived, call):
+            # One sync-thread context per request, like the ASGI handler.
+            async with ThreadSensitiveContext():
+                started()
+                return finished(name, arrived, await call())
+
+        async def student_flow(student, arrived):
+            client = clients[student.id]
+            response = await request(
+                "scan", arrived, lambda: client.post(urls["scan"], payload, content_type="application/json")
+            )
+            if response.status_code != 200:
+                return 1
+            body = {"attendance_id": response.json()["attendance_id"], "image": image}
+            await request(
+                "verify",
+                time.perf_counter(),
+                lambda: client.post(urls["verify"], body, content_type="application/json"),
+            )
+            return 2
+
+        async def qr_poll(arrived):
+            await request("qr", arrived, lambda: teacher_client.get(urls["qr"]))
+            return 1
+
+        arrived = time.perf_counter()
+        done = await asyncio.gather(
+            *(qr_poll(arrived) for _ in range(options["qr_polls"])),
+            *(student_flow(student, arrived) for student in students),
+        )
+        return sum(done), time.perf_counter() - arrived
@@ -0,0 +1,60 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = "Load-test the login pipeline: concurrent authenticate() calls, reported as logins/sec/core."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True, help="Enrollment id or roll of an existing account.")
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--logins", type=int, default=200, help="Total logins to run.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Simulated request threads.")
+
+    def handle(self, *args, **options):
+        username, password = options["username"], options["password"]
+        # Warm-up: also upgrades the stored hash to the configured cost before measuring.
+        user = authenticate(None, username=username, password=password)
+        if user is None:
+            raise CommandError("Credentials rejected.")
+
+        def one_login(_):
+            started = time.perf_counter()
+            try:
+                ok = authenticate(None, username=username, password=password) is not None
+            finally:
+                # Each simulated request thread has its own connection; release it.
+                connection.close()
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(one_login, range(options["logins"])))
+        elapsed = time.perf_counter() - started
+
+        failures = sum(1 for ok, _ in results if not ok)
+        latencies = sorted(latency * 1000 for _, latency in results)
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        rate = len(results) / elapsed
+        hasher = get_hasher()
+        self.stdout.write(f"Hasher: {hasher.algorithm} ({getattr(hasher, 'iterations', '-')} iterations)")
+        self.stdout.write(
+            f"Hash workers: {getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count()}, "
+            f"request threads: {options['concurrency']}, cores: {cores}"
+        )
+        self.stdout.write(
+            f"Latency ms: p50 {statistics.median(latencies):.1f}, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f}, max {latencies[-1]:.1f}"
+        )
+        style = self.style.SUCCESS if not failures else self.style.ERROR
+        self.stdout.write(
+            style(f"{len(results)} logins ({failures} failed) in {elapsed:.2f}s: {rate:.1f}/s, {rate / cores:.1f}/s/core")
+        )
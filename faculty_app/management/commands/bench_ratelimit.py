@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from sams_main.ratelimit import RateLimitMiddleware, ratelimit
+
+BUDGET_MS = 1.0
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark the rate limiter: per-request overhead of the decorator and middleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20000)
+        parser.add_argument("--clients", type=int, default=500, help="Distinct client IPs to spread hits over.")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        total = options["requests"]
+        requests = []
+        for i in range(total):
+            request = factory.post("/attendance/student/scan/", REMOTE_ADDR=f"10.0.{(i % options['clients']) // 250}.{i % 250}")
+            request.user = AnonymousUser()
+            requests.append(request)
+
+        def endpoint(request):
+            return HttpResponse()
+
+        # Limits high enough that every request is allowed: measure the counting path, not 429 rendering.
+        limited = ratelimit("bench", "1000000/m")(endpoint)
+        middleware = RateLimitMiddleware(endpoint)
+        with override_settings(RATELIMIT_ENABLE=True, RATELIMIT_GLOBAL_RATE="1000000/m"):
+            baseline = self._time(endpoint, requests)
+            decorator_cost = self._time(limited, requests) - baseline
+            middleware_cost = self._time(middleware, requests) - baseline
+
+        for label, seconds in (("decorator", decorator_cost), ("middleware", middleware_cost)):
+            per_request_ms = seconds * 1000 / total
+            style = self.style.SUCCESS if per_request_ms < BUDGET_MS else self.style.ERROR
+            self.stdout.write(style(f"{label:<11} {per_request_ms * 1000:8.1f} us/request (budget {BUDGET_MS:.0f} ms)"))
+
+    @staticmethod
+    def _time(handler, requests):
+        started = time.perf_counter()
+        for request in requests:
+            handler(request)
+        return time.perf_counter() - started
@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+BASELINE_ENGINE = "django.contrib.sessions.backends.db"
+
+
+class _SessionWriteCounter:
+    """execute_wrapper counting INSERT/UPDATE/DELETE statements against django_session."""
+
+    def __init__(self):
+        self.writes = 0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        head = sql.lstrip()[:6].upper()
+        if "django_session" in sql and head in ("INSERT", "UPDATE", "DELETE"):
+            self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark login + dashboard throughput per session engine "
+        "(runs against the configured database with an existing account)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True, help="Enrollment id or roll of an existing account.")
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--iterations", type=int, default=20, help="Logins per engine.")
+        parser.add_argument("--dashboard-hits", type=int, default=5, help="Dashboard requests after each login.")
+        parser.add_argument(
+            "--engines",
+            default="baseline," + ",".join(settings.SESSION_BACKENDS),
+            help="Comma separated: baseline (Django db engine) and/or keys of SESSION_BACKENDS.",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).select_related("teacher", "student").first()
+        if user is None:
+            raise CommandError("Unknown username.")
+        if hasattr(user, "teacher"):
+            login_data = {"roles": "faculty", "enrollment_id": user.username, "password": options["password"]}
+            dashboard_url = reverse("fdashboard")
+        elif hasattr(user, "student"):
+            login_data = {"roles": "student", "roll": user.username, "password": options["password"]}
+            dashboard_url = reverse("sdashboard")
+        else:
+            raise CommandError("User has no teacher or student profile.")
+
+        engines = {"baseline": BASELINE_ENGINE, **settings.SESSION_BACKENDS}
+        self.stdout.write(f"{'engine':<12}{'req/s':>10}{'ms/login':>11}{'ms/dash':>10}{'sess writes':>13}{'queries':>9}")
+        for name in options["engines"].split(","):
+            name = name.strip()
+            if name not in engines:
+                raise CommandError(f"Unknown engine '{name}'.")
+            self._run(name, engines[name], login_data, dashboard_url, options)
+
+    def _run(self, name, engine, login_data, dashboard_url, options):
+        counter = _SessionWriteCounter()
+        login_seconds = dashboard_seconds = 0.0
+        requests = 0
+        with override_settings(
+            SESSION_ENGINE=engine, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"], RATELIMIT_ENABLE=False
+        ):
+            with connection.execute_wrapper(counter):
+                for _ in range(options["iterations"]):
+                    client = Client()
+                    started = time.perf_counter()
+                    response = client.post(reverse("login"), login_data)
+                    login_seconds += time.perf_counter() - started
+                    if response.status_code != 302:
+                        raise CommandError(f"Login failed with {engine} (status {response.status_code}).")
+                    started = time.perf_counter()
+                    for _ in range(options["dashboard_hits"]):
+                        client.get(dashboard_url)
+                    dashboard_seconds += time.perf_counter() - started
+                    requests += 1 + options["dashboard_hits"]
+                    client.post(reverse("logout"))
+
+        iterations = options["iterations"]
+        dashboard_count = max(iterations * options["dashboard_hits"], 1)
+        self.stdout.write(
+            f"{name:<12}{requests / (login_seconds + dashboard_seconds):>10.1f}"
+            f"{login_seconds * 1000 / iterations:>11.1f}{dashboard_seconds * 1000 / dashboard_count:>10.2f}"
+            f"{counter.writes:>13}{counter.queries:>9}"
+        )
@@ -0,0 +1,194 @@
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from faculty_app.models import Attendance, AttendanceSession, ClassRoom, RollingQRToken, Section, Teacher
+from student_app.models import Student
+
+PROFILE_STOCK = "stock"
+PROFILE_TUNED = "tuned"
+
+
+def profile_options(profile):
+    """OPTIONS for a benchmark database: Django defaults, or the SQLITE_* settings."""
+    if profile == PROFILE_STOCK:
+        return {}
+    return dict(settings.SQLITE_OPTIONS)
+
+
+class Command(BaseCommand):
+    help = (
+        "Scan-storm benchmark on throwaway SQLite files: concurrent scan/verify writers plus "
+        "live-view readers, comparing Django's stock SQLite options with the SQLITE_* profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=1000, help="Scans per run (one per student).")
+        parser.add_argument("--writers", type=int, default=16, help="Concurrent scanning threads.")
+        parser.add_argument("--readers", type=int, default=4, help="Threads polling the live attendance count.")
+        parser.add_argument(
+            "--profiles",
+            default=f"{PROFILE_STOCK},{PROFILE_TUNED}",
+            help=f"Comma-separated profiles to run ({PROFILE_STOCK}, {PROFILE_TUNED}).",
+        )
+
+    def handle(self, *args, **options):
+        profiles = [name.strip() for name in options["profiles"].split(",") if name.strip()]
+        unknown = set(profiles) - {PROFILE_STOCK, PROFILE_TUNED}
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(sorted(unknown))}")
+
+        workdir = Path(tempfile.mkdtemp(prefix="sams-bench-"))
+        try:
+            results = [self.run_profile(profile, workdir, options) for profile in profiles]
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        self.stdout.write(
+            f"{'profile':<8} {'scans/s':>9} {'errors':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'reads/s':>9}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['profile']:<8} {row['throughput']:>9.1f} {row['error_rate']:>7.1%} "
+                f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['max']:>8.1f} {row['reads']:>9.1f}"
+            )
+
+    def run_profile(self, profile, workdir, options):
+        alias = f"bench_{profile}"
+        connections.settings[alias] = {
+            **connections["default"].settings_dict,
+            "NAME": str(workdir / f"{profile}.sqlite3"),
+            "OPTIONS": profile_options(profile),
+        }
+        try:
+            call_command("migrate", database=alias, verbosity=0)
+            session, token, students = self.seed(alias, options["students"])
+            return self.storm(alias, profile, session, token, students, options)
+        finally:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+    def seed(self, alias, count):
+        password = make_password(None)
+        with transaction.atomic(using=alias):
+            teacher_user = User.objects.db_manager(alias).create(username="teacher-bench", password=password)
+            teacher = Teacher.objects.using(alias).create(
+                user=teacher_user, name="Bench", enrollment_id="BENCH", department="CSE", designation="AP"
+            )
+            section = Section.objects.using(alias).create(name="Bench", code="BENCH-01", expected_strength=count)
+            classroom = ClassRoom.objects.using(alias).create(subject_name="Bench", section=section, teacher=teacher)
+            session = AttendanceSession.objects.using(alias).create(classroom=classroom, teacher=teacher)
+            token = RollingQRToken.objects.using(alias).create(
+                session=session, expires_at=timezone.now() + timedelta(hours=1)
+            )
+            User.objects.db_manager(alias).bulk_create(
+                [User(username=f"bench-{idx}", password=password) for idx in range(count)]
+            )
+            user_ids = User.objects.using(alias).filter(username__startswith="bench-").values_list("id", flat=True)
+            Student.objects.using(alias).bulk_create(
+                [
+                    Student(user_id=user_id, name=f"S{idx}", roll=idx + 1, section=section, mail_verified=True)
+                    for idx, user_id in enumerate(user_ids)
+                ]
+            )
+        students = list(Student.objects.using(alias).values_list("id", flat=True))
+        return session, token.token, students
+
+    def scan_and_verify(self, alias, session_id, token_value, student_id):
+        """The database work of one scan followed by a successful face check."""
+        qr_token = (
+            RollingQRToken.objects.using(alias).select_related("session")
+            .filter(token=token_value, is_active=True).first()
+        )
+        with transaction.atomic(using=alias):
+            attendance, created = Attendance.objects.using(alias).get_or_create(
+                session_id=session_id,
+                student_id=student_id,
+                defaults={"status": Attendance.STATUS_PENDING_FACE, "scanned_token": qr_token},
+            )
+        with transaction.atomic(using=alias):
+            attendance = Attendance.objects.using(alias).get(id=attendance.id)
+            now = timezone.now()
+            attendance.status = Attendance.STATUS_PRESENT
+            attendance.face_checked_at = now
+            attendance.marked_at = now
+            attendance.face_score = 0.9
+            attendance.save(update_fields=["status", "face_checked_at", "marked_at", "face_score"])
+
+    def storm(self, alias, profile, session, token_value, students, options):
+        pending = list(students)
+        lock = threading.Lock()
+        latencies, errors = [], []
+        reads = [0]
+        writers_done = threading.Event()
+
+        def writer():
+            try:
+                while True:
+                    with lock:
+                        if not pending:
+                            return
+                        student_id = pending.pop()
+                    started = time.perf_counter()
+                    try:
+                        self.scan_and_verify(alias, session.id, token_value, student_id)
+                    except OperationalError as exc:
+                        with lock:
+                            errors.append(str(exc))
+                        continue
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+            finally:
+                connections[alias].close()
+
+        def reader():
+            try:
+                while not writers_done.is_set():
+                    try:
+                        Attendance.objects.using(alias).filter(session_id=session.id).count()
+                    except OperationalError:
+                        continue
+                    with lock:
+                        reads[0] += 1
+            finally:
+                connections[alias].close()
+
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        writers = [threading.Thread(target=writer) for _ in range(options["writers"])]
+        started = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writers_done.set()
+        for thread in readers:
+            thread.join()
+
+        attempts = len(latencies) + len(errors)
+        ordered = sorted(latencies) or [0.0]
+        if errors:
+            self.stdout.write(f"{profile}: {len(errors)} error(s), e.g. {errors[0]}")
+        return {
+            "profile": profile,
+            "throughput": len(latencies) / elapsed,
+            "error_rate": len(errors) / max(attempts, 1),
+            "p50": statistics.median(ordered),
+            "p95": ordered[int(0.95 * (len(ordered) - 1))],
+            "max": ordered[-1],
+            "reads": reads[0] / elapsed,
+        }
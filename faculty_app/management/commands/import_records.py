@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from faculty_app.importers import IMPORTERS, RowError, StudentImporter
+from faculty_app.provisioning import DEFAULT_ACCOUNT_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV of master faculty, students or classes and upsert it by natural key "
+        "(enrollment_id / roll / section_code+subject_name) in chunked transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTERS), help="What the CSV contains.")
+        parser.add_argument("csv_path", help="Path to a UTF-8 CSV file with a header row.")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Rows validated and written per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate and diff only; write nothing.")
+        parser.add_argument(
+            "--password",
+            default=DEFAULT_ACCOUNT_PASSWORD,
+            help="Password for newly created student accounts.",
+        )
+        parser.add_argument("--progress-every", type=int, default=10, help="Print progress every N chunks (0 = off).")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        importer_class = IMPORTERS[options["kind"]]
+        kwargs = {"dry_run": options["dry_run"]}
+        if importer_class is StudentImporter:
+            kwargs["password"] = options["password"]
+        importer = importer_class(**kwargs)
+
+        started = time.monotonic()
+        chunks = 0
+
+        def on_chunk(stats):
+            nonlocal chunks
+            chunks += 1
+            every = options["progress_every"]
+            if every and chunks % every == 0:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"  {stats['read']} rows, {stats['read'] / elapsed:,.0f} rows/s")
+
+        try:
+            with open(options["csv_path"], newline="", encoding="utf-8-sig") as handle:
+                stats = importer.run(handle, options["chunk_size"], on_chunk)
+        except OSError as exc:
+            raise CommandError(f"Cannot read {options['csv_path']}: {exc}")
+        except RowError as exc:
+            raise CommandError(str(exc))
+        except IntegrityError as exc:
+            raise CommandError(
+                f"Chunk {chunks + 1} rolled back ({exc}); earlier chunks were committed, re-run after fixing the file."
+            )
+
+        elapsed = time.monotonic() - started
+        for error in importer.errors:
+            self.stderr.write(f"  {error}")
+        if stats["invalid"] > len(importer.errors):
+            self.stderr.write(f"  ... {stats['invalid'] - len(importer.errors)} more invalid row(s)")
+
+        prefix = "[dry run] would have " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}{options['kind']}: read {stats['read']}, created {stats['created']}, "
+                f"updated {stats['updated']}, unchanged {stats['unchanged']}, invalid {stats['invalid']}, "
+                f"duplicate keys {stats['duplicate']} in {elapsed:.2f}s "
+                f"({stats['read'] / max(elapsed, 1e-9):,.0f} rows/s)."
+            )
+        )
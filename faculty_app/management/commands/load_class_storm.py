@@ -0,0 +1,319 @@
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from faculty_app.deletion import run_plan, student_deletion_plan, teacher_deletion_plan
+from faculty_app.models import ClassRoom, Section, Teacher
+from student_app.face_stub import STUB_EMBEDDING, stub_capture_b64
+from student_app.models import Student
+
+STORM_PREFIX = "storm-"
+SECTION_CODE = "STORM-01"
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000)
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class EndpointStats:
+    """Latency, status and DB-write samples of one endpoint (thread-safe)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.statuses = Counter()
+        self.writes = []
+        self.retries = 0
+
+    def record(self, status, latency_ms, writes):
+        with self.lock:
+            self.latencies.append(latency_ms)
+            self.statuses[status] += 1
+            if writes is not None:
+                self.writes.append(writes)
+
+    def count_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def summary(self):
+        ordered = sorted(self.latencies) or [0.0]
+        total = sum(self.statuses.values())
+        errors = sum(count for status, count in self.statuses.items() if not 200 <= status < 300)
+        histogram = [0] * (len(BUCKETS_MS) + 1)
+        for latency in self.latencies:
+            histogram[next((i for i, bound in enumerate(BUCKETS_MS) if latency <= bound), len(BUCKETS_MS))] += 1
+        return {
+            "requests": total,
+            "error_rate": errors / total if total else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+            "retries": self.retries,
+            "p50_ms": statistics.median(ordered),
+            "p95_ms": ordered[int(0.95 * (len(ordered) - 1))],
+            "p99_ms": ordered[int(0.99 * (len(ordered) - 1))],
+            "max_ms": ordered[-1],
+            "db_writes": sum(self.writes) if self.writes else None,
+            "db_writes_per_request": statistics.mean(self.writes) if self.writes else None,
+            "histogram": histogram,
+        }
+
+
+class StormClient:
+    """One browser: session + CSRF cookies, a fresh HTTP connection per request (status 0 = connection error)."""
+
+    def __init__(self, base_url, session_key, timeout, stats):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.stats = stats
+        self.csrf = get_random_string(32)
+        self.cookie = f"{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={self.csrf}"
+
+    def call(self, endpoint, method, path, payload=None):
+        """Returns (status, decoded JSON body or None, Retry-After seconds or None)."""
+        headers = {"Cookie": self.cookie, "X-CSRFToken": self.csrf, "Accept": "application/json"}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers["Content-Type"] = "application/json"
+        started = time.perf_counter()
+        connection = self.connection_class(self.netloc, timeout=self.timeout)
+        try:
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            raw = response.read()
+            status = response.status
+            writes = response.getheader("X-SAMS-DB-Writes")
+            retry_after = response.getheader("Retry-After")
+        except (OSError, http.client.HTTPException):
+            status, raw, writes, retry_after = 0, b"", None, None
+        finally:
+            connection.close()
+        self.stats[endpoint].record(status, (time.perf_counter() - started) * 1000, int(writes) if writes else None)
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        return status, data, float(retry_after) if retry_after else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduce the start-of-class storm against a running server: a teacher starts attendance and "
+        "polls the QR while N students scan and verify their face concurrently. Seeds (and removes) "
+        "'storm-*' users in the server's database. Start the server with SAMS_FACE_STUB_MS=<ms> to stub "
+        "face inference and SAMS_DB_STATS_HEADERS=1 to get database write counts per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server under test.")
+        parser.add_argument("--students", type=int, default=120, help="Students in the class.")
+        parser.add_argument("--concurrency", type=int, default=60, help="Students acting at the same time.")
+        parser.add_argument("--ramp-seconds", type=float, default=5.0, help="Spread student arrivals over this window.")
+        parser.add_argument("--poll-interval", type=float, default=3.0, help="Teacher QR poll interval (dashboard: 3 s).")
+        parser.add_argument("--retries", type=int, default=3, help="Retries per step on 429/5xx/expired token.")
+        parser.add_argument("--backoff", type=float, default=0.5, help="Base retry delay; doubles per attempt.")
+        parser.add_argument(
+            "--ignore-retry-after", action="store_true", help="Use --backoff even when the server sends Retry-After."
+        )
+        parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded users and attendance afterwards.")
+
+    def handle(self, *args, **options):
+        if options["students"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--students and --concurrency must be positive.")
+        if User.objects.filter(username__startswith=STORM_PREFIX).exists():
+            raise CommandError(f"Leftover '{STORM_PREFIX}*' users found; remove them (or the last --keep run) first.")
+
+        teacher, classroom, students = self.seed(options["students"])
+        session_keys = {}
+        try:
+            session_keys = {user.id: self.open_session(user) for user in [teacher.user] + [s.user for s in students]}
+            stats = defaultdict(EndpointStats)
+            outcome, elapsed = self.storm(teacher, classroom, students, session_keys, stats, options)
+        finally:
+            if not options["keep"]:
+                self.cleanup(teacher, classroom, students, session_keys)
+
+        self.report(stats, outcome, elapsed, options)
+
+    def seed(self, count):
+        password = make_password(None)
+        with transaction.atomic():
+            teacher_user = User.objects.create(username=f"{STORM_PREFIX}teacher", password=password)
+            teacher = Teacher.objects.create(
+                user=teacher_user, name="Storm Teacher", enrollment_id=f"{STORM_PREFIX}T", department="CSE",
+                designation="AP", is_registered=True, mail_verified=True,
+            )
+            section = Section.objects.create(name="Storm", code=SECTION_CODE, expected_strength=count)
+            classroom = ClassRoom.objects.create(subject_name="Storm", section=section, teacher=teacher)
+            User.objects.bulk_create([User(username=f"{STORM_PREFIX}{idx}", password=password) for idx in range(count)])
+            user_ids = (
+                User.objects.filter(username__startswith=STORM_PREFIX).exclude(id=teacher_user.id).values_list("id", flat=True)
+            )
+            max_roll = Student.objects.order_by("-roll").values_list("roll", flat=True).first() or 0
+            Student.objects.bulk_create(
+                [
+                    Student(
+                        user_id=user_id, name=f"Storm {idx}", roll=max_roll + idx + 1, section=section,
+                        mail_verified=True, face_embedding=STUB_EMBEDDING, face_verified=True,
+                    )
+                    for idx, user_id in enumerate(user_ids)
+                ]
+            )
+        students = list(Student.objects.filter(section=section).select_related("user").order_by("roll"))
+        return teacher, classroom, students
+
+    def open_session(self, user):
+        """Log the user in by writing a session directly (the storm starts after everyone has logged in)."""
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store[SESSION_KEY] = str(user.pk)
+        store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.save()
+        return store.session_key
+
+    def cleanup(self, teacher, classroom, students, session_keys):
+        engine = import_module(settings.SESSION_ENGINE)
+        for session_key in session_keys.values():
+            engine.SessionStore(session_key).delete()
+        run_plan(student_deletion_plan([student.id for student in students]), pause=0)
+        run_plan(teacher_deletion_plan([teacher.id]), pause=0)
+        Section.objects.filter(id=classroom.section_id).delete()
+
+    def storm(self, teacher, classroom, students, session_keys, stats, options):
+        base_url, timeout = options["base_url"], options["timeout"]
+        teacher_client = StormClient(base_url, session_keys[teacher.user_id], timeout, stats)
+        status, data, _ = teacher_client.call(
+            "startAttendanceSession", "POST", reverse("startAttendanceSession", args=[classroom.id])
+        )
+        if status != 200:
+            raise CommandError(f"Could not start the session ({status}): {data}. Is the server running at {base_url}?")
+        session_id = data["session_id"]
+        current = {"token": data["token"]}
+        students_done = threading.Event()
+
+        def teacher_loop():
+            # The projector page: poll the rotating QR until the class is done.
+            while not students_done.wait(options["poll_interval"]):
+                status, data, _ = teacher_client.call("currentQrToken", "GET", reverse("currentQrToken", args=[session_id]))
+                if status == 200:
+                    current["token"] = data["token"]
+
+        def delay(attempt, retry_after):
+            if retry_after is not None and not options["ignore_retry_after"]:
+                return retry_after
+            return options["backoff"] * (2 ** attempt) * random.uniform(0.8, 1.2)
+
+        def with_retries(client, endpoint, path, make_payload, refresh_on_400=False):
+            for attempt in range(options["retries"] + 1):
+                status, data, retry_after = client.call(endpoint, "POST", path, make_payload())
+                if status == 200:
+                    return data
+                if attempt == options["retries"]:
+                    break
+                retryable = status == 0 or status in RETRY_STATUSES
+                # A token that rotated between reading and posting: read the projector again.
+                stale_token = refresh_on_400 and status == 400 and "token" in str((data or {}).get("error", "")).lower()
+                if not (retryable or stale_token):
+                    break
+                stats[endpoint].count_retry()
+                time.sleep(delay(attempt, retry_after))
+            return None
+
+        image = stub_capture_b64()
+        arrivals = {
+            student.id: index * options["ramp_seconds"] / len(students) for index, student in enumerate(students)
+        }
+        outcome = Counter()
+        outcome_lock = threading.Lock()
+        started = time.perf_counter()
+
+        def student_flow(student):
+            wait = started + arrivals[student.id] - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            client = StormClient(base_url, session_keys[student.user_id], timeout, stats)
+            scanned = with_retries(
+                client,
+                "scanAttendanceQr",
+                reverse("scanAttendanceQr"),
+                lambda: {"token": current["token"], "classroom_id": classroom.id},
+                refresh_on_400=True,
+            )
+            result = "scan_failed"
+            if scanned:
+                verified = with_retries(
+                    client,
+                    "verifyAttendanceFace",
+                    reverse("verifyAttendanceFace"),
+                    lambda: {"attendance_id": scanned["attendance_id"], "image": image},
+                )
+                result = "verify_failed" if not verified else ("present" if verified.get("match") else "face_mismatch")
+            with outcome_lock:
+                outcome[result] += 1
+
+        poller = threading.Thread(target=teacher_loop, daemon=True)
+        poller.start()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(student_flow, students))
+        elapsed = time.perf_counter() - started
+        students_done.set()
+        poller.join()
+        teacher_client.call("stopAttendanceSession", "POST", reverse("stopAttendanceSession", args=[session_id]))
+        return outcome, elapsed
+
+    def report(self, stats, outcome, elapsed, options):
+        summaries = {endpoint: endpoint_stats.summary() for endpoint, endpoint_stats in stats.items()}
+        self.stdout.write(
+            f"{options['students']} students, concurrency {options['concurrency']}, "
+            f"ramp {options['ramp_seconds']}s: finished in {elapsed:.1f}s"
+        )
+        self.stdout.write("Outcome: " + ", ".join(f"{name}={count}" for name, count in sorted(outcome.items())))
+        self.stdout.write(
+            f"\n{'endpoint':<24} {'reqs':>6} {'err%':>6} {'retries':>7} {'p50':>8} {'p95':>8} {'p99':>8} "
+            f"{'max':>8} {'writes':>7} {'w/req':>6}  statuses"
+        )
+        for endpoint, row in summaries.items():
+            writes = "-" if row["db_writes"] is None else str(row["db_writes"])
+            per_request = "-" if row["db_writes_per_request"] is None else f"{row['db_writes_per_request']:.1f}"
+            self.stdout.write(
+                f"{endpoint:<24} {row['requests']:>6} {row['error_rate'] * 100:>5.1f}% {row['retries']:>7} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} "
+                f"{writes:>7} {per_request:>6}  {row['statuses']}"
+            )
+
+        labels = [f"<={bound}ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        for endpoint, row in summaries.items():
+            self.stdout.write(f"\n{endpoint} latency histogram")
+            peak = max(row["histogram"]) or 1
+            for label, count in zip(labels, row["histogram"]):
+                self.stdout.write(f"  {label:>9} {count:>6} {'#' * round(40 * count / peak)}")
+        if any(row["db_writes"] is None for row in summaries.values()):
+            self.stdout.write("\nDB write counts need the server to run with SAMS_DB_STATS_HEADERS=1.")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as handle:
+                json.dump(
+                    {"elapsed_s": elapsed, "outcome": dict(outcome), "buckets_ms": BUCKETS_MS, "endpoints": summaries},
+                    handle,
+                    indent=2,
+                )
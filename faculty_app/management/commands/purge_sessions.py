@@ -0,0 +1,34 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired django_session rows in small batches (short write locks, safe during class hours)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows deleted per statement.")
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        cutoff = timezone.now()
+        deleted = 0
+        started = time.monotonic()
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=cutoff).values_list("session_key", flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            count, _ = Session.objects.filter(session_key__in=keys).delete()
+            deleted += count
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        # Cache-only sessions expire through the cache TTL; nothing to clean up there.
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} expired session(s) in {time.monotonic() - started:.2f}s.")
+        )
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from faculty_app.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (reports, bulk admin actions) from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to sleep when idle.")
+        parser.add_argument("--max-jobs", type=int, default=0, help="Exit after this many jobs (0 = no limit).")
+
+    def handle(self, *args, **options):
+        once = options["once"]
+        poll_interval = options["poll_interval"]
+        max_jobs = options["max_jobs"]
+        processed = 0
+
+        self.stdout.write("Job worker started.")
+        while True:
+            # Long-lived process: drop connections that exceeded CONN_MAX_AGE or broke.
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            started = time.monotonic()
+            self.stdout.write(f"Running {job.kind} job #{job.id}...")
+            job = run_job(job)
+            elapsed = time.monotonic() - started
+            style = self.style.SUCCESS if job.status == job.STATUS_DONE else self.style.ERROR
+            self.stdout.write(style(f"Job #{job.id} {job.status} in {elapsed:.2f}s: {job.message}"))
+
+            processed += 1
+            if max_jobs and processed >= max_jobs:
+                break
+
+        self.stdout.write(f"Job worker stopped after {processed} job(s).")
@@ -0,0 +1,87 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from faculty_app.models import AttendanceSession
+from faculty_app.timetable import intervals_started_within, scheduled_end
+
+
+class Command(BaseCommand):
+    help = "Auto-start and auto-close attendance sessions from the timetable index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--auto-start",
+            action="store_true",
+            default=getattr(settings, "TIMETABLE_AUTO_START", False),
+            help="Open a live session for classes that just started and have none today.",
+        )
+        parser.add_argument(
+            "--no-auto-close",
+            action="store_true",
+            help="Do not close live sessions whose timetable slot has ended.",
+        )
+        parser.add_argument("--start-window", type=int, default=5, help="Minutes after slot start to auto-start.")
+        parser.add_argument(
+            "--close-grace",
+            type=int,
+            default=getattr(settings, "TIMETABLE_CLOSE_GRACE_MINUTES", 10),
+            help="Minutes after slot end before a live session is closed.",
+        )
+        parser.add_argument("--loop", type=int, default=0, help="Repeat every N seconds (0 = run once).")
+        parser.add_argument("--dry-run", action="store_true", help="Report actions without writing.")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            started = self._auto_start(options) if options["auto_start"] else 0
+            closed = 0 if options["no_auto_close"] else self._auto_close(options)
+            prefix = "[dry-run] " if options["dry_run"] else ""
+            self.stdout.write(f"{prefix}Sessions started: {started}, closed: {closed}")
+            if not options["loop"]:
+                break
+            time.sleep(options["loop"])
+
+    def _auto_start(self, options):
+        intervals = intervals_started_within(options["start_window"])
+        if not intervals:
+            return 0
+        today = timezone.localdate()
+        class_ids = {interval.classroom_id for interval in intervals}
+        # One query for all candidates: classes already having a session today are skipped.
+        already = set(
+            AttendanceSession.objects.filter(classroom_id__in=class_ids, session_date=today)
+            .values_list("classroom_id", flat=True)
+        )
+        to_start = {
+            interval.classroom_id: interval.teacher_id
+            for interval in intervals
+            if interval.classroom_id not in already
+        }
+        if not options["dry_run"]:
+            for classroom_id, teacher_id in to_start.items():
+                AttendanceSession.objects.create(
+                    classroom_id=classroom_id,
+                    teacher_id=teacher_id,
+                    is_live=True,
+                    qr_validity_seconds=15,
+                )
+        return len(to_start)
+
+    def _auto_close(self, options):
+        now = timezone.now()
+        grace = timedelta(minutes=options["close_grace"])
+        closed = 0
+        live_sessions = AttendanceSession.objects.filter(is_live=True).only("id", "classroom_id", "started_at")
+        for session in live_sessions:
+            end = scheduled_end(session.classroom_id, session.started_at)
+            if end is None or end + grace > now:
+                continue
+            if not options["dry_run"]:
+                session.close(ended_at=now)
+            closed += 1
+        return closed
@@ -1,16 +1,64 @@
-from datetime import time
+import time as clock
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
 
+import numpy as np
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
+from django.utils import timezone
 
-from faculty_app.models import ClassRoom, MasterFaculty, Section, Teacher
+from faculty_app.models import Attendance, AttendanceSession, ClassRoom, MasterFaculty, Section, Teacher
 from student_app.models import Student
 
+SUBJECTS_POOL = [
+    "Computer Networks",
+    "Operating Systems",
+    "Database Systems",
+    "Software Engineering",
+    "Data Structures",
+    "Algorithms",
+    "Machine Learning",
+    "Web Technologies",
+    "Compiler Design",
+    "Cloud Computing",
+]
+
+ROLL_SEED = 2300000
+# Embedding size of InceptionResnetV1 (the model used for real face registration).
+FACE_TEMPLATE_DIM = 512
+
+
+@contextmanager
+def historical_timestamps(*fields):
+    """
+    Let bulk_create keep explicit values for auto_now_add fields (historical started_at).
+    Only for this single-threaded seeding command.
+    """
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _default_end(start):
+    """One hour after `start`, capped at 23:59 so late classes stay on the same day."""
+    end = datetime.combine(datetime.min, start) + timedelta(hours=1)
+    return min(end, datetime.combine(datetime.min, time(23, 59))).time()
+
 
 class Command(BaseCommand):
-    help = "Seed demo data: teachers, sections, students, and classes."
+    help = "Seed demo data: teachers, sections, students, classes, and optionally attendance history."
 
     def add_arguments(self, parser):
         parser.add_argument("--teachers", type=int, default=20)
@@ -18,125 +66,446 @@ class Command(BaseCommand):
         parser.add_argument("--students-per-section", type=int, default=40)
         parser.add_argument("--subjects-per-section", type=int, default=5)
         parser.add_argument("--password", type=str, default="Pass@123")
+        parser.add_argument(
+            "--fast",
+            action="store_true",
+            help="Bulk upserts instead of update_or_create per row (for load-test sized datasets).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk INSERT in fast mode.")
+        parser.add_argument(
+            "--history-weeks",
+            type=int,
+            default=0,
+            help="Generate closed attendance sessions for every weekday of the last N weeks.",
+        )
+        parser.add_argument("--attendance-rate", type=float, default=0.85, help="Share of students present.")
+        parser.add_argument(
+            "--face-templates",
+            action="store_true",
+            help="Give every student a random normalized face embedding (marks them face verified).",
+        )
+        parser.add_argument("--face-dim", type=int, default=FACE_TEMPLATE_DIM)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for templates and history.")
+
+    @contextmanager
+    def phase(self, label):
+        self.stdout.write(f"{label}...")
+        started = clock.perf_counter()
+        yield
+        elapsed = clock.perf_counter() - started
+        self.timings.append((label, elapsed))
+        self.stdout.write(f"  done in {elapsed:.2f}s")
 
     @transaction.atomic
     def handle(self, *args, **options):
-        teachers_count = options["teachers"]
-        sections_count = options["sections"]
-        students_per_section = options["students_per_section"]
-        subjects_per_section = options["subjects_per_section"]
+        self.timings = []
+        self.batch_size = options["batch_size"]
+        self.rng = np.random.default_rng(options["seed"])
         password_hash = make_password(options["password"])
 
-        subjects_pool = [
-            "Computer Networks",
-            "Operating Systems",
-            "Database Systems",
-            "Software Engineering",
-            "Data Structures",
-            "Algorithms",
-            "Machine Learning",
-            "Web Technologies",
-            "Compiler Design",
-            "Cloud Computing",
-        ]
+        if options["fast"]:
+            teachers, sections, created_students, classes = self._seed_fast(options, password_hash)
+        else:
+            teachers, sections, created_students, classes = self._seed_row_by_row(options, password_hash)
+            if options["face_templates"]:
+                with self.phase("Generating face templates"):
+                    self._apply_face_templates(sections, options["face_dim"])
 
-        self.stdout.write("Seeding teachers and master faculty...")
-        teachers = []
-        for i in range(1, teachers_count + 1):
-            enrollment_id = f"TCH{i:04d}"
-            email = f"{enrollment_id.lower()}@kiit.ac.in"
-            name = f"Teacher {i:02d}"
-
-            master, _ = MasterFaculty.objects.update_or_create(
-                enrollment_id=enrollment_id,
-                defaults={
-                    "name": name,
-                    "email": email,
-                    "department": "CSE",
-                    "designation": "Assistant Professor",
-                },
-            )
+        created_sessions = created_attendance = 0
+        if options["history_weeks"]:
+            with self.phase("Generating attendance history"):
+                created_sessions, created_attendance = self._seed_history(
+                    classes, options["history_weeks"], options["attendance_rate"]
+                )
 
-            user, _ = User.objects.update_or_create(
-                username=enrollment_id,
-                defaults={"email": email, "password": password_hash},
+        self.stdout.write(self.style.SUCCESS("Demo dataset ready."))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Teachers: {len(teachers)}, Sections: {len(sections)}, "
+                f"Students: {created_students}, Classes: {len(classes)}"
+                + (f", Sessions: {created_sessions}, Attendance rows: {created_attendance}" if options["history_weeks"] else "")
             )
+        )
+        total = sum(elapsed for _, elapsed in self.timings)
+        for label, elapsed in self.timings:
+            self.stdout.write(f"  {label:<36}{elapsed:>8.2f}s")
+        self.stdout.write(f"  {'Total':<36}{total:>8.2f}s")
 
-            teacher, _ = Teacher.objects.update_or_create(
-                enrollment_id=enrollment_id,
-                defaults={
-                    "user": user,
-                    "name": master.name,
-                    "department": master.department,
-                    "designation": master.designation,
-                    "mail_verified": True,
-                    "is_registered": True,
-                },
-            )
-            teachers.append(teacher)
-
-        self.stdout.write("Seeding sections...")
-        sections = []
-        for i in range(1, sections_count + 1):
-            section, _ = Section.objects.update_or_create(
-                code=f"CSE-{i:02d}",
-                defaults={
-                    "name": f"Computer Science Section {i:02d}",
-                    "expected_strength": students_per_section,
-                    "is_active": True,
-                },
-            )
-            sections.append(section)
-
-        self.stdout.write("Seeding students...")
-        roll_seed = 2300000
-        created_students = 0
-        for section_index, section in enumerate(sections, start=1):
-            for student_index in range(1, students_per_section + 1):
-                roll = roll_seed + (section_index * 1000) + student_index
-                username = str(roll)
-                email = f"{roll}@kiit.ac.in"
-                name = f"Student S{section_index:02d}-{student_index:02d}"
+    # ------------------------------------------------------------------ row-by-row (original) mode
+
+    def _seed_row_by_row(self, options, password_hash):
+        teachers_count = options["teachers"]
+        sections_count = options["sections"]
+        students_per_section = options["students_per_section"]
+        subjects_per_section = options["subjects_per_section"]
+
+        with self.phase("Seeding teachers and master faculty"):
+            teachers = []
+            for i in range(1, teachers_count + 1):
+                enrollment_id = f"TCH{i:04d}"
+                email = f"{enrollment_id.lower()}@kiit.ac.in"
+                name = f"Teacher {i:02d}"
+
+                master, _ = MasterFaculty.objects.update_or_create(
+                    enrollment_id=enrollment_id,
+                    defaults={
+                        "name": name,
+                        "email": email,
+                        "department": "CSE",
+                        "designation": "Assistant Professor",
+                    },
+                )
 
                 user, _ = User.objects.update_or_create(
-                    username=username,
+                    username=enrollment_id,
                     defaults={"email": email, "password": password_hash},
                 )
 
-                Student.objects.update_or_create(
-                    roll=roll,
+                teacher, _ = Teacher.objects.update_or_create(
+                    enrollment_id=enrollment_id,
                     defaults={
-                        "name": name,
                         "user": user,
-                        "section": section,
+                        "name": master.name,
+                        "department": master.department,
+                        "designation": master.designation,
                         "mail_verified": True,
-                        "face_verified": False,
+                        "is_registered": True,
                     },
                 )
-                created_students += 1
-
-        self.stdout.write("Seeding class cards...")
-        created_classes = 0
-        for section_i, section in enumerate(sections):
-            for j in range(subjects_per_section):
-                teacher = teachers[(section_i + j) % len(teachers)]
-                subject_name = subjects_pool[j % len(subjects_pool)]
-                ClassRoom.objects.update_or_create(
-                    section=section,
-                    subject_name=subject_name,
+                teachers.append(teacher)
+
+        with self.phase("Seeding sections"):
+            sections = []
+            for i in range(1, sections_count + 1):
+                section, _ = Section.objects.update_or_create(
+                    code=f"CSE-{i:02d}",
                     defaults={
-                        "teacher": teacher,
-                        "start_time": time(9 + (j % 5), 0),
-                        "end_time": time(10 + (j % 5), 0),
+                        "name": f"Computer Science Section {i:02d}",
+                        "expected_strength": students_per_section,
                         "is_active": True,
                     },
                 )
-                created_classes += 1
+                sections.append(section)
 
-        self.stdout.write(self.style.SUCCESS("Demo dataset ready."))
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Teachers: {teachers_count}, Sections: {sections_count}, "
-                f"Students: {created_students}, Classes: {created_classes}"
+        with self.phase("Seeding students"):
+            created_students = 0
+            for section_index, section in enumerate(sections, start=1):
+                for student_index in range(1, students_per_section + 1):
+                    roll = ROLL_SEED + (section_index * 1000) + student_index
+                    username = str(roll)
+                    email = f"{roll}@kiit.ac.in"
+                    name = f"Student S{section_index:02d}-{student_index:02d}"
+
+                    user, _ = User.objects.update_or_create(
+                        username=username,
+                        defaults={"email": email, "password": password_hash},
+                    )
+
+                    Student.objects.update_or_create(
+                        roll=roll,
+                        defaults={
+                            "name": name,
+                            "user": user,
+                            "section": section,
+                            "mail_verified": True,
+                            "face_verified": False,
+                        },
+                    )
+                    created_students += 1
+
+        with self.phase("Seeding class cards"):
+            classes = []
+            for section_i, section in enumerate(sections):
+                for j in range(subjects_per_section):
+                    teacher = teachers[(section_i + j) % len(teachers)]
+                    subject_name = SUBJECTS_POOL[j % len(SUBJECTS_POOL)]
+                    classroom, _ = ClassRoom.objects.update_or_create(
+                        section=section,
+                        subject_name=subject_name,
+                        defaults={
+                            "teacher": teacher,
+                            "start_time": time(9 + (j % 5), 0),
+                            "end_time": time(10 + (j % 5), 0),
+                            "is_active": True,
+                        },
+                    )
+                    classes.append(classroom)
+
+        return teachers, sections, created_students, classes
+
+    # ------------------------------------------------------------------ fast mode
+
+    def _upsert_users(self, accounts, password_hash):
+        """Bulk upsert (username, email) pairs; returns {username: user_id}."""
+        users = [User(username=username, email=email, password=password_hash) for username, email in accounts]
+        User.objects.bulk_create(
+            users,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=["username"],
+            update_fields=["email", "password"],
+        )
+        # Conflicting (updated) rows don't get ids back on every backend: read them once.
+        return dict(
+            User.objects.filter(username__in=[user.username for user in users]).values_list("username", "id")
+        )
+
+    def _seed_fast(self, options, password_hash):
+        teachers_count = options["teachers"]
+        sections_count = options["sections"]
+        students_per_section = options["students_per_section"]
+        subjects_per_section = options["subjects_per_section"]
+        size = self.batch_size
+
+        with self.phase("Seeding teachers and master faculty"):
+            rows = [
+                (f"TCH{i:04d}", f"Teacher {i:02d}", f"tch{i:04d}@kiit.ac.in") for i in range(1, teachers_count + 1)
+            ]
+            MasterFaculty.objects.bulk_create(
+                [
+                    MasterFaculty(
+                        enrollment_id=enrollment_id,
+                        name=name,
+                        email=email,
+                        department="CSE",
+                        designation="Assistant Professor",
+                    )
+                    for enrollment_id, name, email in rows
+                ],
+                batch_size=size,
+                update_conflicts=True,
+                unique_fields=["enrollment_id"],
+                update_fields=["name", "email", "department", "designation"],
+            )
+            user_ids = self._upsert_users([(enrollment_id, email) for enrollment_id, _, email in rows], password_hash)
+            Teacher.objects.bulk_create(
+                [
+                    Teacher(
+                        user_id=user_ids[enrollment_id],
+                        name=name,
+                        enrollment_id=enrollment_id,
+                        department="CSE",
+                        designation="Assistant Professor",
+                        mail_verified=True,
+                        is_registered=True,
+                    )
+                    for enrollment_id, name, _ in rows
+                ],
+                batch_size=size,
+                update_conflicts=True,
+                unique_fields=["enrollment_id"],
+                update_fields=["user", "name", "department", "designation", "mail_verified", "is_registered"],
+            )
+            teachers = list(
+                Teacher.objects.filter(enrollment_id__in=[row[0] for row in rows]).order_by("enrollment_id")
+            )
+
+        with self.phase("Seeding sections"):
+            codes = [f"CSE-{i:02d}" for i in range(1, sections_count + 1)]
+            Section.objects.bulk_create(
+                [
+                    Section(
+                        code=code,
+                        name=f"Computer Science Section {i:02d}",
+                        expected_strength=students_per_section,
+                        is_active=True,
+                    )
+                    for i, code in enumerate(codes, start=1)
+                ],
+                batch_size=size,
+                update_conflicts=True,
+                unique_fields=["code"],
+                update_fields=["name", "expected_strength", "is_active"],
+            )
+            sections = list(Section.objects.filter(code__in=codes).order_by("code"))
+
+        with self.phase("Seeding students"):
+            plan = [
+                (section, ROLL_SEED + (section_index * 1000) + student_index, section_index, student_index)
+                for section_index, section in enumerate(sections, start=1)
+                for student_index in range(1, students_per_section + 1)
+            ]
+            for chunk in _chunks(plan, size):
+                user_ids = self._upsert_users([(str(roll), f"{roll}@kiit.ac.in") for _, roll, _, _ in chunk], password_hash)
+                templates = self._face_templates(len(chunk), options["face_dim"]) if options["face_templates"] else None
+                update_fields = ["user", "name", "section", "mail_verified"]
+                if templates is not None:
+                    # Without --face-templates a re-run keeps the enrolled faces it finds.
+                    update_fields += ["face_verified", "face_embedding"]
+                Student.objects.bulk_create(
+                    [
+                        Student(
+                            user_id=user_ids[str(roll)],
+                            name=f"Student S{section_index:02d}-{student_index:02d}",
+                            roll=roll,
+                            section=section,
+                            mail_verified=True,
+                            face_verified=templates is not None,
+                            face_embedding=templates[i] if templates is not None else None,
+                        )
+                        for i, (section, roll, section_index, student_index) in enumerate(chunk)
+                    ],
+                    batch_size=size,
+                    update_conflicts=True,
+                    unique_fields=["roll"],
+                    update_fields=update_fields,
+                )
+            created_students = len(plan)
+
+        with self.phase("Seeding class cards"):
+            # No unique constraint on (section, subject): match existing rows in one query.
+            existing = {
+                (classroom.section_id, classroom.subject_name): classroom
+                for classroom in ClassRoom.objects.filter(section__in=sections)
+            }
+            to_create, to_update = [], []
+            for section_i, section in enumerate(sections):
+                for j in range(subjects_per_section):
+                    values = {
+                        "teacher": teachers[(section_i + j) % len(teachers)],
+                        "start_time": time(9 + (j % 5), 0),
+                        "end_time": time(10 + (j % 5), 0),
+                        "is_active": True,
+                    }
+                    subject_name = SUBJECTS_POOL[j % len(SUBJECTS_POOL)]
+                    classroom = existing.get((section.id, subject_name))
+                    if classroom is None:
+                        to_create.append(ClassRoom(section=section, subject_name=subject_name, **values))
+                    else:
+                        for field, value in values.items():
+                            setattr(classroom, field, value)
+                        to_update.append(classroom)
+            ClassRoom.objects.bulk_update(to_update, ["teacher", "start_time", "end_time", "is_active"], batch_size=size)
+            ClassRoom.objects.bulk_create(to_create, batch_size=size)
+            classes = list(ClassRoom.objects.filter(section__in=sections))
+
+        # bulk writes send no signals: invalidate dashboard card caches once.
+        from faculty_app.dashboard import SCOPE_SECTION, SCOPE_TEACHER, bump_cards_version
+        from faculty_app.timetable import bump_timetable_version
+
+        bump_cards_version(SCOPE_TEACHER, [teacher.id for teacher in teachers])
+        bump_cards_version(SCOPE_SECTION, [section.id for section in sections])
+        bump_timetable_version()
+        return teachers, sections, created_students, classes
+
+    # ------------------------------------------------------------------ face templates and history
+
+    def _face_templates(self, count, dim):
+        """Random unit vectors, rounded to keep the JSON compact."""
+        vectors = self.rng.standard_normal((count, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.round(vectors, 5).tolist()
+
+    def _apply_face_templates(self, sections, dim):
+        students = list(Student.objects.filter(section__in=sections).only("id"))
+        for chunk in _chunks(students, self.batch_size):
+            for student, template in zip(chunk, self._face_templates(len(chunk), dim)):
+                student.face_embedding = template
+                student.face_verified = True
+            Student.objects.bulk_update(chunk, ["face_embedding", "face_verified"], batch_size=self.batch_size)
+
+    def _seed_history(self, classes, weeks, attendance_rate):
+        """
+        Closed sessions for every weekday (Mon-Fri) of the last `weeks` weeks, skipping days a
+        class already has a session, plus attendance rows for present / face-failed students.
+        """
+        today = timezone.localdate()
+        days = [
+            today - timedelta(days=offset)
+            for offset in range(weeks * 7, 0, -1)
+            if (today - timedelta(days=offset)).weekday() < 5
+        ]
+        class_ids = [classroom.id for classroom in classes]
+        existing = set(
+            AttendanceSession.objects.filter(classroom_id__in=class_ids, session_date__in=days).values_list(
+                "classroom_id", "session_date"
             )
         )
+        roster = {}
+        for student_id, section_id in Student.objects.filter(
+            section_id__in={classroom.section_id for classroom in classes}
+        ).values_list("id", "section_id"):
+            roster.setdefault(section_id, []).append(student_id)
+
+        tz = timezone.get_current_timezone()
+        session_count = attendance_count = 0
+        started_field = AttendanceSession._meta.get_field("started_at")
+        with historical_timestamps(started_field):
+            for class_chunk in _chunks(classes, max(1, self.batch_size // max(len(days), 1))):
+                sessions = []
+                for classroom in class_chunk:
+                    start = classroom.start_time or time(9, 0)
+                    end = classroom.end_time or _default_end(start)
+                    for day in days:
+                        if (classroom.id, day) in existing:
+                            continue
+                        sessions.append(
+                            AttendanceSession(
+                                classroom=classroom,
+                                teacher_id=classroom.teacher_id,
+                                session_date=day,
+                                started_at=datetime.combine(day, start, tz),
+                                ended_at=datetime.combine(day, end, tz),
+                                is_live=False,
+                            )
+                        )
+                AttendanceSession.objects.bulk_create(sessions, batch_size=self.batch_size)
+                if sessions and sessions[0].pk is None:
+                    # Backend can't return ids from bulk INSERT: map them back by class and date.
+                    ids = {
+                        (classroom_id, session_date): session_id
+                        for session_id, classroom_id, session_date in AttendanceSession.objects.filter(
+                            classroom__in=class_chunk, session_date__in=days
+                        ).values_list("id", "classroom_id", "session_date")
+                    }
+                    for session in sessions:
+                        session.pk = ids[(session.classroom_id, session.session_date)]
+                session_count += len(sessions)
+
+                rows = []
+                for session in sessions:
+                    students = roster.get(session.classroom.section_id, [])
+                    draws = self.rng.random(len(students))
+                    delays = self.rng.integers(30, 600, len(students))
+                    for student_id, draw, delay in zip(students, draws, delays):
+                        if draw >= attendance_rate:
+                            continue
+                        scanned = session.started_at + timedelta(seconds=int(delay))
+                        checked = scanned + timedelta(seconds=5)
+                        # A few percent of scans end in a failed face check.
+                        failed = draw > attendance_rate * 0.97
+                        rows.append(
+                            (
+                                session.pk,
+                                student_id,
+                                Attendance.STATUS_FACE_FAILED if failed else Attendance.STATUS_PRESENT,
+                                scanned,
+                                checked,
+                                None if failed else checked,
+                                round(0.4 + float(draw) * 0.1, 4) if failed else round(0.75 + (1 - float(draw)) * 0.2, 4),
+                            )
+                        )
+                attendance_count += self._insert_attendance_rows(rows)
+        return session_count, attendance_count
+
+    def _insert_attendance_rows(self, rows):
+        """
+        executemany() straight into the attendance table: history volumes are millions of rows,
+        where building and preparing model instances would dominate the run time.
+        """
+        fields = ["session", "student", "status", "qr_scanned_at", "face_checked_at", "marked_at", "face_score"]
+        meta = Attendance._meta
+        columns = ", ".join(connection.ops.quote_name(meta.get_field(name).column) for name in fields)
+        placeholders = ", ".join(["%s"] * len(fields))
+        sql = f"INSERT INTO {connection.ops.quote_name(meta.db_table)} ({columns}) VALUES ({placeholders})"
+        adapt = connection.ops.adapt_datetimefield_value
+        with connection.cursor() as cursor:
+            for chunk in _chunks(rows, self.batch_size):
+                cursor.executemany(
+                    sql,
+                    [
+                        (session_id, student_id, status, adapt(scanned), adapt(checked), adapt(marked), score)
+                        for session_id, student_id, status, scanned, checked, marked, score in chunk
+                    ],
+                )
+        return len(rows)
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Avg, Max
+from django.utils import timezone
+
+from faculty_app.mail import deliver_due_emails
+from faculty_app.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails (OTP mails) in batches over a reused backend connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the outbox once and exit.")
+        parser.add_argument("--batch-size", type=int, default=None, help="Messages per connection/batch.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when idle.")
+        parser.add_argument(
+            "--purge-sent-days",
+            type=int,
+            default=0,
+            help="Delete sent messages older than this many days before starting (0 = keep).",
+        )
+
+    def handle(self, *args, **options):
+        if options["purge_sent_days"]:
+            cutoff = timezone.now() - timedelta(days=options["purge_sent_days"])
+            deleted, _ = OutboundEmail.objects.filter(status=OutboundEmail.STATUS_SENT, sent_at__lt=cutoff).delete()
+            self.stdout.write(f"Purged {deleted} sent message(s).")
+
+        totals = [0, 0, 0]
+        started = time.monotonic()
+        self.stdout.write("Email outbox worker started.")
+        while True:
+            close_old_connections()
+            counts = deliver_due_emails(options["batch_size"])
+            if not any(counts):
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+            totals = [total + count for total, count in zip(totals, counts)]
+            self.stdout.write(f"Batch: {counts[0]} sent, {counts[1]} retrying, {counts[2]} failed.")
+
+        elapsed = time.monotonic() - started
+        latency = OutboundEmail.objects.filter(status=OutboundEmail.STATUS_SENT, latency_ms__isnull=False).aggregate(
+            avg=Avg("latency_ms"), worst=Max("latency_ms")
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sent {totals[0]}, retrying {totals[1]}, failed {totals[2]} in {elapsed:.2f}s "
+                f"(delivery latency avg {latency['avg'] or 0:.0f} ms, max {latency['worst'] or 0:.0f} ms)."
+            )
+        )
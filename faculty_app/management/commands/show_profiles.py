@@ -0,0 +1,103 @@
+import io
+import linecache
+import pstats
+import tracemalloc
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sams_main.profiling import load_captures, profiles_root
+
+SORT_KEYS = ("cumulative", "tottime", "calls")
+
+
+class Command(BaseCommand):
+    help = (
+        "List stored request profiles (sams_main/profiling.py), or summarize the top functions and "
+        "allocation sites of selected captures (merged)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", help="Capture ids to summarize (see the list / X-SAMS-Profile-Id).")
+        parser.add_argument("--view", help="Only captures of this URL name, e.g. verifyAttendanceFace.")
+        parser.add_argument("--summary", action="store_true", help="Summarize every selected capture.")
+        parser.add_argument("--limit", type=int, default=20, help="Rows per table.")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="cumulative", help="Function ordering.")
+
+    def handle(self, *args, **options):
+        root = profiles_root()
+        captures = load_captures(root)
+        if options["view"]:
+            captures = [meta for meta in captures if meta["view"] == options["view"]]
+        if options["ids"]:
+            known = {meta["id"] for meta in captures}
+            missing = [capture_id for capture_id in options["ids"] if capture_id not in known]
+            if missing:
+                raise CommandError(f"Unknown capture(s): {', '.join(missing)}")
+            captures = [meta for meta in captures if meta["id"] in options["ids"]]
+        if not captures:
+            self.stdout.write(f"No captures in {root}.")
+            return
+
+        if not options["ids"] and not options["summary"]:
+            self._list(captures)
+            return
+        self._functions(root, captures, options["sort"], options["limit"])
+        self._allocations(root, captures, options["limit"])
+
+    def _list(self, captures):
+        self.stdout.write(f"{'id':<28} {'trigger':<7} {'view':<28} {'status':>6} {'ms':>9} {'peak KiB':>9}")
+        for meta in captures:
+            peak = meta["tracemalloc_peak_bytes"]
+            self.stdout.write(
+                f"{meta['id']:<28} {meta['trigger']:<7} {(meta['view'] or meta['path'])[:28]:<28} "
+                f"{meta['status']:>6} {meta['duration_ms']:>9.1f} {peak / 1024 if peak else 0:>9.1f}"
+            )
+
+    def _functions(self, root, captures, sort, limit):
+        paths = [root / f"{meta['id']}.prof" for meta in captures]
+        paths = [str(path) for path in paths if path.exists()]
+        if not paths:
+            self.stdout.write("No call graphs in the selection.")
+            return
+        durations = [meta["duration_ms"] for meta in captures]
+        self.stdout.write(
+            f"Top functions by {sort} over {len(paths)} capture(s) "
+            f"(request time {min(durations):.1f}-{max(durations):.1f} ms):"
+        )
+        # pstats writes line fragments; OutputWrapper would end each one with a newline.
+        buffer = io.StringIO()
+        pstats.Stats(*paths, stream=buffer).strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(buffer.getvalue())
+
+    def _allocations(self, root, captures, limit):
+        totals = defaultdict(lambda: [0, 0])
+        loaded = 0
+        for meta in captures:
+            path = root / f"{meta['id']}.tracemalloc"
+            if not path.exists():
+                continue
+            snapshot = tracemalloc.Snapshot.load(str(path)).filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                )
+            )
+            for stat in snapshot.statistics("lineno"):
+                frame = stat.traceback[0]
+                entry = totals[(frame.filename, frame.lineno)]
+                entry[0] += stat.size
+                entry[1] += stat.count
+            loaded += 1
+        if not loaded:
+            self.stdout.write("No allocation snapshots in the selection.")
+            return
+
+        self.stdout.write(f"Top allocation sites still held at response time over {loaded} capture(s):")
+        ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        for (filename, lineno), (size, count) in ranked:
+            source = linecache.getline(filename, lineno).strip()
+            self.stdout.write(f"{size / 1024:>10.1f} KiB {count:>8} blocks  {filename}:{lineno}")
+            if source:
+                self.stdout.write(f"{'':>30}{source[:100]}")
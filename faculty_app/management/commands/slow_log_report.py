@@ -0,0 +1,122 @@
+import json
+from collections import Counter, defaultdict
+from datetime import datetime, time, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def _log_files(path):
+    """The slow log and its rotated backups, oldest first."""
+    backups = sorted(path.parent.glob(f"{path.name}.*"), key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0)
+    return [*reversed(backups), path]
+
+
+def _p95(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregate the slow request / slow SQL log (sams_main/slowlog.py) into the top offenders by total time: "
+        "SQL by query fingerprint, requests by view."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file", action="append", dest="files",
+            help="Log file(s) to read (default: SLOW_LOG_PATH and its rotated backups).",
+        )
+        parser.add_argument("--since", help="Only entries at or after this ISO date/time (UTC).")
+        parser.add_argument("--view", help="Only entries of this URL name.")
+        parser.add_argument("--kind", choices=("sql", "request"), help="Only one section.")
+        parser.add_argument("--limit", type=int, default=15, help="Rows per section.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None and parse_date(options["since"]):
+                since = datetime.combine(parse_date(options["since"]), time())
+            if since is None:
+                raise CommandError("--since must be an ISO date or date/time.")
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+
+        paths = [Path(name) for name in options["files"]] if options["files"] else _log_files(Path(settings.SLOW_LOG_PATH))
+        entries = []
+        skipped = 0
+        for path in paths:
+            if not path.exists():
+                continue
+            with path.open(encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        skipped += 1
+                        continue
+                    if since and parse_datetime(entry["ts"]) < since:
+                        continue
+                    if options["view"] and entry.get("view") != options["view"]:
+                        continue
+                    entries.append(entry)
+        if not entries:
+            self.stdout.write("No slow log entries found.")
+            return
+        if skipped:
+            self.stderr.write(f"Skipped {skipped} unreadable line(s).")
+
+        self.stdout.write(f"{len(entries)} entries from {entries[0]['ts']} to {entries[-1]['ts']}")
+        if options["kind"] in (None, "sql"):
+            self._sql(entries, options["limit"])
+        if options["kind"] in (None, "request"):
+            self._requests(entries, options["limit"])
+
+    def _sql(self, entries, limit):
+        groups = defaultdict(list)
+        for entry in entries:
+            if entry.get("type") == "sql":
+                groups[entry["fingerprint_id"]].append(entry)
+        self.stdout.write(f"\nSlow SQL by total time ({len(groups)} fingerprints):")
+        if not groups:
+            return
+        self.stdout.write(f"{'total ms':>10} {'count':>6} {'mean':>8} {'p95':>8} {'max':>8} {'rows':>7}  where")
+        ranked = sorted(groups.values(), key=lambda rows: sum(e["duration_ms"] for e in rows), reverse=True)
+        for rows in ranked[:limit]:
+            durations = [e["duration_ms"] for e in rows]
+            row_counts = [e["rows"] for e in rows if e.get("rows") is not None]
+            mean_rows = f"{sum(row_counts) / len(row_counts):.0f}" if row_counts else "-"
+            sites = Counter(e.get("call_site") or "?" for e in rows).most_common(2)
+            views = Counter(e.get("view") or "-" for e in rows).most_common(2)
+            self.stdout.write(
+                f"{sum(durations):>10.1f} {len(rows):>6} {sum(durations) / len(rows):>8.1f} {_p95(durations):>8.1f} "
+                f"{max(durations):>8.1f} {mean_rows:>7}  "
+                f"{', '.join(site for site, _ in sites)} [{', '.join(view for view, _ in views)}]"
+            )
+            self.stdout.write(f"{'':>12}{rows[0]['fingerprint_id']}  {rows[0]['fingerprint'][:160]}")
+
+    def _requests(self, entries, limit):
+        groups = defaultdict(list)
+        for entry in entries:
+            if entry.get("type") == "request":
+                groups[(entry.get("view") or entry.get("path"), entry.get("method"))].append(entry)
+        self.stdout.write(f"\nSlow requests by total time ({len(groups)} views):")
+        if not groups:
+            return
+        self.stdout.write(
+            f"{'total ms':>10} {'count':>6} {'mean':>8} {'p95':>8} {'max':>8} {'queries':>8} {'sql ms':>8}  view"
+        )
+        ranked = sorted(groups.items(), key=lambda item: sum(e["duration_ms"] for e in item[1]), reverse=True)
+        for (view, method), rows in ranked[:limit]:
+            durations = [e["duration_ms"] for e in rows]
+            statuses = Counter(str(e.get("status")) for e in rows)
+            self.stdout.write(
+                f"{sum(durations):>10.1f} {len(rows):>6} {sum(durations) / len(rows):>8.1f} {_p95(durations):>8.1f} "
+                f"{max(durations):>8.1f} {sum(e['queries'] for e in rows) / len(rows):>8.1f} "
+                f"{sum(e['sql_ms'] for e in rows) / len(rows):>8.1f}  {method} {view} "
+                f"({', '.join(f'{code}x{count}' for code, count in statuses.most_common())})"
+            )
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faculty_app', '0011_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('classroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='faculty_app.classroom')),
+            ],
+            options={
+                'ordering': ('weekday', 'start_time'),
+                'indexes': [models.Index(fields=['weekday', 'start_time'], name='slot_day_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('classroom', 'weekday', 'start_time'), name='uniq_class_weekday_start'), models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='slot_end_after_start')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faculty_app', '0013_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('attendance_report', 'Attendance Report'), ('provision_students', 'Provision Students')], max_length=40),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faculty_app', '0014_backgroundjob_provision_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('attendance_report', 'Attendance Report'), ('provision_students', 'Provision Students'), ('delete_teachers', 'Delete Teachers'), ('delete_students', 'Delete Students')], max_length=40),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faculty_app', '0015_backgroundjob_delete_kinds'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(condition=models.Q(('is_live', True)), fields=['classroom'], name='session_live_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rollingqrtoken',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['session', 'expires_at'], name='token_active_session_idx'),
+        ),
+    ]
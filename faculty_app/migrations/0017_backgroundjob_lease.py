@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faculty_app', '0016_partial_live_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faculty_app', '0017_backgroundjob_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -3,6 +3,8 @@ Faculty app models
 Defines Teacher and MasterFaculty models plus attendance domain models
 """
 import secrets
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -99,6 +101,41 @@ class ClassRoom(models.Model):
         return f"{self.subject_name} ({self.section.code})"
 
 
+class TimetableSlot(models.Model):
+    """
+    One weekly occurrence of a class (weekday + time window).
+    Classes without any slot keep using ClassRoom.start_time/end_time on every day.
+    """
+    WEEKDAY_CHOICES = (
+        (0, "Monday"),
+        (1, "Tuesday"),
+        (2, "Wednesday"),
+        (3, "Thursday"),
+        (4, "Friday"),
+        (5, "Saturday"),
+        (6, "Sunday"),
+    )
+
+    classroom = models.ForeignKey(ClassRoom, on_delete=models.CASCADE, related_name="slots")
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)  # date.weekday()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ("weekday", "start_time")
+        indexes = [
+            models.Index(fields=["weekday", "start_time"], name="slot_day_start_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["classroom", "weekday", "start_time"], name="uniq_class_weekday_start"),
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F("start_time")), name="slot_end_after_start"),
+        ]
+
+    def __str__(self):
+        return f"{self.classroom} {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
 class AttendanceSession(models.Model):
     """
     One live attendance window created when teacher clicks "Take Attendance".
@@ -113,6 +150,17 @@ class AttendanceSession(models.Model):
 
     class Meta:
         ordering = ("-started_at",)
+        indexes = [
+            # Partial: only the handful of live sessions are indexed (ignored on MySQL).
+            models.Index(fields=["classroom"], condition=models.Q(is_live=True), name="session_live_class_idx"),
+        ]
+
+    def close(self, ended_at=None):
+        """End the live window and invalidate its active tokens (idempotent)."""
+        self.is_live = False
+        self.ended_at = ended_at or timezone.now()
+        self.save(update_fields=["is_live", "ended_at"])
+        self.qr_tokens.filter(is_active=True).update(is_active=False)
 
     def __str__(self):
         return f"{self.classroom} @ {self.started_at:%Y-%m-%d %H:%M}"
@@ -130,6 +178,14 @@ class RollingQRToken(models.Model):
 
     class Meta:
         ordering = ("-issued_at",)
+        indexes = [
+            # Partial: expired/rotated tokens pile up, the active one per session is what scans look for.
+            models.Index(
+                fields=["session", "expires_at"],
+                condition=models.Q(is_active=True),
+                name="token_active_session_idx",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.token:
@@ -181,3 +237,126 @@ class Attendance(models.Model):
 
     def __str__(self):
         return f"{self.student.roll} - {self.session_id} - {self.status}"
+
+
+def job_lease_until():
+    """End of a lease taken or extended now (JOB_LEASE_SECONDS)."""
+    return timezone.now() + timedelta(seconds=getattr(settings, "JOB_LEASE_SECONDS", 600))
+
+
+class BackgroundJob(models.Model):
+    """
+    Long-running work executed outside the request cycle by the `run_jobs` worker.
+    QUEUED rows double as the local job queue (oldest first). A RUNNING job holds a lease
+    (`lease_until`) that its progress updates extend; another worker re-claims it once the
+    lease runs out (worker died), up to JOB_MAX_ATTEMPTS runs.
+    """
+    KIND_ATTENDANCE_REPORT = "attendance_report"
+    KIND_PROVISION_STUDENTS = "provision_students"
+    KIND_DELETE_TEACHERS = "delete_teachers"
+    KIND_DELETE_STUDENTS = "delete_students"
+    KIND_CHOICES = (
+        (KIND_ATTENDANCE_REPORT, "Attendance Report"),
+        (KIND_PROVISION_STUDENTS, "Provision Students"),
+        (KIND_DELETE_TEACHERS, "Delete Teachers"),
+        (KIND_DELETE_STUDENTS, "Delete Students"),
+    )
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    kind = models.CharField(max_length=40, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    params = models.JSONField(default=dict, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)  # 0-100
+    message = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    # Path relative to settings.JOB_RESULTS_ROOT
+    result_file = models.CharField(max_length=255, blank=True)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="background_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="job_queue_idx"),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def set_progress(self, percent, message=""):
+        """
+        Persist progress without touching other fields (safe while views poll the row).
+        Doubles as the worker's heartbeat: the lease is extended on every update.
+        """
+        self.progress = max(0, min(100, int(percent)))
+        if message:
+            self.message = message[:255]
+        self.lease_until = job_lease_until()
+        BackgroundJob.objects.filter(pk=self.pk).update(
+            progress=self.progress, message=self.message, lease_until=self.lease_until
+        )
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class OutboundEmail(models.Model):
+    """
+    Email outbox row. Views enqueue, the `send_queued_emails` worker delivers.
+    next_attempt_at doubles as the retry schedule and as a lease while a worker sends.
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Enqueue -> delivered, in milliseconds
+    latency_ms = models.FloatField(null=True, blank=True)
+    # Not sent after this (e.g. OTPs); null = no expiry
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} ({self.status})"
@@ -0,0 +1,158 @@
+"""
+Bulk account provisioning
+Set-based creation of student (and teacher) accounts with batched INSERTs,
+used by the admin actions and by background jobs for large runs.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Max
+
+from sams_main.profiles import ROLE_TEACHER, invalidate_role_profiles
+
+from .models import Section, Teacher
+
+DEFAULT_ACCOUNT_PASSWORD = "Pass@123"
+FIRST_STUDENT_ROLL = 2300000
+
+
+def batch_size():
+    return getattr(settings, "PROVISIONING_BATCH_SIZE", 500)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_create_users(accounts, password_hash, size=None):
+    """
+    Insert User rows for (username, email) pairs and return them with primary keys set.
+    Backends that cannot return ids from bulk INSERT are back-filled with one lookup per batch.
+    """
+    size = size or batch_size()
+    users = [User(username=username, email=email, password=password_hash) for username, email in accounts]
+    User.objects.bulk_create(users, batch_size=size)
+    missing = [user for user in users if user.pk is None]
+    for chunk in _chunks(missing, size):
+        ids = dict(User.objects.filter(username__in=[user.username for user in chunk]).values_list("username", "id"))
+        for user in chunk:
+            user.pk = ids[user.username]
+    return users
+
+
+def section_shortfalls(section_ids):
+    """[(section, current_count, needed)] for the given sections, from one aggregate query."""
+    sections = Section.objects.filter(id__in=section_ids).annotate(current_students=Count("students")).order_by("code")
+    return [
+        (section, section.current_students, max(section.expected_strength - section.current_students, 0))
+        for section in sections
+    ]
+
+
+def plan_students(section_ids):
+    """
+    Precompute (section, roll, display_number) for every missing student.
+    Rolls continue after the highest existing roll.
+    """
+    from student_app.models import Student
+
+    max_roll = Student.objects.aggregate(max_roll=Max("roll"))["max_roll"] or FIRST_STUDENT_ROLL
+    plan = []
+    for section, current, needed in section_shortfalls(section_ids):
+        for idx in range(1, needed + 1):
+            max_roll += 1
+            plan.append((section, max_roll, current + idx))
+    return plan
+
+
+def provision_students(section_ids, password=DEFAULT_ACCOUNT_PASSWORD, size=None, progress=None):
+    """
+    Create students up to each section's expected strength.
+    Each batch of users + students is inserted in its own transaction; `progress(done, total)`
+    is called after every batch. Returns the number of students created.
+    """
+    from student_app.models import Student
+
+    size = size or batch_size()
+    password_hash = make_password(password)
+    plan = plan_students(section_ids)
+    total = len(plan)
+    done = 0
+    for chunk in _chunks(plan, size):
+        with transaction.atomic():
+            users = bulk_create_users(((str(roll), f"{roll}@kiit.ac.in") for _, roll, _ in chunk), password_hash, size)
+            Student.objects.bulk_create(
+                [
+                    Student(
+                        user_id=user.pk,
+                        name=f"Student {section.code}-{number:02d}",
+                        roll=roll,
+                        section=section,
+                        mail_verified=True,
+                        face_verified=False,
+                    )
+                    for user, (section, roll, number) in zip(users, chunk)
+                ],
+                batch_size=size,
+            )
+        done += len(chunk)
+        if progress:
+            progress(done, total)
+    return total
+
+
+def provision_teachers(master_qs, password=DEFAULT_ACCOUNT_PASSWORD, size=None):
+    """
+    Create Teacher accounts for MasterFaculty rows that have none yet.
+    Per batch: one query for existing teachers, one for existing users, then bulk
+    INSERT/UPDATE, so thousands of rows take a bounded number of round-trips.
+    Existing users with a matching username are reused with their email and password reset.
+    Returns (created, skipped).
+    """
+    size = size or batch_size()
+    password_hash = make_password(password)
+    masters = list(master_qs.only("enrollment_id", "name", "email", "department", "designation"))
+    created = skipped = 0
+    for chunk in _chunks(masters, size):
+        enrollment_ids = [master.enrollment_id for master in chunk]
+        existing_teachers = set(
+            Teacher.objects.filter(enrollment_id__in=enrollment_ids).values_list("enrollment_id", flat=True)
+        )
+        pending = {master.enrollment_id: master for master in chunk if master.enrollment_id not in existing_teachers}
+        skipped += len(chunk) - len(pending)
+        if not pending:
+            continue
+
+        with transaction.atomic():
+            users = {user.username: user for user in User.objects.filter(username__in=list(pending))}
+            for username, user in users.items():
+                user.email = pending[username].email
+                user.password = password_hash
+            User.objects.bulk_update(list(users.values()), ["email", "password"], batch_size=size)
+            new_users = bulk_create_users(
+                [(enrollment_id, master.email) for enrollment_id, master in pending.items() if enrollment_id not in users],
+                password_hash,
+                size,
+            )
+            users.update((user.username, user) for user in new_users)
+            Teacher.objects.bulk_create(
+                [
+                    Teacher(
+                        user_id=users[enrollment_id].pk,
+                        name=master.name,
+                        enrollment_id=enrollment_id,
+                        department=master.department,
+                        designation=master.designation,
+                        mail_verified=True,
+                        is_registered=True,
+                    )
+                    for enrollment_id, master in pending.items()
+                ],
+                batch_size=size,
+            )
+        # bulk_create sends no post_save: drop cached "no teacher profile" entries ourselves.
+        invalidate_role_profiles(ROLE_TEACHER, [user.pk for user in users.values()])
+        created += len(pending)
+    return created, skipped
@@ -0,0 +1,69 @@
+"""
+Signal receivers for faculty_app
+Keep cached data in sync with model changes.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from sams_main.profiles import ROLE_STUDENT, ROLE_TEACHER, invalidate_role_profile, invalidate_role_profiles
+
+from .dashboard import SCOPE_SECTION, SCOPE_TEACHER, bump_cards_version
+from .models import ClassRoom, Section, Teacher, TimetableSlot
+from .timetable import bump_timetable_version
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def drop_cached_teacher_profile(sender, instance, **kwargs):
+    invalidate_role_profile(ROLE_TEACHER, instance.user_id)
+    # Student cards show the teacher name.
+    section_ids = ClassRoom.objects.filter(teacher=instance).values_list("section_id", flat=True)
+    bump_cards_version(SCOPE_SECTION, list(section_ids))
+
+
+@receiver(post_save, sender=Section)
+def drop_cached_student_profiles_for_section(sender, instance, created, **kwargs):
+    # Cached student profiles carry their section (code/name shown on dashboards).
+    if created:
+        return
+    user_ids = instance.students.values_list("user_id", flat=True)
+    invalidate_role_profiles(ROLE_STUDENT, list(user_ids))
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def drop_cached_section_cards(sender, instance, **kwargs):
+    bump_cards_version(SCOPE_SECTION, [instance.id])
+    # Teacher cards show the section code.
+    teacher_ids = ClassRoom.objects.filter(section_id=instance.id).values_list("teacher_id", flat=True)
+    bump_cards_version(SCOPE_TEACHER, list(teacher_ids))
+
+
+@receiver(pre_save, sender=ClassRoom)
+def remember_previous_class_owner(sender, instance, **kwargs):
+    # A class moved to another teacher/section must drop the old owners' cards too.
+    instance._previous_owner = None
+    if instance.pk:
+        instance._previous_owner = (
+            ClassRoom.objects.filter(pk=instance.pk).values_list("teacher_id", "section_id").first()
+        )
+
+
+@receiver(post_save, sender=ClassRoom)
+@receiver(post_delete, sender=ClassRoom)
+def drop_cached_class_cards(sender, instance, **kwargs):
+    teacher_ids = [instance.teacher_id]
+    section_ids = [instance.section_id]
+    previous = getattr(instance, "_previous_owner", None)
+    if previous:
+        teacher_ids.append(previous[0])
+        section_ids.append(previous[1])
+    bump_cards_version(SCOPE_TEACHER, teacher_ids)
+    bump_cards_version(SCOPE_SECTION, section_ids)
+    bump_timetable_version()
+
+
+@receiver(post_save, sender=TimetableSlot)
+@receiver(post_delete, sender=TimetableSlot)
+def drop_cached_timetable(sender, instance, **kwargs):
+    bump_timetable_version()
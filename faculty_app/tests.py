@@ -1,3 +1,1024 @@
-from django.test import TestCase
+import io
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from perf_testing import PerformanceContractMixin, clear_caches, seed_campus
+from sams_main.profiles import ROLE_TEACHER, get_role_profile
+from student_app.models import Student
+
+from .archive import archive_path, archive_semester, open_arrays, read_columns, semester_bounds, write_archive
+from .exports import iter_class_sheets, teacher_export_classes
+from . import timetable
+from .dashboard import SCOPE_SECTION, SCOPE_TEACHER, cards_version
+from .deletion import deactivate_users, run_plan, student_deletion_plan, teacher_deletion_plan
+from .importers import ClassImporter, StudentImporter
+from .jobs import claim_next_job, enqueue_job, report_params, results_root, run_job
+from .mail import SEND_LEASE_SECONDS, claim_due_emails, deliver_due_emails, enqueue_email
+from .management.commands.seed_demo_data import _default_end
+from .provisioning import DEFAULT_ACCOUNT_PASSWORD, provision_students, provision_teachers
+from .models import (
+    Attendance,
+    AttendanceSession,
+    BackgroundJob,
+    ClassRoom,
+    MasterFaculty,
+    OutboundEmail,
+    RollingQRToken,
+    Section,
+    Teacher,
+    TimetableSlot,
+)
+
+
+def sheet_rows(html):
+    """Student rows of an exported sheet (one per roster entry, first cell is the roll)."""
+    return re.findall(r"<tr><td>(\d+)</td>", html)
+
+
+def zip_sheets(content):
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        return {name: archive.read(name).decode() for name in archive.namelist()}
+
+
+@override_settings(RATELIMIT_ENABLE=False, SESSION_ENGINE=settings.SESSION_BACKENDS["cached_db"])
+class TeacherViewPerformanceTests(PerformanceContractMixin, TestCase):
+    """Query budgets (and opt-in wall-time baselines) for the teacher views (see perf_testing.py)."""
+
+    perf_prefix = "faculty"
+
+    @classmethod
+    def setUpTestData(cls):
+        campus = seed_campus()
+        cls.teacher = campus["teacher"]
+        cls.classes = campus["classes"]
+        cls.classroom = cls.classes[0]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.teacher.user)
+
+    def live_session(self):
+        session = AttendanceSession.objects.create(classroom=self.classroom, teacher=self.teacher)
+        RollingQRToken.objects.create(session=session, expires_at=timezone.now() + timedelta(minutes=5))
+        return session
+
+    def assertTokenPayload(self, payload, session_id):
+        self.assertTrue(payload["success"])
+        self.assertEqual(payload["session_id"], session_id)
+        self.assertEqual(payload["classroom_id"], self.classroom.id)
+        self.assertTrue(payload["token"])
+        self.assertGreater(datetime.fromisoformat(payload["expires_at"]), timezone.now())
+
+    def test_dashboard_cold_cache(self):
+        response = self.assertPerformance(
+            "dashboard_cold", lambda: self.client.get(reverse("fdashboard")), queries=6, setup=clear_caches
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["classes"]), len(self.classes))
+
+    def test_dashboard_warm_cache(self):
+        self.client.get(reverse("fdashboard"))
+        response = self.assertPerformance("dashboard_warm", lambda: self.client.get(reverse("fdashboard")), queries=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["classes"]), len(self.classes))
+
+    def test_start_session(self):
+        url = reverse("startAttendanceSession", args=[self.classroom.id])
+        response = self.assertPerformance(
+            "start_session",
+            lambda: self.client.post(url),
+            queries=9,
+            setup=lambda: AttendanceSession.objects.filter(classroom=self.classroom, is_live=True).update(is_live=False),
+        )
+        self.assertEqual(response.status_code, 200)
+        session = AttendanceSession.objects.get(classroom=self.classroom, is_live=True)
+        self.assertTokenPayload(response.json(), session.id)
+        self.assertEqual(response.json()["token"], session.qr_tokens.get(is_active=True).token)
+
+    def test_current_qr_token(self):
+        session = self.live_session()
+        url = reverse("currentQrToken", args=[session.id])
+        response = self.assertPerformance("current_qr_token", lambda: self.client.get(url), queries=4)
+        self.assertEqual(response.status_code, 200)
+        self.assertTokenPayload(response.json(), session.id)
+        self.assertEqual(response.json()["token"], session.qr_tokens.get().token)
+
+    def test_stop_session(self):
+        session = self.live_session()
+        url = reverse("stopAttendanceSession", args=[session.id])
+        response = self.assertPerformance(
+            "stop_session",
+            lambda: self.client.post(url),
+            queries=5,
+            setup=lambda: AttendanceSession.objects.filter(id=session.id).update(is_live=True, ended_at=None),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"success": True, "message": "Attendance session stopped."})
+        self.assertFalse(AttendanceSession.objects.get(id=session.id).is_live)
+
+    def test_download_class_sheet(self):
+        url = reverse("downloadAttendanceCsv", args=[self.classroom.id])
+        response = self.assertPerformance("download_class_sheet", lambda: self.client.get(url), queries=7)
+        self.assertEqual(response.status_code, 200)
+        html = response.content.decode()
+        rolls = sheet_rows(html)
+        self.assertEqual(len(rolls), 60)
+        self.assertEqual(rolls, sorted(rolls))
+        # seed_campus: 48 present, 6 failed face checks, 6 absent per session.
+        self.assertIn("<tr><td><b>Present</b></td><td>48</td>", html)
+        self.assertEqual(html.count("<td>FACE_FAILED</td>"), 6)
+
+    def test_download_all_latest(self):
+        url = reverse("downloadAllAttendance")
+        response = self.assertPerformance("download_all_latest", lambda: self.client.get(url), queries=7)
+        self.assertEqual(response.status_code, 200)
+        sheets = zip_sheets(response.consumed_content)
+        self.assertEqual(len(sheets), len(self.classes))
+        for html in sheets.values():
+            self.assertEqual(len(sheet_rows(html)), 60)
+            self.assertIn("<tr><td><b>Present</b></td><td>48</td>", html)
+
+    def test_download_all_range(self):
+        today = timezone.localdate()
+        url = f"{reverse('downloadAllAttendance')}?from={today - timedelta(days=30)}&to={today}"
+        response = self.assertPerformance("download_all_range", lambda: self.client.get(url), queries=7)
+        self.assertEqual(response.status_code, 200)
+        sheets = zip_sheets(response.consumed_content)
+        self.assertEqual(len(sheets), len(self.classes))
+        for html in sheets.values():
+            self.assertIn("<tr><td><b>Sessions</b></td><td>20</td></tr>", html)
+            self.assertEqual(len(sheet_rows(html)), 60)
+            # Always present (position 0) vs. always absent (position 9) in every seeded session.
+            self.assertIn("<td>20</td><td>100.0</td></tr>", html)
+            self.assertIn("<td>0</td><td>0.0</td></tr>", html)
+
+    def test_start_report_job(self):
+        response = self.assertPerformance(
+            "start_report_job",
+            lambda: self.client.post(reverse("startReportJob"), {"scope": "teacher"}),
+            queries=3,
+        )
+        self.assertEqual(response.status_code, 202)
+        job = BackgroundJob.objects.get(id=response.json()["job_id"])
+        self.assertEqual(response.json()["status"], BackgroundJob.STATUS_QUEUED)
+        self.assertEqual(job.params["teacher_id"], self.teacher.id)
+
+    def test_report_job_status(self):
+        job = BackgroundJob.objects.create(
+            kind=BackgroundJob.KIND_ATTENDANCE_REPORT, requested_by=self.teacher.user, progress=40,
+            status=BackgroundJob.STATUS_RUNNING, message="Processed 2 of 5 classes",
+        )
+        url = reverse("reportJobStatus", args=[job.id])
+        response = self.assertPerformance("report_job_status", lambda: self.client.get(url), queries=2)
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual((payload["job_id"], payload["progress"], payload["status"]), (job.id, 40, "running"))
+        self.assertNotIn("download_url", payload)
+
+    def test_download_report_job(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        (root / "report.zip").write_bytes(b"zip-bytes")
+        job = BackgroundJob.objects.create(
+            kind=BackgroundJob.KIND_ATTENDANCE_REPORT, requested_by=self.teacher.user,
+            status=BackgroundJob.STATUS_DONE, result_file="report.zip",
+        )
+        url = reverse("downloadReportJob", args=[job.id])
+        with self.settings(JOB_RESULTS_ROOT=root):
+            response = self.assertPerformance("download_report_job", lambda: self.client.get(url), queries=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.consumed_content, b"zip-bytes")
+        self.assertIn('filename="report.zip"', response["Content-Disposition"])
+
+    def test_logout(self):
+        response = self.assertPerformance("logout", lambda: self.client.get(reverse("logout")), queries=2)
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+        self.assertNotIn("_auth_user_id", self.client.session)
+
+
+@override_settings(RATELIMIT_ENABLE=False, SESSION_ENGINE=settings.SESSION_BACKENDS["cached_db"])
+class PublicPagePerformanceTests(PerformanceContractMixin, TestCase):
+    """Anonymous GETs of the landing, login, registration, OTP and reset pages touch no tables."""
+
+    perf_prefix = "public"
+
+    def test_pages(self):
+        pages = {
+            "home": "common/home.html",
+            "role": "common/roles.html",
+            "login": "common/login.html",
+            "facultyRegister": "teacher/faculty_registration.html",
+            "studentRegister": "student/student_registration.html",
+            "otp": "common/otp_verification.html",
+            "passRst": "common/forgot_password.html",
+        }
+        for name, template in pages.items():
+            with self.subTest(name):
+                response = self.assertPerformance(name, lambda: self.client.get(reverse(name)), queries=0)
+                self.assertEqual(response.status_code, 200)
+                self.assertTemplateUsed(response, template)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teachers = []
+        for enrollment_id in ("TCH0001", "TCH0002"):
+            user = User.objects.create_user(enrollment_id, "t@example.com", "pw")
+            teachers.append(
+                Teacher.objects.create(
+                    user=user, name=enrollment_id, enrollment_id=enrollment_id, department="CSE", designation="AP",
+                    mail_verified=True,
+                )
+            )
+        cls.teacher, cls.previous_teacher = teachers
+        section = Section.objects.create(name="S1", code="CSE-01")
+        user = User.objects.create_user("2300001", "s@example.com", "pw")
+        cls.student = Student.objects.create(user=user, name="S1", roll=2300001, section=section)
+        cls.classroom = ClassRoom.objects.create(subject_name="Sub", section=section, teacher=cls.teacher)
+        today = timezone.localdate()
+
+        def session(teacher, days_ago):
+            # started_at is auto_now_add: sessions are created oldest first.
+            return AttendanceSession.objects.create(
+                classroom=cls.classroom, teacher=teacher, is_live=False, session_date=today - timedelta(days=days_ago)
+            )
+
+        # Taught by the previous owner before the class was reassigned: not part of this teacher's sheet.
+        Attendance.objects.create(
+            session=session(cls.previous_teacher, 3), student=cls.student, status=Attendance.STATUS_PRESENT
+        )
+        Attendance.objects.create(session=session(cls.teacher, 2), student=cls.student, status=Attendance.STATUS_PRESENT)
+        cls.empty_session = session(cls.teacher, 1)
+
+    def export(self, date_from=None, date_to=None):
+        return dict(iter_class_sheets(teacher_export_classes(self.teacher, date_from, date_to), date_from, date_to))
+
+    def test_range_sheet_keeps_sessions_nobody_scanned(self):
+        today = timezone.localdate()
+        [html] = self.export(today - timedelta(days=7), today).values()
+        self.assertIn("<tr><td><b>Sessions</b></td><td>2</td></tr>", html)
+        self.assertIn("<td>PRESENT</td><td>ABSENT</td><td>1</td><td>50.0</td></tr>", html)
+
+    def test_latest_sheet_is_the_teachers_latest_session(self):
+        [html] = self.export().values()
+        self.assertIn(f"<tr><td><b>Session ID</b></td><td>{self.empty_session.id}</td></tr>", html)
+        self.assertIn("<tr><td><b>Present</b></td><td>0</td>", html)
+
+    def test_classes_without_sessions_are_skipped(self):
+        AttendanceSession.objects.filter(teacher=self.teacher).delete()
+        self.assertEqual(self.export(), {})
+
+
+class ArchiveTests(TestCase):
+    first_day, last_day, key = semester_bounds(datetime(2025, 3, 1).date())
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+        section = Section.objects.create(name="S1", code="CSE-01")
+        cls.students = [
+            Student.objects.create(
+                user=User.objects.create_user(str(roll), f"{roll}@example.com", "pw"), name=f"S{roll}", roll=roll,
+                section=section,
+            )
+            for roll in (2300001, 2300002)
+        ]
+        cls.classroom = ClassRoom.objects.create(subject_name="Sub", section=section, teacher=cls.teacher)
+        cls.add_session(datetime(2025, 2, 3).date(), Attendance.STATUS_PRESENT, Attendance.STATUS_PENDING_FACE)
+        cls.add_session(datetime(2025, 2, 10).date(), Attendance.STATUS_PRESENT)
+        # Nobody scanned: still a lecture in the range sheet.
+        cls.add_session(datetime(2025, 2, 17).date())
+
+    @classmethod
+    def add_session(cls, day, *statuses):
+        session = AttendanceSession.objects.create(
+            classroom=cls.classroom, teacher=cls.teacher, is_live=False, session_date=day, ended_at=timezone.now()
+        )
+        for student, status in zip(cls.students, statuses):
+            Attendance.objects.create(
+                session=session, student=student, status=status, qr_scanned_at=timezone.now(), face_score=0.91
+            )
+        return session
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(ATTENDANCE_ARCHIVE_ROOT=Path(root))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def archive(self):
+        session_qs = AttendanceSession.objects.filter(
+            session_date__gte=self.first_day, session_date__lte=self.last_day, is_live=False
+        )
+        return archive_semester(session_qs, self.key, self.first_day, self.last_day)
+
+    def export(self):
+        classes = teacher_export_classes(self.teacher, self.first_day, self.last_day)
+        return dict(iter_class_sheets(classes, self.first_day, self.last_day))
+
+    def test_range_export_is_unchanged_by_archiving(self):
+        before = self.export()
+        self.assertEqual(self.archive(), (3, 3))
+        self.assertFalse(AttendanceSession.objects.exists())
+        self.assertFalse(Attendance.objects.exists())
+        self.assertEqual(self.export(), before)
+        self.assertIn("<tr><td><b>Sessions</b></td><td>3</td></tr>", next(iter(before.values())))
+
+    def test_rerun_merges_into_the_existing_semester_file(self):
+        self.archive()
+        self.add_session(datetime(2025, 3, 3).date(), Attendance.STATUS_FACE_FAILED, Attendance.STATUS_PRESENT)
+        self.assertEqual(self.archive(), (1, 2))
+        self.assertFalse(AttendanceSession.objects.exists())
+        [html] = self.export().values()
+        self.assertIn("<tr><td><b>Sessions</b></td><td>4</td></tr>", html)
+        self.assertIn(
+            "<td>PRESENT</td><td>PRESENT</td><td>ABSENT</td><td>FACE_FAILED</td><td>2</td><td>50.0</td></tr>", html
+        )
+        self.assertIn(
+            "<td>PENDING_FACE</td><td>ABSENT</td><td>ABSENT</td><td>PRESENT</td><td>1</td><td>25.0</td></tr>", html
+        )
+
+    def test_live_rows_stay_when_the_file_misses_sessions(self):
+        def lossy_write(path, key, columns, first_day, last_day):
+            # Simulate a writer that dropped one session on the way to disk.
+            kept = columns["session"]["id"][1:]
+            columns = {
+                "session": {name: values[1:] for name, values in columns["session"].items()},
+                "attendance": {
+                    name: values[np.isin(columns["attendance"]["session_id"], kept)]
+                    for name, values in columns["attendance"].items()
+                },
+            }
+            return write_archive(path, key, columns, first_day, last_day)
+
+        with mock.patch("faculty_app.archive.write_archive", side_effect=lossy_write):
+            with self.assertRaises(RuntimeError):
+                self.archive()
+        self.assertEqual(AttendanceSession.objects.count(), 3)
+        self.assertEqual(Attendance.objects.count(), 3)
+
+    def test_columns_are_memory_mapped(self):
+        self.archive()
+        path = archive_path(self.key)
+        arrays = open_arrays(path)
+        columns = read_columns(path)
+        for table, table_columns in columns.items():
+            for name, values in table_columns.items():
+                self.assertIsInstance(arrays[f"{table}_{name}"], np.memmap)
+                np.testing.assert_array_equal(arrays[f"{table}_{name}"], values)
+
+    def test_compressed_archives_are_still_read(self):
+        before = self.export()
+        with mock.patch("faculty_app.archive.np.savez", np.savez_compressed):
+            self.archive()
+        self.assertNotIsInstance(open_arrays(archive_path(self.key))["session_id"], np.memmap)
+        self.assertEqual(self.export(), before)
+
+
+class BackgroundJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+        section = Section.objects.create(name="S1", code="CSE-01")
+        ClassRoom.objects.create(subject_name="Sub", section=section, teacher=cls.teacher)
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(JOB_RESULTS_ROOT=Path(root), JOB_MAX_ATTEMPTS=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def report_job(self):
+        return enqueue_job(BackgroundJob.KIND_ATTENDANCE_REPORT, report_params("teacher", self.teacher))
+
+    def test_expired_lease_is_reclaimed_then_given_up(self):
+        job = self.report_job()
+        self.assertEqual(claim_next_job().id, job.id)
+        # Lease still held: nothing to claim.
+        self.assertIsNone(claim_next_job())
+
+        BackgroundJob.objects.filter(id=job.id).update(lease_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_next_job()
+        self.assertEqual((reclaimed.id, reclaimed.attempts), (job.id, 2))
+        self.assertGreater(reclaimed.lease_until, timezone.now())
+
+        BackgroundJob.objects.filter(id=job.id).update(lease_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.STATUS_FAILED)
+
+    def test_progress_renews_the_lease(self):
+        self.report_job()
+        job = claim_next_job()
+        BackgroundJob.objects.filter(id=job.id).update(lease_until=timezone.now())
+        job.set_progress(50)
+        job.refresh_from_db()
+        self.assertGreater(job.lease_until, timezone.now() + timedelta(seconds=60))
+
+    def test_failed_report_leaves_no_partial_file(self):
+        self.report_job()
+        job = claim_next_job()
+        with mock.patch("faculty_app.jobs.iter_class_sheets", side_effect=RuntimeError("boom")):
+            job = run_job(job)
+        self.assertEqual(job.status, BackgroundJob.STATUS_FAILED)
+        self.assertIsNone(job.lease_until)
+        self.assertEqual(list(results_root().rglob("*.zip")), [])
+
+    def test_department_and_campus_scopes_are_staff_only(self):
+        self.client.force_login(self.teacher.user)
+        for scope in ("department", "campus"):
+            response = self.client.post(reverse("startReportJob"), {"scope": scope})
+            self.assertEqual(response.status_code, 403)
+        User.objects.filter(id=self.teacher.user_id).update(is_staff=True)
+        self.assertEqual(self.client.post(reverse("startReportJob"), {"scope": "department"}).status_code, 202)
+
+
+@override_settings(DELETION_BATCH_SIZE=1, DELETION_BATCH_PAUSE_SECONDS=0)
+class DeletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teachers = [
+            Teacher.objects.create(
+                user=User.objects.create_user(enrollment_id, f"{enrollment_id}@example.com", "pw"), name=enrollment_id,
+                enrollment_id=enrollment_id, department="CSE", designation="AP", mail_verified=True,
+            )
+            for enrollment_id in ("TCH0001", "TCH0002")
+        ]
+        section = Section.objects.create(name="S1", code="CSE-01")
+        cls.students = [
+            Student.objects.create(
+                user=User.objects.create_user(str(roll), f"{roll}@example.com", "pw"), name=f"S{roll}", roll=roll,
+                section=section,
+            )
+            for roll in (2300001, 2300002)
+        ]
+        cls.classes = [
+            ClassRoom.objects.create(subject_name=f"Sub{position}", section=section, teacher=teacher)
+            for position, teacher in enumerate(cls.teachers)
+        ]
+        for classroom in cls.classes:
+            TimetableSlot.objects.create(classroom=classroom, weekday=0, start_time=time(9), end_time=time(10))
+            cls.add_session(classroom, classroom.teacher, *cls.students)
+        # The second teacher substitutes in the first teacher's class: the session belongs to that class.
+        cls.add_session(cls.classes[0], cls.teachers[1], cls.students[0])
+
+    @classmethod
+    def add_session(cls, classroom, teacher, *students):
+        session = AttendanceSession.objects.create(classroom=classroom, teacher=teacher, is_live=False)
+        RollingQRToken.objects.create(
+            session=session, token=f"token-{session.id}", expires_at=timezone.now() + timedelta(seconds=30)
+        )
+        for student in students:
+            Attendance.objects.create(session=session, student=student, status=Attendance.STATUS_PRESENT)
+        return session
+
+    def counts(self):
+        return {
+            "attendance": Attendance.objects.count(),
+            "qr tokens": RollingQRToken.objects.count(),
+            "sessions": AttendanceSession.objects.count(),
+            "timetable slots": TimetableSlot.objects.count(),
+            "classes": ClassRoom.objects.count(),
+            "teachers": Teacher.objects.count(),
+            "students": Student.objects.count(),
+            "users": User.objects.count(),
+        }
+
+    def test_deactivate_users_blocks_logins_only(self):
+        user_ids = [teacher.user_id for teacher in self.teachers[:1]]
+        self.assertEqual(deactivate_users(user_ids), 1)
+        self.assertEqual(
+            dict(User.objects.values_list("username", "is_active")),
+            {"TCH0001": False, "TCH0002": True, "2300001": True, "2300002": True},
+        )
+        self.assertEqual(Teacher.objects.count(), 2)
+
+    def test_teacher_plan_removes_exactly_the_teachers_rows(self):
+        before = self.counts()
+        progress = []
+        deleted = run_plan(
+            teacher_deletion_plan([self.teachers[0].id]), progress=lambda done, total, label: progress.append(done)
+        )
+        self.assertEqual(
+            deleted,
+            {
+                "attendance": 3, "qr tokens": 2, "sessions": 2, "timetable slots": 1, "classes": 1, "teachers": 1,
+                "users": 1,
+            },
+        )
+        self.assertEqual(progress, list(range(1, 12)))
+        after = self.counts()
+        self.assertEqual({label: before[label] - after[label] for label in before}, {**deleted, "students": 0})
+
+        other = self.teachers[1]
+        self.assertTrue(User.objects.filter(id=other.user_id).exists())
+        self.assertEqual(list(AttendanceSession.objects.values_list("classroom__teacher_id", flat=True)), [other.id])
+        self.assertEqual(Attendance.objects.filter(session__classroom=self.classes[1]).count(), 2)
+
+    def test_student_plan_keeps_other_students_and_sessions(self):
+        student, other = self.students
+        deleted = run_plan(student_deletion_plan([student.id]))
+        self.assertEqual(deleted, {"attendance": 3, "students": 1, "users": 1})
+        self.assertFalse(User.objects.filter(id=student.user_id).exists())
+        self.assertEqual(set(Attendance.objects.values_list("student_id", flat=True)), {other.id})
+        self.assertEqual(AttendanceSession.objects.count(), 3)
+
+    def test_interrupted_job_resumes_and_removes_the_accounts(self):
+        teacher = self.teachers[0]
+        params = {"teacher_ids": [teacher.id], "user_ids": [teacher.user_id]}
+
+        def crash_after_teachers(done, total, label):
+            if label == "teachers":
+                raise RuntimeError("worker killed")
+
+        # First run dies between deleting the teacher row and its account.
+        with self.assertRaises(RuntimeError):
+            run_plan(teacher_deletion_plan(**params), progress=crash_after_teachers)
+        self.assertFalse(Teacher.objects.filter(id=teacher.id).exists())
+        self.assertTrue(User.objects.filter(id=teacher.user_id).exists())
+
+        enqueue_job(BackgroundJob.KIND_DELETE_TEACHERS, params)
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, BackgroundJob.STATUS_DONE, job.error)
+        self.assertEqual(
+            job.message,
+            "Deleted 0 attendance, 0 qr tokens, 0 sessions, 0 timetable slots, 0 classes, 0 teachers, 1 users.",
+        )
+        self.assertFalse(User.objects.filter(id=teacher.user_id).exists())
+        self.assertTrue(User.objects.filter(id=self.teachers[1].user_id).exists())
+
+    def test_student_job_deletes_in_batches(self):
+        student = self.students[1]
+        enqueue_job(BackgroundJob.KIND_DELETE_STUDENTS, {"student_ids": [student.id], "user_ids": [student.user_id]})
+        job = run_job(claim_next_job())
+        self.assertEqual(job.message, "Deleted 2 attendance, 1 students, 1 users.")
+        self.assertEqual(job.progress, 100)
+        self.assertFalse(Student.objects.filter(id=student.id).exists())
+        self.assertEqual(Attendance.objects.count(), 3)
+
+
+class StudentProvisioningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.partial = Section.objects.create(name="S1", code="CSE-01", expected_strength=3)
+        cls.empty = Section.objects.create(name="S2", code="CSE-02", expected_strength=2)
+        cls.full = Section.objects.create(name="S3", code="CSE-03", expected_strength=1)
+        for roll, section in ((2300010, cls.partial), (2300011, cls.full), (2300012, cls.full)):
+            Student.objects.create(
+                user=User.objects.create_user(str(roll), f"{roll}@example.com", "pw"), name=f"S{roll}", roll=roll,
+                section=section,
+            )
+
+    def section_ids(self):
+        return [self.partial.id, self.empty.id, self.full.id]
+
+    def test_sections_are_filled_up_to_expected_strength_in_batches(self):
+        users, students = User.objects.count(), Student.objects.count()
+        progress = []
+        created = provision_students(self.section_ids(), size=2, progress=lambda done, total: progress.append(done))
+        self.assertEqual(created, 4)
+        self.assertEqual(progress, [2, 4])
+        self.assertEqual((User.objects.count() - users, Student.objects.count() - students), (4, 4))
+        self.assertEqual(
+            list(
+                Student.objects.filter(roll__gt=2300012).order_by("roll").values_list("roll", "name", "section__code")
+            ),
+            [
+                (2300013, "Student CSE-01-02", "CSE-01"),
+                (2300014, "Student CSE-01-03", "CSE-01"),
+                (2300015, "Student CSE-02-01", "CSE-02"),
+                (2300016, "Student CSE-02-02", "CSE-02"),
+            ],
+        )
+        student = Student.objects.select_related("user").get(roll=2300016)
+        self.assertEqual((student.user.username, student.user.email), ("2300016", "2300016@kiit.ac.in"))
+        self.assertTrue(student.user.check_password(DEFAULT_ACCOUNT_PASSWORD))
+        self.assertEqual(self.full.students.count(), 2)
+
+    def test_filled_sections_are_skipped_on_a_rerun(self):
+        provision_students(self.section_ids())
+        users = User.objects.count()
+        self.assertEqual(provision_students(self.section_ids()), 0)
+        self.assertEqual(User.objects.count(), users)
+
+    def test_job_reports_the_created_count(self):
+        enqueue_job(BackgroundJob.KIND_PROVISION_STUDENTS, {"section_ids": [self.empty.id]})
+        job = run_job(claim_next_job())
+        self.assertEqual((job.status, job.message), (BackgroundJob.STATUS_DONE, "Inserted 2 students."))
+        self.assertEqual(self.empty.students.count(), 2)
+
+
+class TeacherProvisioningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(1, 5):
+            MasterFaculty.objects.create(
+                enrollment_id=f"TCH000{number}", name=f"Faculty {number}", email=f"faculty{number}@kiit.ac.in",
+                department="CSE", designation="AP",
+            )
+        cls.registered = Teacher.objects.create(
+            user=User.objects.create_user("TCH0001", "old@example.com", "own-password"), name="Registered",
+            enrollment_id="TCH0001", department="ECE", designation="Professor", mail_verified=True,
+        )
+        # An account left over without a teacher profile is reused, not duplicated.
+        cls.orphan = User.objects.create_user("TCH0002", "stale@example.com", "stale-password")
+
+    def test_accounts_are_created_for_faculty_without_a_teacher(self):
+        clear_caches()
+        self.assertIsNone(get_role_profile(ROLE_TEACHER, self.orphan))
+        users = User.objects.count()
+
+        self.assertEqual(provision_teachers(MasterFaculty.objects.all(), size=2), (3, 1))
+        self.assertEqual(User.objects.count() - users, 2)
+        self.assertEqual(
+            list(
+                Teacher.objects.exclude(id=self.registered.id)
+                .order_by("enrollment_id")
+                .values_list("enrollment_id", "name", "user__email", "is_registered", "mail_verified")
+            ),
+            [
+                ("TCH0002", "Faculty 2", "faculty2@kiit.ac.in", True, True),
+                ("TCH0003", "Faculty 3", "faculty3@kiit.ac.in", True, True),
+                ("TCH0004", "Faculty 4", "faculty4@kiit.ac.in", True, True),
+            ],
+        )
+        self.orphan.refresh_from_db()
+        self.assertTrue(self.orphan.check_password(DEFAULT_ACCOUNT_PASSWORD))
+        self.assertEqual(get_role_profile(ROLE_TEACHER, self.orphan).enrollment_id, "TCH0002")
+
+    def test_existing_teachers_are_left_untouched(self):
+        provision_teachers(MasterFaculty.objects.all())
+        self.assertEqual(provision_teachers(MasterFaculty.objects.all()), (0, 4))
+        self.assertEqual(Teacher.objects.count(), 4)
+        self.registered.refresh_from_db()
+        self.assertEqual((self.registered.name, self.registered.department), ("Registered", "ECE"))
+        self.assertTrue(self.registered.user.check_password("own-password"))
+        self.assertEqual(self.registered.user.email, "old@example.com")
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS=30,
+)
+class OutboxTests(TestCase):
+    def enqueue(self, to_email="s@example.com", **kwargs):
+        return enqueue_email("OTP", "Your OTP is 123456.", to_email, **kwargs)
+
+    def make_due(self):
+        OutboundEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claimed_rows_are_leased_until_the_lease_runs_out(self):
+        first, second = self.enqueue("a@example.com"), self.enqueue("b@example.com")
+        claimed = claim_due_emails(10)
+        self.assertEqual({message.id for message in claimed}, {first.id, second.id})
+        self.assertTrue(all(message.status == OutboundEmail.STATUS_SENDING for message in claimed))
+        self.assertGreater(claimed[0].next_attempt_at, timezone.now() + timedelta(seconds=SEND_LEASE_SECONDS - 5))
+        # A second worker finds nothing while the lease is held.
+        self.assertEqual(claim_due_emails(10), [])
+
+        # The first worker crashed: its rows are picked up again once the lease expires.
+        self.make_due()
+        self.assertEqual(len(claim_due_emails(10)), 2)
+
+    def test_sent_messages_record_latency(self):
+        message = self.enqueue()
+        self.assertEqual(deliver_due_emails(), (1, 0, 0))
+        self.assertEqual([email.to for email in mail.outbox], [["s@example.com"]])
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_SENT, 1))
+        self.assertIsNotNone(message.latency_ms)
+
+    def test_send_errors_back_off_then_fail_at_max_attempts(self):
+        message = self.enqueue()
+        with mock.patch.object(EmailBackend, "send_messages", side_effect=OSError("mailbox unavailable")):
+            self.assertEqual(deliver_due_emails(), (0, 1, 0))
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_QUEUED, 1))
+            self.assertEqual(message.last_error, "mailbox unavailable")
+            delay = (message.next_attempt_at - timezone.now()).total_seconds()
+            self.assertTrue(25 < delay <= 30, delay)
+            # Not due yet.
+            self.assertEqual(deliver_due_emails(), (0, 0, 0))
+
+            self.make_due()
+            self.assertEqual(deliver_due_emails(), (0, 0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_FAILED, 2))
+        self.assertEqual(mail.outbox, [])
+
+    def test_connection_failures_count_towards_max_attempts(self):
+        messages = [self.enqueue("a@example.com"), self.enqueue("b@example.com")]
+        with mock.patch.object(EmailBackend, "open", side_effect=OSError("connection refused")):
+            self.assertEqual(deliver_due_emails(), (0, 2, 0))
+            self.make_due()
+            self.assertEqual(deliver_due_emails(), (0, 0, 2))
+        for message in messages:
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_FAILED, 2))
+            self.assertEqual(message.last_error, "connection refused")
+        self.assertEqual(deliver_due_emails(), (0, 0, 0))
+
+    def test_expired_messages_are_dropped_instead_of_sent(self):
+        message = self.enqueue(expires_in=300)
+        self.assertIsNotNone(message.expires_at)
+        OutboundEmail.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_due_emails(), (0, 0, 1))
+        self.assertEqual(mail.outbox, [])
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_FAILED, 0))
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=5, EMAIL_OUTBOX_RETRY_BASE_SECONDS=600)
+    def test_no_retry_is_scheduled_past_the_expiry(self):
+        message = self.enqueue(expires_in=300)
+        with mock.patch.object(EmailBackend, "open", side_effect=OSError("connection refused")):
+            self.assertEqual(deliver_due_emails(), (0, 0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_FAILED, 1))
+
+
+class SeedDemoDataTests(SimpleTestCase):
+    def test_default_session_end_stays_on_the_same_day(self):
+        self.assertEqual(_default_end(time(9, 15)), time(10, 15))
+        self.assertEqual(_default_end(time(22, 59)), time(23, 59))
+        self.assertEqual(_default_end(time(23, 30)), time(23, 59))
+
+
+class TimetableTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+        cls.section = Section.objects.create(name="S1", code="CSE-01")
+        cls.classroom = ClassRoom.objects.create(subject_name="Sub", section=cls.section, teacher=cls.teacher)
+        cls.slot = TimetableSlot.objects.create(
+            classroom=cls.classroom, weekday=0, start_time=time(9), end_time=time(10)
+        )
+        # A long lab and a short tutorial inside it: the tutorial starts last, the lab ends last.
+        cls.lab = ClassRoom.objects.create(subject_name="Lab", section=cls.section, teacher=cls.teacher)
+        TimetableSlot.objects.create(classroom=cls.lab, weekday=0, start_time=time(13), end_time=time(16))
+        TimetableSlot.objects.create(classroom=cls.lab, weekday=0, start_time=time(14), end_time=time(15))
+        # No slots: the class times apply every day.
+        cls.legacy = ClassRoom.objects.create(
+            subject_name="Legacy", section=cls.section, teacher=cls.teacher, start_time=time(11), end_time=time(12)
+        )
+        cls.unscheduled = ClassRoom.objects.create(subject_name="Unscheduled", section=cls.section, teacher=cls.teacher)
+
+    def setUp(self):
+        clear_caches()
+        timetable._day_indexes.clear()
+        self.addCleanup(timetable._day_indexes.clear)
+
+    def test_index_is_rebuilt_when_the_version_is_bumped(self):
+        index = timetable.get_day_index(0)
+        self.assertIs(timetable.get_day_index(0), index)
+        self.slot.start_time = time(11)
+        self.slot.end_time = time(12)
+        self.slot.save()
+        _status, interval = timetable.get_day_index(0).class_status(self.classroom.id, time(8))
+        self.assertEqual(interval.start, time(11))
+
+    def test_index_expires_without_a_version_bump(self):
+        index = timetable.get_day_index(0)
+        # queryset.update() skips the signals, like an edit made on a worker with its own local cache.
+        TimetableSlot.objects.filter(id=self.slot.id).update(start_time=time(11), end_time=time(12))
+        self.assertIs(timetable.get_day_index(0), index)
+        with self.settings(TIMETABLE_INDEX_TTL=0):
+            _status, interval = timetable.get_day_index(0).class_status(self.classroom.id, time(8))
+        self.assertEqual(interval.start, time(11))
+
+    def monday(self, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 10, 19, hour, minute))
+
+    def status(self, classroom, hour, minute=0, weekday=0):
+        (text, _color), interval = timetable.get_day_index(weekday).class_status(classroom.id, time(hour, minute))
+        return text, interval and (interval.start, interval.end)
+
+    def test_day_schedule_lookups(self):
+        day = timetable.get_day_index(0).all
+        self.assertEqual(
+            [(interval.start, interval.end) for interval in day.ongoing(time(14, 30))],
+            [(time(13), time(16)), (time(14), time(15))],
+        )
+        self.assertEqual(day.ongoing(time(12, 30)), [])
+        self.assertEqual(day.next_after(time(12, 30)).start, time(13))
+        self.assertIsNone(day.next_after(time(16)))
+        self.assertEqual(
+            [interval.start for interval in day.starting_between(time(9), time(13))], [time(9), time(11), time(13)]
+        )
+
+    def test_class_status(self):
+        self.assertEqual(self.status(self.classroom, 8), ("Upcoming", (time(9), time(10))))
+        self.assertEqual(self.status(self.classroom, 9, 30), ("Ongoing", (time(9), time(10))))
+        self.assertEqual(self.status(self.lab, 14, 30), ("Ongoing", (time(13), time(16))))
+        # Completed shows the interval that ended last, not the one that started last.
+        self.assertEqual(self.status(self.lab, 17), ("Completed", (time(13), time(16))))
+        self.assertEqual(self.status(self.classroom, 9, weekday=1), ("Not Today", None))
+        self.assertEqual(self.status(self.legacy, 11, 30, weekday=3), ("Ongoing", (time(11), time(12))))
+        self.assertEqual(self.status(self.unscheduled, 9), ("Timing Not Set", None))
+
+    def test_annotate_cards(self):
+        cards = [
+            {"id": classroom.id, "start_time": None, "end_time": None}
+            for classroom in (self.classroom, self.lab, self.unscheduled)
+        ]
+        annotated = timetable.annotate_cards(cards, now=self.monday(9, 30))
+        self.assertEqual(
+            [(card["status_text"], card["start_time"]) for card in annotated],
+            [("Ongoing", time(9)), ("Upcoming", time(13)), ("Timing Not Set", None)],
+        )
+        self.assertNotIn("status_text", cards[0])
+
+    def tick(self, now, *args):
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            call_command("run_timetable_tick", *args, stdout=io.StringIO())
+
+    def test_tick_auto_starts_once_and_closes_after_the_grace_period(self):
+        self.tick(self.monday(9, 2), "--auto-start")
+        session = AttendanceSession.objects.get()
+        self.assertEqual(
+            (session.classroom_id, session.teacher_id, session.is_live), (self.classroom.id, self.teacher.id, True)
+        )
+
+        self.tick(self.monday(9, 4), "--auto-start")
+        self.assertEqual(AttendanceSession.objects.count(), 1)
+
+        self.tick(self.monday(10, 5), "--close-grace", "10")
+        session.refresh_from_db()
+        self.assertTrue(session.is_live)
+        self.tick(self.monday(10, 15), "--close-grace", "10")
+        session.refresh_from_db()
+        self.assertFalse(session.is_live)
+        self.assertEqual(session.ended_at, self.monday(10, 15))
+
+    def test_tick_without_auto_start_only_closes(self):
+        self.tick(self.monday(9, 2))
+        self.assertFalse(AttendanceSession.objects.exists())
+
+
+class DashboardCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+        cls.section = Section.objects.create(name="S1", code="CSE-01")
+        cls.student = Student.objects.create(
+            user=User.objects.create_user("2300001", "s@example.com", "pw"), name="S1", roll=2300001,
+            section=cls.section, mail_verified=True,
+        )
+        cls.classroom = ClassRoom.objects.create(
+            subject_name="Networks", section=cls.section, teacher=cls.teacher, start_time=time(9), end_time=time(10)
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def dashboards(self):
+        """(teacher dashboard, student dashboard) HTML; the first call fills the card caches."""
+        pages = []
+        for user, name in ((self.teacher.user, "fdashboard"), (self.student.user, "sdashboard")):
+            self.client.force_login(user)
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.content.decode())
+        return pages
+
+    def test_cards_are_served_from_the_cache(self):
+        self.dashboards()
+        # No signal, no version bump: the cached cards are still shown.
+        ClassRoom.objects.filter(id=self.classroom.id).update(subject_name="Databases")
+        for html in self.dashboards():
+            self.assertIn("Networks", html)
+
+    def test_class_save_rerenders_teacher_and_student_cards(self):
+        self.dashboards()
+        self.classroom.subject_name = "Databases"
+        self.classroom.save()
+        for html in self.dashboards():
+            self.assertIn("Databases", html)
+            self.assertNotIn("Networks", html)
+
+    def test_section_save_rerenders_teacher_and_student_cards(self):
+        self.dashboards()
+        self.section.code = "CSE-09"
+        self.section.save()
+        for html in self.dashboards():
+            self.assertIn("CSE-09", html)
+            self.assertNotIn("CSE-01", html)
+
+
+class ImporterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+        cls.section = Section.objects.create(name="S1", code="CSE-01")
+        cls.other_section = Section.objects.create(name="S2", code="CSE-02")
+        cls.existing = Student.objects.create(
+            user=User.objects.create_user("2300001", "s@example.com", "pw"), name="Old Name", roll=2300001,
+            section=cls.section,
+        )
+        cls.unchanged = Student.objects.create(
+            user=User.objects.create_user("2300002", "s2@example.com", "pw"), name="Same", roll=2300002,
+            section=cls.section,
+        )
+
+    def run_import(self, importer, text, chunk_size=100):
+        with self.captureOnCommitCallbacks(execute=True):
+            return importer.run(io.StringIO(text), chunk_size)
+
+    def test_students_are_diffed_by_roll(self):
+        stats = self.run_import(
+            StudentImporter(password="pw"),
+            "roll,name,section_code\n2300001,New Name,CSE-02\n2300002,Same,CSE-01\n2300003,Fresh,CSE-01\n",
+        )
+        self.assertEqual((stats["created"], stats["updated"], stats["unchanged"]), (1, 1, 1))
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.section_id), ("New Name", self.other_section.id))
+        fresh = Student.objects.select_related("user").get(roll=2300003)
+        self.assertEqual((fresh.user.username, fresh.user.email), ("2300003", "2300003@kiit.ac.in"))
+
+    def test_duplicate_keys_keep_the_last_row(self):
+        stats = self.run_import(
+            StudentImporter(password="pw"), "roll,name,section_code\n2300004,First,CSE-01\n2300004,Second,CSE-01\n"
+        )
+        self.assertEqual((stats["duplicate"], stats["created"]), (1, 1))
+        self.assertEqual(Student.objects.get(roll=2300004).name, "Second")
+
+    def test_dry_run_writes_nothing(self):
+        importer = StudentImporter(dry_run=True, password="pw")
+        users = User.objects.count()
+        stats = self.run_import(importer, "roll,name,section_code\n2300001,New Name,CSE-01\n2300005,Fresh,CSE-01\n")
+        self.assertEqual((stats["created"], stats["updated"]), (1, 1))
+        self.assertEqual(User.objects.count(), users)
+        self.assertFalse(Student.objects.filter(roll=2300005).exists())
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, "Old Name")
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        importer = StudentImporter(password="pw")
+        stats = self.run_import(
+            importer,
+            "roll,name,section_code\nabc,Bad Roll,CSE-01\n2300006,Unknown,CSE-99\n2300007,,CSE-01\n"
+            "2300008,Good,CSE-01\n",
+        )
+        self.assertEqual((stats["read"], stats["invalid"], stats["created"]), (4, 3, 1))
+        self.assertEqual(
+            importer.errors,
+            [
+                "line 2: roll 'abc' is not a number",
+                "line 3: unknown section 'CSE-99'",
+                "line 4: 'name' is required",
+            ],
+        )
+        self.assertTrue(Student.objects.filter(roll=2300008).exists())
+
+    def test_committed_chunks_invalidate_caches_when_a_later_chunk_fails(self):
+        class FailingClassImporter(ClassImporter):
+            def apply(self, records):
+                if self.stats["read"] > 1:
+                    raise IntegrityError("second chunk fails")
+                super().apply(records)
+
+        clear_caches()
+        versions = (cards_version(SCOPE_SECTION, self.section.id), cards_version(SCOPE_TEACHER, self.teacher.id))
+        with self.assertRaises(IntegrityError):
+            self.run_import(
+                FailingClassImporter(),
+                "section_code,subject_name,teacher_enrollment_id\nCSE-01,Networks,TCH0001\nCSE-01,Databases,TCH0001\n",
+                chunk_size=1,
+            )
+        self.assertEqual(list(ClassRoom.objects.values_list("subject_name", flat=True)), ["Networks"])
+        self.assertNotEqual(cards_version(SCOPE_SECTION, self.section.id), versions[0])
+        self.assertNotEqual(cards_version(SCOPE_TEACHER, self.teacher.id), versions[1])
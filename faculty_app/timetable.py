@@ -0,0 +1,233 @@
+"""
+Timetable engine
+Per-weekday interval index answering "what is ongoing / next" for a teacher, section or class.
+Shared by both dashboards and by the session auto-start/auto-close tick.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import ClassRoom, TimetableSlot
+
+SCOPE_TEACHER = "teacher"
+SCOPE_SECTION = "section"
+SCOPE_CLASS = "class"
+
+STATUS_ONGOING = ("Ongoing", "success")
+STATUS_UPCOMING = ("Upcoming", "warning")
+STATUS_COMPLETED = ("Completed", "secondary")
+STATUS_NOT_TODAY = ("Not Today", "secondary")
+STATUS_NOT_SET = ("Timing Not Set", "secondary")
+
+_VERSION_KEY = "sams:timetable:version"
+
+Interval = namedtuple("Interval", "start end classroom_id teacher_id section_id")
+
+
+class DaySchedule:
+    """Intervals of one owner on one weekday, sorted by start time."""
+
+    __slots__ = ("intervals", "starts", "max_end")
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda interval: (interval.start, interval.end))
+        self.starts = [interval.start for interval in self.intervals]
+        # Running maximum of end times: lets ongoing() stop as soon as nothing earlier can overlap t.
+        self.max_end = list(accumulate((interval.end for interval in self.intervals), max))
+
+    def ongoing(self, at_time):
+        """Intervals with start <= at_time <= end."""
+        found = []
+        i = bisect_right(self.starts, at_time) - 1
+        while i >= 0 and self.max_end[i] >= at_time:
+            if self.intervals[i].end >= at_time:
+                found.append(self.intervals[i])
+            i -= 1
+        found.reverse()
+        return found
+
+    def next_after(self, at_time):
+        """First interval starting strictly after at_time, or None."""
+        pos = bisect_right(self.starts, at_time)
+        return self.intervals[pos] if pos < len(self.intervals) else None
+
+    def starting_between(self, start, end):
+        """Intervals whose start lies in [start, end]."""
+        return self.intervals[bisect_left(self.starts, start):bisect_right(self.starts, end)]
+
+
+_EMPTY_DAY = DaySchedule([])
+
+
+class DayIndex:
+    """All class intervals of one weekday, grouped by teacher, section and class."""
+
+    def __init__(self, weekday, intervals, weekly_class_ids):
+        self.weekday = weekday
+        self.all = DaySchedule(intervals)
+        # Classes that have slots on some weekday (so "no interval today" means "not today").
+        self.weekly_class_ids = frozenset(weekly_class_ids)
+        grouped = {SCOPE_TEACHER: defaultdict(list), SCOPE_SECTION: defaultdict(list), SCOPE_CLASS: defaultdict(list)}
+        for interval in intervals:
+            grouped[SCOPE_TEACHER][interval.teacher_id].append(interval)
+            grouped[SCOPE_SECTION][interval.section_id].append(interval)
+            grouped[SCOPE_CLASS][interval.classroom_id].append(interval)
+        self._owners = {
+            scope: {owner_id: DaySchedule(items) for owner_id, items in owners.items()}
+            for scope, owners in grouped.items()
+        }
+
+    def schedule(self, scope, owner_id):
+        return self._owners[scope].get(owner_id, _EMPTY_DAY)
+
+    def now_and_next(self, scope, owner_id, at_time):
+        """(ongoing intervals, next interval or None) for one teacher/section/class."""
+        day = self.schedule(scope, owner_id)
+        return day.ongoing(at_time), day.next_after(at_time)
+
+    def class_status(self, classroom_id, at_time):
+        """((status_text, status_color), interval shown on the card or None)."""
+        day = self._owners[SCOPE_CLASS].get(classroom_id)
+        if day is None:
+            if classroom_id in self.weekly_class_ids:
+                return STATUS_NOT_TODAY, None
+            return STATUS_NOT_SET, None
+        ongoing = day.ongoing(at_time)
+        if ongoing:
+            return STATUS_ONGOING, ongoing[0]
+        upcoming = day.next_after(at_time)
+        if upcoming:
+            return STATUS_UPCOMING, upcoming
+        return STATUS_COMPLETED, max(day.intervals, key=lambda interval: interval.end)
+
+
+def build_day_index(weekday):
+    """Load one weekday's intervals (weekly slots plus legacy daily class times)."""
+    slot_rows = TimetableSlot.objects.filter(
+        weekday=weekday,
+        is_active=True,
+        classroom__is_active=True,
+    ).values_list("start_time", "end_time", "classroom_id", "classroom__teacher_id", "classroom__section_id")
+    intervals = [Interval(*row) for row in slot_rows]
+
+    weekly_class_ids = set(
+        TimetableSlot.objects.filter(is_active=True).values_list("classroom_id", flat=True).distinct()
+    )
+    legacy_rows = ClassRoom.objects.filter(
+        is_active=True,
+        start_time__isnull=False,
+        end_time__isnull=False,
+    ).values_list("start_time", "end_time", "id", "teacher_id", "section_id")
+    intervals.extend(Interval(*row) for row in legacy_rows if row[2] not in weekly_class_ids)
+    return DayIndex(weekday, intervals, weekly_class_ids)
+
+
+def timetable_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(_VERSION_KEY, version, None)
+        version = cache.get(_VERSION_KEY, version)
+    return version
+
+
+def bump_timetable_version():
+    """
+    Invalidate the day indexes (called from model signals). Reaches every worker when the default
+    cache is shared (SAMS_CACHE_URL); otherwise the others rebuild after TIMETABLE_INDEX_TTL.
+    """
+    cache.set(_VERSION_KEY, time.time_ns(), None)
+
+
+def _index_ttl():
+    return getattr(settings, "TIMETABLE_INDEX_TTL", 60)
+
+
+# weekday -> (version, built at, DayIndex); rebuilt lazily when the version changes or the copy expires.
+_day_indexes = {}
+_day_indexes_lock = threading.Lock()
+
+
+def get_day_index(weekday):
+    version = timetable_version()
+    cached = _day_indexes.get(weekday)
+    if cached and cached[0] == version and time.monotonic() - cached[1] < _index_ttl():
+        return cached[2]
+    index = build_day_index(weekday)
+    with _day_indexes_lock:
+        _day_indexes[weekday] = (version, time.monotonic(), index)
+    return index
+
+
+def annotate_cards(cards, now=None):
+    """
+    Return copies of dashboard cards with status badge and today's time window.
+    Cards come from the dashboard cache; this is the only per-request work.
+    """
+    now = timezone.localtime(now)
+    at_time = now.time()
+    index = get_day_index(now.weekday())
+    annotated = []
+    for card in cards:
+        (status_text, status_color), interval = index.class_status(card["id"], at_time)
+        item = {**card, "status_text": status_text, "status_color": status_color}
+        if interval:
+            item["start_time"] = interval.start
+            item["end_time"] = interval.end
+        annotated.append(item)
+    return annotated
+
+
+def now_and_next(scope, owner_id, now=None):
+    """Ongoing intervals and the next interval today for a teacher/section/class."""
+    now = timezone.localtime(now)
+    return get_day_index(now.weekday()).now_and_next(scope, owner_id, now.time())
+
+
+def now_and_next_cards(cards, scope, owner_id, now=None):
+    """
+    (ongoing card, next card) for a dashboard header, picked from already-loaded cards.
+    The next card carries the upcoming interval's times.
+    """
+    ongoing, upcoming = now_and_next(scope, owner_id, now)
+    cards_by_id = {card["id"]: card for card in cards}
+    now_card = cards_by_id.get(ongoing[0].classroom_id) if ongoing else None
+    next_card = None
+    if upcoming and upcoming.classroom_id in cards_by_id:
+        next_card = {**cards_by_id[upcoming.classroom_id], "start_time": upcoming.start, "end_time": upcoming.end}
+    return now_card, next_card
+
+
+def intervals_started_within(minutes, now=None):
+    """Intervals of today that started during the last `minutes` (auto-start candidates)."""
+    now = timezone.localtime(now)
+    window_start = now - timedelta(minutes=minutes)
+    # Never reach back across midnight into another weekday's times.
+    start_time = window_start.time() if window_start.date() == now.date() else datetime.min.time()
+    return get_day_index(now.weekday()).all.starting_between(start_time, now.time())
+
+
+def scheduled_end(classroom_id, started_at):
+    """
+    End of the timetable interval a session started in (or just before), as an aware datetime.
+    None when the class has no interval that day, i.e. the session is unscheduled.
+    """
+    local_start = timezone.localtime(started_at)
+    day = get_day_index(local_start.weekday()).schedule(SCOPE_CLASS, classroom_id)
+    ongoing = day.ongoing(local_start.time())
+    interval = ongoing[-1] if ongoing else day.next_after(local_start.time())
+    if interval is None:
+        return None
+    return local_start.replace(
+        hour=interval.end.hour,
+        minute=interval.end.minute,
+        second=interval.end.second,
+        microsecond=0,
+    )
@@ -2,16 +2,34 @@
 Faculty app views for registration and dashboard
 """
 from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.shortcuts import render, redirect
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.http import require_GET, require_POST
-from django.utils.html import escape
 from django.utils import timezone
-from .models import Attendance, AttendanceSession, ClassRoom, MasterFaculty, RollingQRToken, Teacher
+from django.utils.dateparse import parse_date
+from .archive import ArchiveReader
+from .dashboard import SCOPE_TEACHER, cards_version, status_signature, teacher_class_cards
+from .exports import (
+    SHEET_CONTENT_TYPE,
+    ZIP_CONTENT_TYPE,
+    iter_class_sheets,
+    iter_zip,
+    render_session_sheet,
+    safe_filename,
+    sheet_basename,
+    teacher_export_classes,
+)
+from .mail import enqueue_email
+from sams_main.replicas import primary_db
+from .jobs import REPORT_SCOPE_TEACHER, REPORT_SCOPES, enqueue_job, report_params, result_path
+from .models import Attendance, AttendanceSession, BackgroundJob, ClassRoom, MasterFaculty, RollingQRToken, Teacher
+from .timetable import SCOPE_TEACHER as TIMETABLE_TEACHER, annotate_cards, now_and_next_cards
 import secrets 
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
-from django.core.mail import send_mail
 from django.contrib import messages
 
 # Constants
@@ -20,26 +38,27 @@ OTP_MAX = 999999
 OTP_EXPIRY_SECONDS = 300  # 5 minutes
 
 
-def _time_status(start_time, end_time, now_time):
-    # Shared helper for dashboard status badge.
-    if not start_time or not end_time:
-        return "Timing Not Set", "secondary"
-    if start_time <= now_time <= end_time:
-        return "Ongoing", "success"
-    if now_time < start_time:
-        return "Upcoming", "warning"
-    return "Completed", "secondary"
+def _parse_date_param(raw_value):
+    """Parse an optional YYYY-MM-DD query value; raise ValueError on malformed input."""
+    if not raw_value:
+        return None
+    parsed = parse_date(raw_value)
+    if parsed is None:
+        raise ValueError(raw_value)
+    return parsed
 
 
 def _issue_new_token(session):
     """Deactivate old token(s) and issue a fresh QR token for a live session."""
     now = timezone.now()
-    session.qr_tokens.filter(is_active=True).update(is_active=False)
-    return RollingQRToken.objects.create(
-        session=session,
-        expires_at=now + timedelta(seconds=session.qr_validity_seconds),
-        is_active=True,
-    )
+    # One write transaction: scanners never see a session without an active token.
+    with transaction.atomic():
+        session.qr_tokens.filter(is_active=True).update(is_active=False)
+        return RollingQRToken.objects.create(
+            session=session,
+            expires_at=now + timedelta(seconds=session.qr_validity_seconds),
+            is_active=True,
+        )
 
 
 def _get_or_rotate_token(session):
@@ -55,6 +74,18 @@ def _get_or_rotate_token(session):
     return _issue_new_token(session)
 
 
+async def _aget_or_rotate_token(session):
+    """Async variant of _get_or_rotate_token; rotation stays one sync transaction."""
+    token = await (
+        session.qr_tokens.filter(is_active=True, expires_at__gt=timezone.now())
+        .order_by("-issued_at")
+        .afirst()
+    )
+    if token:
+        return token
+    return await sync_to_async(_issue_new_token)(session)
+
+
 def facultyRegister(request):
     """
     Handle faculty registration
@@ -87,18 +118,13 @@ def facultyRegister(request):
             request.session['pass'] = request.POST.get('passwd')
             request.session['faculty_register'] = True  # Mark as faculty registration
 
-            # Send OTP email (handle missing email settings gracefully)
-            try:
-                from_email = getattr(settings, 'EMAIL_HOST_USER', 'noreply@sams.local')
-                send_mail(
-                    subject="Your OTP for SAMS registration",
-                    message=f"Your OTP is {otp}. This OTP will expire in 5 minutes.",
-                    from_email=from_email,
-                    recipient_list=[faculty.email],
-                )
-            except Exception:
-                # Email sending failed, but continue (will be caught in OTP verification)
-                pass
+            # Queue OTP email; the outbox worker (send_queued_emails) delivers it off the request path
+            enqueue_email(
+                subject="Your OTP for SAMS registration",
+                body=f"Your OTP is {otp}. This OTP will expire in 5 minutes.",
+                to_email=faculty.email,
+                expires_in=OTP_EXPIRY_SECONDS,
+            )
 
             return redirect('otp')
 
@@ -114,40 +140,26 @@ def renderDashboard(request):
     Render faculty/teacher dashboard
     Requires user to be logged in and have a Teacher profile
     """
-    name = ""
-    classes = []
-    user = request.user
-    
-    try:
-        # Teacher sees only classes assigned to their profile.
-        teacher = Teacher.objects.get(user=user)
-        name = teacher.name
-        now_time = timezone.localtime().time()
-        class_qs = (
-            ClassRoom.objects.filter(teacher=teacher, is_active=True)
-            .select_related("section")
-            .order_by("start_time", "subject_name")
-        )
-        for class_obj in class_qs:
-            status_text, status_color = _time_status(class_obj.start_time, class_obj.end_time, now_time)
-            classes.append(
-                {
-                    "id": class_obj.id,
-                    "subject_name": class_obj.subject_name,
-                    "section_code": class_obj.section.code,
-                    "start_time": class_obj.start_time,
-                    "end_time": class_obj.end_time,
-                    "status_text": status_text,
-                    "status_color": status_color,
-                }
-            )
-
-    except Teacher.DoesNotExist:
+    # Teacher sees only classes assigned to their profile.
+    teacher = request.teacher
+    if not teacher:
         return redirect('login')
 
+    name = teacher.name
+    now = timezone.localtime()
+    # Card data is cached; only the time-dependent badge is computed per request.
+    classes = annotate_cards(teacher_class_cards(teacher.id), now)
+    now_class, next_class = now_and_next_cards(classes, TIMETABLE_TEACHER, teacher.id, now)
+
     context = {
         'name': name,
         'classes': classes,
+        'now_class': now_class,
+        'next_class': next_class,
+        'cards_cache_ttl': getattr(settings, 'DASHBOARD_CACHE_TTL', 3600),
+        'cards_version': cards_version(SCOPE_TEACHER, teacher.id),
+        'cards_status': status_signature(classes),
+        'teacher_id': teacher.id,
     }
 
     return render(request, 'teacher/teacher_dashboard.html', context)
@@ -157,9 +169,8 @@ def renderDashboard(request):
 @require_POST
 def start_attendance_session(request, classroom_id):
     """Start a new live attendance session for a teacher-owned classroom."""
-    try:
-        teacher = Teacher.objects.get(user=request.user)
-    except Teacher.DoesNotExist:
+    teacher = request.teacher
+    if not teacher:
         return JsonResponse({"error": "Teacher profile not found."}, status=404)
 
     classroom = ClassRoom.objects.filter(id=classroom_id, teacher=teacher, is_active=True).first()
@@ -194,22 +205,22 @@ def start_attendance_session(request, classroom_id):
     )
 
 
+@primary_db
 @login_required
 @require_GET
-def current_qr_token(request, session_id):
-    """Fetch current token for a live session, rotating if expired."""
-    try:
-        teacher = Teacher.objects.get(user=request.user)
-    except Teacher.DoesNotExist:
+async def current_qr_token(request, session_id):
+    """Fetch current token for a live session, rotating if expired (polled by the projector page)."""
+    teacher = await request.ateacher()
+    if not teacher:
         return JsonResponse({"error": "Teacher profile not found."}, status=404)
 
-    session = AttendanceSession.objects.filter(id=session_id, teacher=teacher).select_related("classroom").first()
+    session = await AttendanceSession.objects.filter(id=session_id, teacher=teacher).afirst()
     if not session:
         return JsonResponse({"error": "Session not found."}, status=404)
     if not session.is_live:
         return JsonResponse({"error": "Session is not live."}, status=400)
 
-    token = _get_or_rotate_token(session)
+    token = await _aget_or_rotate_token(session)
     return JsonResponse(
         {
             "success": True,
@@ -226,9 +237,8 @@ def current_qr_token(request, session_id):
 @require_POST
 def stop_attendance_session(request, session_id):
     """Stop a live attendance session and invalidate active tokens."""
-    try:
-        teacher = Teacher.objects.get(user=request.user)
-    except Teacher.DoesNotExist:
+    teacher = request.teacher
+    if not teacher:
         return JsonResponse({"error": "Teacher profile not found."}, status=404)
 
     session = AttendanceSession.objects.filter(id=session_id, teacher=teacher).first()
@@ -237,10 +247,7 @@ def stop_attendance_session(request, session_id):
     if not session.is_live:
         return JsonResponse({"success": True, "message": "Session already stopped."})
 
-    session.is_live = False
-    session.ended_at = timezone.now()
-    session.save(update_fields=["is_live", "ended_at"])
-    session.qr_tokens.filter(is_active=True).update(is_active=False)
+    session.close()
 
     return JsonResponse({"success": True, "message": "Attendance session stopped."})
 
@@ -252,9 +259,8 @@ def download_attendance_csv(request, classroom_id):
     Export latest session attendance for the class as Excel-compatible .xls.
     Keeps dependency footprint small by using HTML table output.
     """
-    try:
-        teacher = Teacher.objects.get(user=request.user)
-    except Teacher.DoesNotExist:
+    teacher = request.teacher
+    if not teacher:
         return JsonResponse({"error": "Teacher profile not found."}, status=404)
 
     classroom = ClassRoom.objects.filter(id=classroom_id, teacher=teacher).select_related("section").first()
@@ -270,101 +276,132 @@ def download_attendance_csv(request, classroom_id):
         return JsonResponse({"error": "Take attendance first before downloading the sheet."}, status=400)
 
     teacher_name = teacher.name or teacher.enrollment_id
-    students = classroom.section.students.select_related("user").order_by("roll")
-    attendance_map = {
-        row.student_id: row
-        for row in Attendance.objects.filter(session=session).select_related("student")
-    }
+    students = list(classroom.section.students.order_by("roll"))
+    attendance_map = {row.student_id: row for row in Attendance.objects.filter(session=session)}
 
-    rows = []
-    present_count = 0
-    for student in students:
-        # If no record exists for student in this session, they are absent.
-        row = attendance_map.get(student.id)
-        status = "ABSENT"
-        attendance_time = ""
-        attendance_date = ""
-        score = ""
-        if row:
-            status = row.status.upper()
-            stamp = row.marked_at or row.qr_scanned_at
-            if stamp:
-                local_stamp = timezone.localtime(stamp)
-                attendance_date = local_stamp.strftime("%Y-%m-%d")
-                attendance_time = local_stamp.strftime("%H:%M:%S")
-            score = f"{row.face_score:.4f}" if row.face_score is not None else ""
-            if row.status == Attendance.STATUS_PRESENT:
-                present_count += 1
-        rows.append(
-            {
-                "roll": student.roll,
-                "name": student.name,
-                "status": status,
-                "date": attendance_date,
-                "time": attendance_time,
-                "score": score,
-            }
-        )
-
-    strength = students.count()
-    absent_count = strength - present_count
-    started_local = timezone.localtime(session.started_at)
-    ended_local = timezone.localtime(session.ended_at).strftime("%Y-%m-%d %H:%M:%S") if session.ended_at else "LIVE"
-
-    # Excel-compatible HTML table output (.xls)
-    html = [
-        "<html><head><meta charset='utf-8'></head><body>",
-        "<table border='1'>",
-        f"<tr><td><b>Class Name</b></td><td>{escape(classroom.subject_name)}</td></tr>",
-        f"<tr><td><b>Teacher</b></td><td>{escape(teacher_name)}</td></tr>",
-        f"<tr><td><b>Section</b></td><td>{escape(classroom.section.code)}</td></tr>",
-        f"<tr><td><b>Session ID</b></td><td>{session.id}</td></tr>",
-        f"<tr><td><b>Session Date</b></td><td>{started_local.strftime('%Y-%m-%d')}</td></tr>",
-        f"<tr><td><b>Started At</b></td><td>{started_local.strftime('%H:%M:%S')}</td></tr>",
-        f"<tr><td><b>Ended At</b></td><td>{ended_local}</td></tr>",
-        "<tr><td colspan='7'></td></tr>",
-        "<tr>"
-        "<th>Roll No</th><th>Student Name</th><th>Class Name</th><th>Section</th>"
-        "<th>Attendance Date</th><th>Attendance Time</th><th>Status</th>"
-        "</tr>",
-    ]
-    for row in rows:
-        html.append(
-            "<tr>"
-            f"<td>{row['roll']}</td>"
-            f"<td>{escape(row['name'] or '')}</td>"
-            f"<td>{escape(classroom.subject_name)}</td>"
-            f"<td>{escape(classroom.section.code)}</td>"
-            f"<td>{row['date']}</td>"
-            f"<td>{row['time']}</td>"
-            f"<td>{row['status']}</td>"
-            "</tr>"
-        )
-    html.extend(
-        [
-            "<tr><td colspan='7'></td></tr>",
-            f"<tr><td><b>Class Strength</b></td><td>{strength}</td><td colspan='5'></td></tr>",
-            f"<tr><td><b>Present</b></td><td>{present_count}</td><td colspan='5'></td></tr>",
-            f"<tr><td><b>Absent</b></td><td>{absent_count}</td><td colspan='5'></td></tr>",
-            "</table></body></html>",
-        ]
+    html = render_session_sheet(classroom, teacher_name, session, students, attendance_map)
+    response = HttpResponse(html, content_type=SHEET_CONTENT_TYPE)
+    response["Content-Disposition"] = (
+        f'attachment; filename="{sheet_basename(classroom)}.xls"'
     )
+    return response
 
-    response = HttpResponse("".join(html), content_type="application/vnd.ms-excel; charset=utf-8")
-    raw_filename = f"{classroom.section.code}-{classroom.subject_name}"
-    safe_filename = (
-        raw_filename.replace("\\", "")
-        .replace("/", "")
-        .replace(":", "")
-        .replace("*", "")
-        .replace("?", "")
-        .replace('"', "")
-        .replace("<", "")
-        .replace(">", "")
-        .replace("|", "")
-        .strip()
-    ) or f"attendance_{classroom.id}"
+
+@login_required
+@require_GET
+def download_all_attendance_zip(request):
+    """
+    Stream one sheet per class owned by the teacher as a single ZIP archive.
+    Optional ?from=YYYY-MM-DD&to=YYYY-MM-DD switches to a per-class session matrix.
+    """
+    teacher = request.teacher
+    if not teacher:
+        return JsonResponse({"error": "Teacher profile not found."}, status=404)
+
+    try:
+        date_from = _parse_date_param(request.GET.get("from"))
+        date_to = _parse_date_param(request.GET.get("to"))
+    except ValueError:
+        return JsonResponse({"error": "Dates must use YYYY-MM-DD format."}, status=400)
+    if date_from and date_to and date_from > date_to:
+        return JsonResponse({"error": "'from' date must not be after 'to' date."}, status=400)
+
+    # Cheap existence check up front: a streamed body can no longer turn into a JSON error.
+    has_records = Attendance.objects.filter(session__teacher=teacher)
+    if date_from:
+        has_records = has_records.filter(session__session_date__gte=date_from)
+    if date_to:
+        has_records = has_records.filter(session__session_date__lte=date_to)
+    archives = ArchiveReader(date_from, date_to) if date_from or date_to else None
+    if not has_records.exists() and not (
+        archives and archives.has_attendance(ClassRoom.objects.filter(teacher=teacher).values_list("id", flat=True))
+    ):
+        return JsonResponse({"error": "Take attendance first before downloading the sheet."}, status=400)
+
+    classes = teacher_export_classes(teacher, date_from, date_to)
+    response = StreamingHttpResponse(
+        iter_zip(iter_class_sheets(classes, date_from, date_to, archives=archives)),
+        content_type=ZIP_CONTENT_TYPE,
+    )
+    label = teacher.enrollment_id
+    if date_from or date_to:
+        label = f"{label}-{date_from or 'start'}-to-{date_to or 'today'}"
     response["Content-Disposition"] = (
-        f'attachment; filename="{safe_filename}.xls"'
+        f'attachment; filename="{safe_filename(label, "attendance")}-attendance.zip"'
     )
     return response
+
+
+def _job_payload(job):
+    payload = {
+        "success": True,
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "status_url": reverse("reportJobStatus", args=[job.id]),
+    }
+    if job.status == BackgroundJob.STATUS_DONE and job.result_file:
+        payload["download_url"] = reverse("downloadReportJob", args=[job.id])
+    return payload
+
+
+@login_required
+@require_POST
+def start_report_job(request):
+    """
+    Queue a background attendance report (own classes; department or campus for staff).
+    Returns immediately; the dashboard polls the status endpoint.
+    """
+    teacher = request.teacher
+    if not teacher:
+        return JsonResponse({"error": "Teacher profile not found."}, status=404)
+
+    scope = request.POST.get("scope") or "teacher"
+    if scope not in REPORT_SCOPES:
+        return JsonResponse({"error": "Unknown report scope."}, status=400)
+    # Wider scopes include other teachers' students and attendance.
+    if scope != REPORT_SCOPE_TEACHER and not request.user.is_staff:
+        return JsonResponse({"error": "Department and campus reports are limited to staff."}, status=403)
+
+    try:
+        date_from = _parse_date_param(request.POST.get("from"))
+        date_to = _parse_date_param(request.POST.get("to"))
+    except ValueError:
+        return JsonResponse({"error": "Dates must use YYYY-MM-DD format."}, status=400)
+    if date_from and date_to and date_from > date_to:
+        return JsonResponse({"error": "'from' date must not be after 'to' date."}, status=400)
+
+    job = enqueue_job(
+        BackgroundJob.KIND_ATTENDANCE_REPORT,
+        report_params(scope, teacher, date_from, date_to),
+        requested_by=request.user,
+    )
+    return JsonResponse(_job_payload(job), status=202)
+
+
+@login_required
+@require_GET
+def report_job_status(request, job_id):
+    """Poll progress of a job started by the current user."""
+    job = BackgroundJob.objects.filter(id=job_id, requested_by=request.user).first()
+    if not job:
+        return JsonResponse({"error": "Job not found."}, status=404)
+    payload = _job_payload(job)
+    if job.status == BackgroundJob.STATUS_FAILED:
+        payload["error"] = job.message or "Report generation failed."
+    return JsonResponse(payload)
+
+
+@login_required
+@require_GET
+def download_report_job(request, job_id):
+    """Download the result file of a finished job."""
+    job = BackgroundJob.objects.filter(id=job_id, requested_by=request.user).first()
+    if not job:
+        return JsonResponse({"error": "Job not found."}, status=404)
+    path = result_path(job)
+    if job.status != BackgroundJob.STATUS_DONE or path is None or not path.exists():
+        return JsonResponse({"error": "Report is not ready yet."}, status=400)
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=path.name)
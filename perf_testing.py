@@ -0,0 +1,210 @@
+"""
+Performance contract for the view test suites (test helper, not imported by the application)
+Every measured view has an exact query budget (fails on any change, e.g. an N+1 creeping in).
+Wall time is machine dependent, so it is only checked on request: with SAMS_PERF_TIMING=1 the
+median must stay within baseline * (1 + SAMS_PERF_TOLERANCE) + SAMS_PERF_SLACK_MS, the baseline
+coming from perf_baselines.json recorded on the same machine.
+
+Record the baselines on the machine that checks them (CI runner or your own; the file is not
+committed), then compare:
+    SAMS_PERF_RECORD=1 python manage.py test faculty_app student_app
+    SAMS_PERF_TIMING=1 python manage.py test faculty_app student_app
+"""
+import json
+import os
+import statistics
+import time
+from datetime import time as clock, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+BASELINES_PATH = Path(settings.BASE_DIR) / "perf_baselines.json"
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name) or default)
+
+
+def recording():
+    return os.environ.get("SAMS_PERF_RECORD") == "1"
+
+
+def timing_checked():
+    return os.environ.get("SAMS_PERF_TIMING") == "1" and not recording()
+
+
+def load_baselines():
+    if not BASELINES_PATH.exists():
+        return {}
+    return json.loads(BASELINES_PATH.read_text())
+
+
+def save_baselines(updates):
+    """Merge measured medians into the baseline file (stable key order for clean diffs)."""
+    baselines = load_baselines()
+    baselines.update(updates)
+    BASELINES_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+
+
+def clear_caches(keep=("sessions",)):
+    """Drop cached cards/profiles/rate-limit counters (cold path); logged-in sessions survive."""
+    for alias in settings.CACHES:
+        if alias not in keep:
+            caches[alias].clear()
+
+
+def seed_campus(sections=3, students_per_section=60, classes_per_section=2, past_sessions=20):
+    """
+    A teacher's realistic term: `sections` sections of students, `classes_per_section` classes each
+    for the main teacher (plus one class per section for a second teacher) and `past_sessions`
+    closed sessions per class with attendance for most students. Returns a dict of the main objects.
+    """
+    from faculty_app.models import Attendance, AttendanceSession, ClassRoom, Section, Teacher
+    from student_app.models import Student
+
+    password = make_password("pw")
+    teachers = []
+    for index in range(2):
+        user = User.objects.create(username=f"TCH{index + 1:04d}", password=password, is_staff=index == 0)
+        teachers.append(
+            Teacher.objects.create(
+                user=user, name=f"Teacher {index + 1}", enrollment_id=user.username, department="CSE",
+                designation="AP", is_registered=True, mail_verified=True,
+            )
+        )
+
+    section_objs = [
+        Section.objects.create(name=f"Section {index}", code=f"CSE-{index:02d}", expected_strength=students_per_section)
+        for index in range(sections)
+    ]
+    User.objects.bulk_create(
+        [User(username=str(2300000 + index), password=password) for index in range(sections * students_per_section)]
+    )
+    users = list(User.objects.filter(username__startswith="23").order_by("username"))
+    Student.objects.bulk_create(
+        [
+            Student(
+                user=user, name=f"Student {user.username}", roll=int(user.username),
+                section=section_objs[index // students_per_section], mail_verified=True,
+            )
+            for index, user in enumerate(users)
+        ]
+    )
+
+    classes = []
+    for section_index, section in enumerate(section_objs):
+        for class_index in range(classes_per_section + 1):
+            teacher = teachers[0] if class_index < classes_per_section else teachers[1]
+            classes.append(
+                ClassRoom.objects.create(
+                    subject_name=f"Subject {section_index}.{class_index}", section=section, teacher=teacher,
+                    start_time=clock(8 + class_index), end_time=clock(9 + class_index),
+                )
+            )
+
+    today = timezone.localdate()
+    now = timezone.now()
+    AttendanceSession.objects.bulk_create(
+        [
+            AttendanceSession(
+                classroom=classroom, teacher=classroom.teacher, is_live=False,
+                session_date=today - timedelta(days=day + 1), ended_at=now - timedelta(days=day + 1),
+            )
+            for classroom in classes
+            for day in range(past_sessions)
+        ]
+    )
+    rosters = {
+        section.id: list(section.students.values_list("id", flat=True)) for section in section_objs
+    }
+    attendance = []
+    for session in AttendanceSession.objects.select_related("classroom"):
+        roster = rosters[session.classroom.section_id]
+        # Roughly 90% present, a few failed face checks, the rest absent (no row).
+        for position, student_id in enumerate(roster):
+            if position % 10 == 9:
+                continue
+            status = Attendance.STATUS_FACE_FAILED if position % 10 == 8 else Attendance.STATUS_PRESENT
+            attendance.append(Attendance(session=session, student_id=student_id, status=status, marked_at=now))
+    Attendance.objects.bulk_create(attendance, batch_size=2000)
+
+    return {
+        "teacher": teachers[0],
+        "other_teacher": teachers[1],
+        "sections": section_objs,
+        "classes": [classroom for classroom in classes if classroom.teacher_id == teachers[0].id],
+        "student": Student.objects.select_related("user").get(roll=2300000),
+    }
+
+
+class PerformanceContractMixin:
+    """
+    TestCase mixin providing assertPerformance(). Baseline keys are `<perf_prefix>.<name>`.
+    Every test starts with empty caches; measurements are collected per class and written
+    out in record mode.
+    """
+
+    perf_prefix = ""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._baselines = load_baselines()
+        cls._measured = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if recording() and cls._measured:
+            save_baselines(cls._measured)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Budgets must not depend on what earlier tests left in the caches.
+        clear_caches()
+        super().setUp()
+
+    def assertPerformance(self, name, call, queries, setup=None, repeat=None):
+        """
+        Run `setup(); call()` `repeat` times: the first run must issue exactly `queries` queries;
+        with timing checks on, the median wall time must stay within the recorded baseline.
+        Returns the last response. Streaming bodies are consumed inside the measurement and
+        put back on the response as `consumed_content`.
+        """
+        key = f"{self.perf_prefix}.{name}"
+        measuring = recording() or timing_checked()
+        repeat = repeat or (int(_env_float("SAMS_PERF_REPEAT", 5)) if measuring else 1)
+        samples = []
+        response = None
+        for run in range(repeat):
+            if setup:
+                setup()
+            with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as context:
+                started = time.perf_counter()
+                response = call()
+                if getattr(response, "streaming", False):
+                    response.consumed_content = b"".join(response.streaming_content)
+                samples.append((time.perf_counter() - started) * 1000)
+            if run == 0 and len(context) != queries:
+                executed = "\n".join(
+                    f"{index}. {query['sql']}" for index, query in enumerate(context.captured_queries, start=1)
+                )
+                self.fail(f"{key}: {len(context)} queries executed, budget is {queries}:\n{executed}")
+
+        median = statistics.median(samples)
+        self._measured[key] = round(median, 3)
+        baseline = self._baselines.get(key)
+        if baseline is not None and timing_checked():
+            limit = baseline * (1 + _env_float("SAMS_PERF_TOLERANCE", 0.5)) + _env_float("SAMS_PERF_SLACK_MS", 5)
+            self.assertLessEqual(
+                median, limit,
+                f"{key}: median {median:.1f} ms exceeds baseline {baseline:.1f} ms (limit {limit:.1f} ms). "
+                "If intended, re-record with SAMS_PERF_RECORD=1.",
+            )
+        return response
@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Deployment profile (attendance scan/verify/QR endpoints are native async views):
+    uvicorn sams_main.asgi:application --workers 4
+    gunicorn sams_main.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+Run with SAMS_DB_CONN_MAX_AGE=0: each request's sync ORM work runs in its own thread,
+so persistent connections would not be reused (pool them with SAMS_DB_POOL/PgBouncer instead).
 """
 
 import os
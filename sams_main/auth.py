@@ -0,0 +1,124 @@
+"""
+Login pipeline
+Password hashing runs on a small bounded thread pool, hashes are upgraded to the configured
+hasher/cost on login, and the Teacher/Student profile is fetched in the same query as the user.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+
+UserModel = get_user_model()
+
+
+class HashingBusy(Exception):
+    """Too many logins are already waiting for the hashing pool."""
+
+
+def hashing_busy(request):
+    """True when authenticate() turned this request away because the hashing pool was saturated."""
+    return getattr(request, "auth_hashing_busy", False)
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from PASSWORD_HASH_ITERATIONS.
+    Same algorithm name as Django's hasher, so existing hashes keep verifying and are
+    re-encoded at the configured cost on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_HASH_ITERATIONS", None) or PBKDF2PasswordHasher.iterations
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = None
+
+
+def _hash_workers():
+    return getattr(settings, "PASSWORD_HASH_WORKERS", None) or os.cpu_count() or 1
+
+
+def _get_executor():
+    global _executor, _pending
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = _hash_workers()
+                _pending = threading.BoundedSemaphore(
+                    workers + getattr(settings, "PASSWORD_HASH_MAX_QUEUED", 32)
+                )
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sams-hash")
+    return _executor
+
+
+def run_hashing(func, *args):
+    """
+    Run a CPU-heavy hashing call on the shared pool and wait for the result.
+    At most PASSWORD_HASH_WORKERS hashes run at once, so request threads serving
+    dashboards and scans keep some CPU during a login storm.
+    Raises HashingBusy when the queue stays full for PASSWORD_HASH_QUEUE_TIMEOUT seconds.
+    """
+    executor = _get_executor()
+    if not _pending.acquire(timeout=getattr(settings, "PASSWORD_HASH_QUEUE_TIMEOUT", 5)):
+        raise HashingBusy()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        _pending.release()
+
+
+def _verify(password, encoded):
+    """(is_valid, needs_rehash) without touching the database (runs on the pool thread)."""
+    needs_rehash = []
+    valid = check_password(password, encoded, setter=lambda raw: needs_rehash.append(True))
+    return valid, bool(needs_rehash)
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user together with its teacher/student profile
+    (one query) and verifies the password on the hashing pool.
+    When the pool is saturated the login is rejected like bad credentials and the request
+    is flagged (see hashing_busy()), so every authenticate() caller, the admin included,
+    degrades to a failed login instead of an error.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        user = (
+            UserModel._default_manager.select_related("teacher", "student__section")
+            .filter(**{UserModel.USERNAME_FIELD: username})
+            .first()
+        )
+        try:
+            if user is None:
+                # Hash anyway so unknown usernames take as long as wrong passwords.
+                run_hashing(make_password, password)
+                return None
+            valid, needs_rehash = run_hashing(_verify, password, user.password)
+        except HashingBusy:
+            if request is not None:
+                request.auth_hashing_busy = True
+            return None
+
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if needs_rehash:
+            try:
+                user.password = run_hashing(make_password, password)
+            except HashingBusy:
+                # The password checked out; upgrade the hash on a quieter login.
+                return user
+            user.save(update_fields=["password"])
+        return user
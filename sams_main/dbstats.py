@@ -0,0 +1,119 @@
+"""
+Per-request SQL accounting
+One execute wrapper is installed on every database connection; it only counts while a
+`track_queries()` block is open in the current context (request), so it costs one ContextVar
+lookup otherwise. The context is inherited by sync_to_async threads, so async views are
+counted too.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_current = ContextVar("sams_query_stats", default=None)
+
+
+class QueryStats:
+    """Counters for one tracked block; statements are also counted in the enclosing block."""
+
+    __slots__ = ("queries", "writes", "duration", "parent")
+
+    def __init__(self, parent=None):
+        self.queries = 0
+        self.writes = 0
+        self.duration = 0.0
+        self.parent = parent
+
+    def record(self, sql, duration):
+        self.queries += 1
+        self.duration += duration
+        if sql.lstrip()[:7].upper().startswith(WRITE_VERBS):
+            self.writes += 1
+        if self.parent is not None:
+            self.parent.record(sql, duration)
+
+
+def _execute(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, time.perf_counter() - started)
+
+
+def install_wrapper(wrapper, dispatch_uid):
+    """Attach an execute wrapper to current and future connections (idempotent)."""
+
+    def attach(connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(attach, dispatch_uid=dispatch_uid, weak=False)
+    for connection in connections.all(initialized_only=True):
+        attach(connection)
+
+
+def install():
+    install_wrapper(_execute, "sams_dbstats")
+
+
+@contextmanager
+def track_queries():
+    """
+    Count the SQL run inside the block (this context and sync_to_async calls made from it).
+    Blocks nest: the metrics and debug-header middlewares can both be tracking one request.
+    """
+    install()
+    stats = QueryStats(_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryStatsMiddleware:
+    """
+    Adds X-SAMS-DB-Queries, X-SAMS-DB-Writes and X-SAMS-DB-Time-Ms to responses (DB_STATS_HEADERS).
+    Used by the load harness to attribute database writes to endpoints; removed from the
+    stack entirely when the setting is off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "DB_STATS_HEADERS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _headers(response, stats):
+        response["X-SAMS-DB-Queries"] = str(stats.queries)
+        response["X-SAMS-DB-Writes"] = str(stats.writes)
+        response["X-SAMS-DB-Time-Ms"] = f"{stats.duration * 1000:.2f}"
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with track_queries() as stats:
+            response = self.get_response(request)
+        return self._headers(response, stats)
+
+    async def __acall__(self, request):
+        with track_queries() as stats:
+            response = await self.get_response(request)
+        return self._headers(response, stats)
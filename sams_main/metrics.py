@@ -0,0 +1,209 @@
+"""
+In-process request metrics in Prometheus text format
+MetricsMiddleware records a METRICS_SAMPLE_RATE fraction of requests: latency per view, SQL
+statements and SQL time per request (sams_main.dbstats). face_stage() times the face pipeline
+(decode / detect / embed). Values are aggregated per worker process and served by the staff-only
+/metrics/ view. With the rate at 0 the middleware is removed and face_stage() does nothing.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .dbstats import track_queries
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 20, 50, 100)
+FACE_STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def sample_rate():
+    return float(getattr(settings, "METRICS_SAMPLE_RATE", 0) or 0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Counter):
+    """Fixed-bucket histogram per label combination (cumulative buckets on export)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # One slot per bucket plus +Inf, then sum.
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, list(series)) for labels, series in self._values.items())
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+REQUESTS = Counter(
+    "sams_http_requests_total", "Sampled requests by view, method and status.", ("view", "method", "status")
+)
+REQUEST_DURATION = Histogram(
+    "sams_http_request_duration_seconds", "Time until the response is returned (streamed bodies excluded).",
+    ("view", "method"), LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    "sams_http_request_db_queries", "SQL statements per sampled request.", ("view",), QUERY_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    "sams_http_request_db_duration_seconds", "SQL time per sampled request.", ("view",), LATENCY_BUCKETS
+)
+FACE_STAGE_DURATION = Histogram(
+    "sams_face_stage_duration_seconds", "Face pipeline stage time (decode, detect, embed).", ("stage",),
+    FACE_STAGE_BUCKETS,
+)
+REGISTRY = (REQUESTS, REQUEST_DURATION, REQUEST_DB_QUERIES, REQUEST_DB_DURATION, FACE_STAGE_DURATION)
+
+
+def render_metrics():
+    """All metrics of this process in Prometheus text exposition format."""
+    lines = [
+        "# HELP sams_metrics_sample_rate Fraction of requests recorded by MetricsMiddleware.",
+        "# TYPE sams_metrics_sample_rate gauge",
+        f"sams_metrics_sample_rate {_number(sample_rate())}",
+    ]
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+@contextmanager
+def face_stage(stage):
+    """Time one face pipeline stage (runs on the face executor, so it is not tied to request sampling)."""
+    if sample_rate() <= 0:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        FACE_STAGE_DURATION.observe(time.perf_counter() - started, stage)
+
+
+def view_label(request):
+    """URL name of the matched view; unmatched paths share one label to keep cardinality bounded."""
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Records sampled requests into the process metrics (METRICS_SAMPLE_RATE, 0 to 1).
+    Removed from the stack when the rate is 0; unsampled requests cost one random() call.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.rate = sample_rate()
+        if self.rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.rate >= 1 or random.random() < self.rate
+
+    @staticmethod
+    def _record(request, response, started, stats):
+        elapsed = time.perf_counter() - started
+        view = view_label(request)
+        REQUESTS.inc(view, request.method, str(response.status_code))
+        REQUEST_DURATION.observe(elapsed, view, request.method)
+        REQUEST_DB_QUERIES.observe(stats.queries, view)
+        REQUEST_DB_DURATION.observe(stats.duration, view)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = self.get_response(request)
+        self._record(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = await self.get_response(request)
+        self._record(request, response, started, stats)
+        return response
@@ -0,0 +1,51 @@
+"""
+Project-wide middleware for SAMS
+"""
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .profiles import ROLE_STUDENT, ROLE_TEACHER, aget_role_profile, get_role_profile
+
+
+async def aget_request_profile(request, role):
+    """Resolve the request's Teacher/Student profile from async code (at most once per request)."""
+    attr = f"_async_{role}_profile"
+    if not hasattr(request, attr):
+        setattr(request, attr, await aget_role_profile(role, await request.auser()))
+    return getattr(request, attr)
+
+
+class RoleProfileMiddleware:
+    """
+    Attach `request.teacher` and `request.student`.
+    Both resolve lazily on first access (at most once per request) through the profile cache,
+    and are falsy when the user has no profile of that role.
+    Async views use `await request.ateacher()` / `await request.astudent()` instead.
+    Must run after AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _attach(self, request):
+        request.teacher = SimpleLazyObject(lambda: get_role_profile(ROLE_TEACHER, request.user))
+        request.student = SimpleLazyObject(lambda: get_role_profile(ROLE_STUDENT, request.user))
+        request.ateacher = partial(aget_request_profile, request, ROLE_TEACHER)
+        request.astudent = partial(aget_request_profile, request, ROLE_STUDENT)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._attach(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self._attach(request)
+        return await self.get_response(request)
@@ -0,0 +1,86 @@
+"""
+Role profile lookup for authenticated users
+Resolves Teacher/Student profiles through a short-TTL cache keyed by user id.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+ROLE_TEACHER = "teacher"
+ROLE_STUDENT = "student"
+
+# Cached marker for "this user has no profile of this role" (cache.get returns None on miss).
+_NO_PROFILE = "__no_profile__"
+
+
+def profile_cache_key(role, user_id):
+    return f"sams:profile:{role}:{user_id}"
+
+
+def _query_profile(role, user_id):
+    if role == ROLE_TEACHER:
+        from faculty_app.models import Teacher
+
+        return Teacher.objects.filter(user_id=user_id).first()
+
+    from student_app.models import Student
+
+    # Scan and dashboard views read the section on every request.
+    return Student.objects.select_related("section").filter(user_id=user_id).first()
+
+
+def get_role_profile(role, user):
+    """Return the user's Teacher/Student profile (or None), served from cache when possible."""
+    if user is None or not user.is_authenticated:
+        return None
+
+    key = profile_cache_key(role, user.pk)
+    profile = cache.get(key)
+    if profile is None:
+        profile = _query_profile(role, user.pk)
+        ttl = getattr(settings, "ROLE_PROFILE_CACHE_TTL", 60)
+        cache.set(key, profile if profile is not None else _NO_PROFILE, ttl)
+    if profile is None or profile == _NO_PROFILE:
+        return None
+
+    # Reuse the already-loaded auth user instead of lazily fetching it again.
+    profile.user = user
+    return profile
+
+
+async def _aquery_profile(role, user_id):
+    if role == ROLE_TEACHER:
+        from faculty_app.models import Teacher
+
+        return await Teacher.objects.filter(user_id=user_id).afirst()
+
+    from student_app.models import Student
+
+    return await Student.objects.select_related("section").filter(user_id=user_id).afirst()
+
+
+async def aget_role_profile(role, user):
+    """Async variant of get_role_profile for async views (same cache entries)."""
+    if user is None or not user.is_authenticated:
+        return None
+
+    key = profile_cache_key(role, user.pk)
+    profile = await cache.aget(key)
+    if profile is None:
+        profile = await _aquery_profile(role, user.pk)
+        ttl = getattr(settings, "ROLE_PROFILE_CACHE_TTL", 60)
+        await cache.aset(key, profile if profile is not None else _NO_PROFILE, ttl)
+    if profile is None or profile == _NO_PROFILE:
+        return None
+
+    profile.user = user
+    return profile
+
+
+def invalidate_role_profile(role, user_id):
+    cache.delete(profile_cache_key(role, user_id))
+
+
+def invalidate_role_profiles(role, user_ids):
+    keys = [profile_cache_key(role, user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
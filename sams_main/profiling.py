@@ -0,0 +1,289 @@
+"""
+On-demand request profiling
+ProfilingMiddleware captures a cProfile call graph and a tracemalloc snapshot for a request when
+a staff user sends `X-SAMS-Profile: 1`, or for a PROFILING_SAMPLE_RATE fraction of requests to the
+views in PROFILING_VIEWS. Captures are written to PROFILING_ROOT (newest PROFILING_KEEP kept) and
+read with `python manage.py show_profiles`.
+
+One request is profiled at a time per process; others run normally meanwhile. cProfile follows the
+thread that runs the request and, under ASGI, the worker thread that runs a sync view; other work
+handed to threads is included when it runs inside profile_thread() (the face pipeline does).
+Streamed bodies (ZIP exports) are profiled as they are produced and the capture is written once
+the body is finished. tracemalloc sees allocations from every thread.
+"""
+import cProfile
+import json
+import pstats
+import random
+import secrets
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .streaming import with_context
+
+PROFILE_HEADER = "HTTP_X_SAMS_PROFILE"
+PROFILE_ID_HEADER = "X-SAMS-Profile-Id"
+
+_active = ContextVar("sams_profile_capture", default=None)
+# Profilers and tracemalloc are process-global: never run two captures at once.
+_capture_lock = threading.Lock()
+
+
+def profiles_root():
+    return Path(getattr(settings, "PROFILING_ROOT", settings.BASE_DIR / "profiles"))
+
+
+def _profiler_for_thread(capture):
+    """A running profiler for the current thread, or None when this thread is already profiled."""
+    ident = threading.get_ident()
+    with capture.lock:
+        if ident in capture.threads:
+            return None
+        capture.threads.add(ident)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool owns the interpreter hook.
+        return None
+    return profiler
+
+
+class Capture:
+    """Profiles and allocation snapshot of one request."""
+
+    def __init__(self, trigger):
+        # Sorts by time (rotation relies on it); the suffix keeps workers sharing the directory apart.
+        self.id = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{secrets.token_hex(2)}"
+        self.trigger = trigger
+        self.lock = threading.Lock()
+        self.threads = set()
+        self.profilers = []
+        self.body_profiler = None
+        self.tracing = False
+        self.started = 0.0
+
+    def add(self, profiler):
+        with self.lock:
+            self.profilers.append(profiler)
+
+    def follows(self, ident):
+        with self.lock:
+            return ident in self.threads
+
+    @contextmanager
+    def profiling_body(self):
+        """Profile one chunk of a streamed body (chunks may be produced on different threads)."""
+        if self.body_profiler is None:
+            self.body_profiler = cProfile.Profile()
+            self.add(self.body_profiler)
+        try:
+            self.body_profiler.enable()
+        except ValueError:
+            yield
+            return
+        try:
+            yield
+        finally:
+            self.body_profiler.disable()
+
+    def start(self):
+        if getattr(settings, "PROFILING_TRACEMALLOC", True) and not tracemalloc.is_tracing():
+            tracemalloc.start(getattr(settings, "PROFILING_TRACEMALLOC_FRAMES", 10))
+            self.tracing = True
+        self.started = time.perf_counter()
+
+    def finish(self, request, response):
+        """Write <id>.prof, <id>.tracemalloc and <id>.json; returns the capture id."""
+        duration = time.perf_counter() - self.started
+        snapshot = peak = None
+        if self.tracing:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.tracing = False
+
+        root = profiles_root()
+        root.mkdir(parents=True, exist_ok=True)
+        if self.profilers:
+            stats = pstats.Stats(self.profilers[0])
+            for profiler in self.profilers[1:]:
+                stats.add(profiler)
+            stats.dump_stats(root / f"{self.id}.prof")
+        if snapshot is not None:
+            snapshot.dump(str(root / f"{self.id}.tracemalloc"))
+        match = getattr(request, "resolver_match", None)
+        meta = {
+            "id": self.id,
+            "created": timezone.now().isoformat(),
+            "trigger": self.trigger,
+            "view": match.view_name if match is not None else None,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "threads": len(self.profilers),
+            "tracemalloc_peak_bytes": peak,
+        }
+        (root / f"{self.id}.json").write_text(json.dumps(meta, indent=2))
+        rotate(root, getattr(settings, "PROFILING_KEEP", 50))
+        return self.id
+
+    def close(self):
+        """Release the process-wide capture slot (also after errors)."""
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+        _capture_lock.release()
+
+
+def rotate(root, keep):
+    """Delete all but the newest `keep` captures (ids sort by time)."""
+    metas = sorted(root.glob("*.json"))
+    for meta in metas[: max(len(metas) - keep, 0)]:
+        for path in root.glob(f"{meta.stem}.*"):
+            path.unlink(missing_ok=True)
+
+
+def load_captures(root=None):
+    """Metadata of the stored captures, oldest first."""
+    root = root or profiles_root()
+    if not root.is_dir():
+        return []
+    return [json.loads(path.read_text()) for path in sorted(root.glob("*.json"))]
+
+
+def begin_capture(trigger):
+    """Start a capture, or return None when there is no trigger or another capture is running."""
+    if not trigger or not _capture_lock.acquire(blocking=False):
+        return None
+    capture = Capture(trigger)
+    capture.start()
+    return capture
+
+
+@contextmanager
+def capturing(capture):
+    """Run the block with `capture` active and the current thread profiled."""
+    token = _active.set(capture)
+    profiler = _profiler_for_thread(capture)
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            capture.add(profiler)
+        _active.reset(token)
+
+
+@contextmanager
+def profile_thread():
+    """
+    Profile this block into the active request capture (no-op otherwise).
+    Use around work run on other threads; executors need the request context,
+    e.g. run_in_executor(pool, contextvars.copy_context().run, func, arg).
+    """
+    capture = _active.get()
+    profiler = _profiler_for_thread(capture) if capture is not None else None
+    if profiler is None:
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        capture.add(profiler)
+
+
+class ProfilingMiddleware:
+    """
+    Decides per request whether to profile (staff header or sampling) and records the capture.
+    Must run after AuthenticationMiddleware and be the last middleware with a process_view()
+    (it calls sync views itself while profiling). Unprofiled requests cost a header lookup
+    (plus one random() call while sampling is on).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rate = float(getattr(settings, "PROFILING_SAMPLE_RATE", 0) or 0)
+        self.views = set(getattr(settings, "PROFILING_VIEWS", ()))
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self, request):
+        if self.rate <= 0 or random.random() >= self.rate:
+            return False
+        if not self.views:
+            return True
+        try:
+            return resolve(request.path_info).view_name in self.views
+        except Resolver404:
+            return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI a sync view runs on a worker thread the capture does not follow yet.
+        capture = _active.get()
+        if capture is None or iscoroutinefunction(view_func) or capture.follows(threading.get_ident()):
+            return None
+        with profile_thread():
+            return view_func(request, *view_args, **view_kwargs)
+
+    def _finish(self, capture, request, response):
+        """Write the capture now, or once a streamed body has been produced."""
+        response[PROFILE_ID_HEADER] = capture.id
+
+        def finish():
+            try:
+                capture.finish(request, response)
+            finally:
+                capture.close()
+
+        if not response.streaming:
+            finish()
+            return response
+        return with_context(response, {_active: capture}, on_close=finish, around=capture.profiling_body)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.META.get(PROFILE_HEADER) == "1" and request.user.is_staff:
+            capture = begin_capture("header")
+        else:
+            capture = begin_capture("sample" if self._sampled(request) else None)
+        if capture is None:
+            return self.get_response(request)
+        try:
+            with capturing(capture):
+                response = self.get_response(request)
+        except BaseException:
+            capture.close()
+            raise
+        return self._finish(capture, request, response)
+
+    async def __acall__(self, request):
+        if request.META.get(PROFILE_HEADER) == "1" and (await request.auser()).is_staff:
+            capture = begin_capture("header")
+        else:
+            capture = begin_capture("sample" if self._sampled(request) else None)
+        if capture is None:
+            return await self.get_response(request)
+        try:
+            # On the event loop thread the profile also includes other requests' coroutines.
+            with capturing(capture):
+                response = await self.get_response(request)
+        except BaseException:
+            capture.close()
+            raise
+        return self._finish(capture, request, response)
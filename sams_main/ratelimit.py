@@ -0,0 +1,211 @@
+"""
+Sliding-window rate limiting backed by the cache framework
+Counters are kept per scope (endpoint) and client key (user id or IP) in two fixed windows;
+the previous window is weighted by how much of it still overlaps the sliding window.
+"""
+import math
+import time
+from functools import lru_cache, wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.shortcuts import render
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/m' -> (10, 60); '5/15m' -> (5, 900)."""
+    count, _, period = rate.partition("/")
+    multiplier = int(period[:-1]) if len(period) > 1 else 1
+    return int(count), multiplier * _UNITS[period[-1]]
+
+
+def _cache():
+    return caches[getattr(settings, "RATELIMIT_CACHE_ALIAS", "default")]
+
+
+def client_ip(request):
+    return request.META.get(getattr(settings, "RATELIMIT_IP_META_KEY", "REMOTE_ADDR"), "") or "unknown"
+
+
+def client_key(request, key, user=None):
+    """
+    Identify the caller:
+    'ip', 'user_or_ip' (user id when logged in), 'session' (session key, e.g. OTP attempts),
+    'account' (posted enrollment_id/roll, so students behind one campus NAT don't share a bucket)
+    or 'account_ip' (posted account from this IP, so nobody elsewhere can exhaust a student's bucket).
+    Async callers pass the already resolved `user` (request.user would load it synchronously).
+    """
+    if key == "ip":
+        return f"ip:{client_ip(request)}"
+    if key == "session":
+        session_key = request.session.session_key
+        return f"s:{session_key}" if session_key else f"ip:{client_ip(request)}"
+    if key in ("account", "account_ip"):
+        account = request.POST.get("enrollment_id") or request.POST.get("roll")
+        if not account:
+            return f"ip:{client_ip(request)}"
+        account = f"a:{account.strip()[:64]}"
+        return f"{account}:ip:{client_ip(request)}" if key == "account_ip" else account
+    if user is None:
+        user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"u:{user.pk}"
+    return f"ip:{client_ip(request)}"
+
+
+def hit(scope, ident, rate, now=None, count_denied=True):
+    """
+    Count one request and return seconds to wait (0 when allowed).
+    Denied requests count too, so a client stuck in a retry loop stays throttled, unless
+    `count_denied` is False: then only allowed requests fill the bucket and it drains on schedule
+    however often a denied caller retries.
+    """
+    limit, window = parse_rate(rate)
+    now = time.time() if now is None else now
+    current_window = int(now // window)
+    elapsed = now - current_window * window
+    base = f"sams:rl:{scope}:{ident}:"
+    current_key = f"{base}{current_window}"
+    previous_key = f"{base}{current_window - 1}"
+
+    store = _cache()
+    counts = store.get_many((current_key, previous_key))
+    previous = counts.get(previous_key, 0)
+    if not count_denied:
+        current = counts.get(current_key, 0)
+        if previous * (1 - elapsed / window) + current + 1 > limit:
+            return _retry_after(limit, window, elapsed, previous, current)
+
+    if current_key in counts:
+        try:
+            current = store.incr(current_key)
+        except ValueError:
+            # Expired between get_many and incr.
+            store.set(current_key, 1, window * 2)
+            current = 1
+    else:
+        # Keep each window for two periods: it is still read as the "previous" window.
+        if store.add(current_key, 1, window * 2):
+            current = 1
+        else:
+            current = store.incr(current_key)
+
+    estimate = previous * (1 - elapsed / window) + current
+    if estimate <= limit:
+        return 0
+    return _retry_after(limit, window, elapsed, previous, current)
+
+
+def _retry_after(limit, window, elapsed, previous, current):
+    """Seconds until one more request would fit (`current` counts requests already in this window)."""
+    if current < limit and previous:
+        # Wait until enough of the previous window has slid out.
+        wait = window * (1 - (limit - current - 1) / previous) - elapsed
+    else:
+        # This window alone is over the limit: it has to become the (weighted) previous one.
+        wait = (window - elapsed) + window * max(0.0, 1 - (limit - 1) / current)
+    return max(1, math.ceil(wait))
+
+
+def wants_json(request):
+    return (
+        request.path.startswith("/attendance/")
+        or request.content_type == "application/json"
+        or "application/json" in request.headers.get("Accept", "")
+    )
+
+
+def too_many_requests(request, retry_after):
+    """429 with Retry-After: JSON for API calls, the error page otherwise."""
+    if wants_json(request):
+        response = JsonResponse(
+            {"error": "Too many requests. Please slow down.", "retry_after": retry_after},
+            status=429,
+        )
+    else:
+        response = render(request, "errors/429.html", {"retry_after": retry_after}, status=429)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def _enabled():
+    return getattr(settings, "RATELIMIT_ENABLE", True)
+
+
+def _check(request, scope, rate, key, methods, user=None, count_denied=True):
+    """429 response when the client is over the limit for this view, else None."""
+    if not _enabled() or request.method not in methods:
+        return None
+    scope_rate = getattr(settings, "RATELIMIT_RATES", {}).get(scope, rate)
+    retry_after = hit(scope, client_key(request, key, user), scope_rate, count_denied=count_denied)
+    if retry_after:
+        return too_many_requests(request, retry_after)
+    return None
+
+
+def ratelimit(scope, rate, key="user_or_ip", methods=("POST",), count_denied=True):
+    """
+    Limit a view per client and endpoint.
+    `rate` is the default ('10/m'); RATELIMIT_RATES[scope] overrides it from settings.
+    `count_denied=False` stops rejected attempts from refilling the bucket (see hit()).
+    Place below @login_required so the user id is known. Works on sync and async views.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                user = await request.auser() if key == "user_or_ip" and hasattr(request, "auser") else None
+                response = _check(request, scope, rate, key, methods, user, count_denied)
+                if response is not None:
+                    return response
+                return await view_func(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = _check(request, scope, rate, key, methods, count_denied=count_denied)
+            if response is not None:
+                return response
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class RateLimitMiddleware:
+    """
+    Global per-IP ceiling across all endpoints (RATELIMIT_GLOBAL_RATE).
+    Endpoint-specific limits are applied by the @ratelimit decorator.
+    Runs natively in both WSGI and ASGI mode; the counter update is a couple of short cache calls.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _limited(self, request):
+        rate = getattr(settings, "RATELIMIT_GLOBAL_RATE", None)
+        if rate and _enabled() and not request.path.startswith(getattr(settings, "RATELIMIT_EXEMPT_PATHS", ())):
+            retry_after = hit("global", f"ip:{client_ip(request)}", rate)
+            if retry_after:
+                return too_many_requests(request, retry_after)
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._limited(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self._limited(request) or await self.get_response(request)
@@ -0,0 +1,160 @@
+"""
+Read-replica routing
+Safe-method requests and report jobs read from the 'replica' alias; writes always go to the primary.
+After a write the rest of the request (and, through a short-lived cookie, the user's next requests)
+read from the primary again, so users always see their own changes.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .streaming import with_context
+
+PRIMARY_ALIAS = "default"
+REPLICA_ALIAS = "replica"
+PIN_COOKIE = "sams_db_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_routing = ContextVar("sams_db_routing", default=None)
+
+
+class RoutingState:
+    """Per-request (or per-job) routing flags shared by the router and the middleware."""
+
+    __slots__ = ("replica_ok", "pinned")
+
+    def __init__(self, replica_ok):
+        self.replica_ok = replica_ok
+        self.pinned = False
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _primary_only(model):
+    return model._meta.label_lower in getattr(settings, "DATABASE_REPLICA_EXCLUDED_MODELS", ())
+
+
+@contextmanager
+def use_replica():
+    """Route reads inside the block to the replica (background jobs, reports)."""
+    token = _routing.set(RoutingState(replica_ok=True))
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, whatever the surrounding routing says."""
+    token = _routing.set(RoutingState(replica_ok=False))
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+def primary_db(view_func):
+    """
+    Mark a view whose reads must never lag (e.g. the live QR/roster endpoints):
+    the request's routing context reads from the primary from here on.
+    """
+    def read_primary():
+        state = _routing.get()
+        if state is not None:
+            state.replica_ok = False
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            read_primary()
+            return await view_func(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        read_primary()
+        return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Reads go to the replica only inside a replica-enabled, not yet pinned context.
+    Writes always go to the primary and pin the context (excluded models excepted:
+    they never read from the replica, so writing them needs no pin).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.replica_ok or state.pinned or not replica_configured() or _primary_only(model):
+            return PRIMARY_ALIAS
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None and not _primary_only(model):
+            state.pinned = True
+        # Explicit alias: an instance read from the replica must still be saved on the primary.
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return obj1._state.db in (PRIMARY_ALIAS, REPLICA_ALIAS) and obj2._state.db in (PRIMARY_ALIAS, REPLICA_ALIAS)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Opens a routing context per request (sync or async).
+    GET/HEAD/OPTIONS may read from the replica unless the view is @primary_db or the client
+    carries the pin cookie; unsafe methods and requests that wrote set that cookie.
+    Streamed bodies (ZIP exports) are produced inside the same context.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _open(self, request):
+        state = RoutingState(replica_ok=request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES)
+        request.db_routing = state
+        return state, _routing.set(state)
+
+    def _pin(self, request, state, response):
+        if replica_configured() and (state.pinned or request.method not in SAFE_METHODS):
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 5),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self._open(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return with_context(self._pin(request, state, response), {_routing: state})
+
+    async def __acall__(self, request):
+        state, token = self._open(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return with_context(self._pin(request, state, response), {_routing: state})
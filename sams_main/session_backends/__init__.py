@@ -0,0 +1,68 @@
+"""
+Session engines that skip writes when the session data did not actually change.
+Select one with SAMS_SESSION_BACKEND (see settings.py): db, cached_db or cache.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+
+
+class ChangeTrackingMixin:
+    """
+    Remember a digest of the data as last loaded/persisted and turn save() into a no-op
+    when a request marked the session modified but left the data as it was
+    (e.g. re-assigning the same OTP flags on every step).
+    """
+
+    _persisted_digest = None
+
+    @staticmethod
+    def _digest(data):
+        payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+    def load(self):
+        data = super().load()
+        # load() clears the key when the stored session is missing/expired: nothing is persisted then.
+        self._persisted_digest = self._digest(data) if self.session_key else None
+        return data
+
+    def save(self, must_create=False):
+        if (
+            not must_create
+            and self.session_key is not None
+            and self._persisted_digest is not None
+            and getattr(settings, "SESSION_SKIP_UNCHANGED_WRITES", True)
+            and self._digest(self._get_session()) == self._persisted_digest
+        ):
+            return
+        super().save(must_create)
+        self._persisted_digest = self._digest(self._get_session(no_load=True))
+
+    async def aload(self):
+        data = await super().aload()
+        self._persisted_digest = self._digest(data) if self.session_key else None
+        return data
+
+    async def asave(self, must_create=False):
+        if (
+            not must_create
+            and self.session_key is not None
+            and self._persisted_digest is not None
+            and getattr(settings, "SESSION_SKIP_UNCHANGED_WRITES", True)
+            and self._digest(await self._aget_session()) == self._persisted_digest
+        ):
+            return
+        await super().asave(must_create)
+        self._persisted_digest = self._digest(await self._aget_session(no_load=True))
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None or session_key == self.session_key:
+            self._persisted_digest = None
+
+    async def adelete(self, session_key=None):
+        await super().adelete(session_key)
+        if session_key is None or session_key == self.session_key:
+            self._persisted_digest = None
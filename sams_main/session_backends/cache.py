@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.cache import SessionStore as BaseCacheStore
+
+from . import ChangeTrackingMixin
+
+
+class SessionStore(ChangeTrackingMixin, BaseCacheStore):
+    """Cache-only sessions: no django_session rows at all (sessions are lost if the cache is flushed)."""
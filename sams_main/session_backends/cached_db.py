@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.cached_db import SessionStore as BaseCachedDbStore
+
+from . import ChangeTrackingMixin
+
+
+class SessionStore(ChangeTrackingMixin, BaseCachedDbStore):
+    """Write-through cache in front of django_session; reads come from the cache, unchanged data is not re-written."""
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.db import SessionStore as BaseDbStore
+
+from . import ChangeTrackingMixin
+
+
+class SessionStore(ChangeTrackingMixin, BaseDbStore):
+    """Database sessions without redundant UPDATEs."""
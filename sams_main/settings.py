@@ -3,8 +3,11 @@
 Django settings for SAMS (Smart Attendance Management System)
 Development configuration - NOT suitable for production
 """
+import os
 from pathlib import Path
 
+from sams_main.database import database_config, parse_pool
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,10 +43,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'sams_main.slowlog.SlowLogMiddleware',
+    'sams_main.metrics.MetricsMiddleware',
+    'sams_main.dbstats.QueryStatsMiddleware',
+    'sams_main.ratelimit.RateLimitMiddleware',
+    'sams_main.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'sams_main.profiling.ProfilingMiddleware',
+    'sams_main.middleware.RoleProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,13 +81,208 @@ WSGI_APPLICATION = 'sams_main.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite concurrency profile, applied on every new connection (init_command):
+#   journal_mode=WAL   readers no longer block behind the writer
+#   synchronous=NORMAL fsync at checkpoints only (safe with WAL; a power loss may drop the last commits)
+#   cache_size         negative = KiB of page cache per connection
+#   mmap_size          bytes of the file read through memory mapping
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Seconds a writer waits for the lock (busy_timeout) before "database is locked".
+SQLITE_BUSY_TIMEOUT = 20
+# BEGIN IMMEDIATE for atomic blocks: take the write lock up front so a read-then-write
+# transaction (scan upserts) waits on busy_timeout instead of failing on lock upgrade.
+# None restores SQLite's DEFERRED default.
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE'
+
+SQLITE_OPTIONS = {
+    'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+    'timeout': SQLITE_BUSY_TIMEOUT,
+    'transaction_mode': SQLITE_TRANSACTION_MODE,
+}
+
+# Connection settings come from the environment (sams_main/database.py):
+#   DATABASE_URL          backend + credentials, e.g. postgres://sams:secret@db:5432/sams?sslmode=require;
+#                         unset = db.sqlite3 next to manage.py (development and tests)
+#   SAMS_DB_CONN_MAX_AGE  seconds a connection is reused across requests (0 = reconnect every request)
+#   SAMS_DB_POOL          PostgreSQL only: psycopg pool size as "min:max" (persistent connections are then off)
+#   SAMS_DB_PGBOUNCER=1   behind a transaction-pooling PgBouncer (disables server-side cursors)
+# Connections are health-checked before reuse, so a restarted database server is survived transparently.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(
+        os.environ.get('DATABASE_URL'),
+        default_sqlite_path=BASE_DIR / 'db.sqlite3',
+        sqlite_options=SQLITE_OPTIONS,
+        conn_max_age=int(os.environ.get('SAMS_DB_CONN_MAX_AGE', 60)),
+        pool=parse_pool(os.environ.get('SAMS_DB_POOL')),
+        pgbouncer=os.environ.get('SAMS_DB_PGBOUNCER') == '1',
+    )
+}
+
+# Read replica (sams_main/replicas.py): SAMS_DB_REPLICA_URL adds a 'replica' alias.
+# GET requests and report jobs read from it; writes, @primary_db views and clients that wrote in the
+# last DATABASE_REPLICA_PIN_SECONDS read from the primary. Locally two SQLite files stand in for the pair,
+# e.g. SAMS_DB_REPLICA_URL=sqlite:///replica.sqlite3 (tests mirror it onto the primary test database).
+if os.environ.get('SAMS_DB_REPLICA_URL'):
+    DATABASES['replica'] = database_config(
+        os.environ['SAMS_DB_REPLICA_URL'],
+        default_sqlite_path=None,
+        sqlite_options=SQLITE_OPTIONS,
+        conn_max_age=int(os.environ.get('SAMS_DB_CONN_MAX_AGE', 60)),
+        pool=parse_pool(os.environ.get('SAMS_DB_POOL')),
+        pgbouncer=os.environ.get('SAMS_DB_PGBOUNCER') == '1',
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['sams_main.replicas.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = 5
+# Always read from the primary: per-request session state and rows polled right after a worker writes them.
+DATABASE_REPLICA_EXCLUDED_MODELS = ('sessions.session', 'faculty_app.backgroundjob', 'faculty_app.outboundemail')
+
+# Cache
+# The default cache holds dashboard cards, the timetable/card version keys, role profiles and
+# rate-limit counters. Local memory is per process: with several workers set SAMS_CACHE_URL
+# (redis://...) so a timetable edit invalidates every worker. Without it the other workers only
+# catch up when their local copies expire (TIMETABLE_INDEX_TTL, DASHBOARD_CACHE_TTL).
+CACHE_SHARED = bool(os.environ.get('SAMS_CACHE_URL'))
+
+CACHES = {
+    'default': (
+        {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['SAMS_CACHE_URL'],
+        }
+        if CACHE_SHARED
+        else {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sams-default',
+        }
+    ),
+    # Session store for the cache/cached_db session engines.
+    # Local memory by default; set SAMS_SESSION_CACHE_URL (redis://...) to share it between workers.
+    'sessions': (
+        {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['SAMS_SESSION_CACHE_URL'],
+        }
+        if os.environ.get('SAMS_SESSION_CACHE_URL')
+        else {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sams-sessions',
+        }
+    ),
+}
+
+
+# Sessions
+# SAMS_SESSION_BACKEND selects the engine:
+#   cached_db - reads from the sessions cache, writes through to django_session
+#   cache     - sessions cache only, no database writes
+#   db        - django_session only
+# Both cache engines need a shared sessions cache with more than one worker (a logout or OTP write on
+# one worker would leave stale copies in the others' local memory), so the default is cached_db only
+# when SAMS_SESSION_CACHE_URL is set and db otherwise.
+# All three skip the write when a request re-assigns keys without changing the data.
+SESSION_BACKENDS = {
+    'db': 'sams_main.session_backends.db',
+    'cached_db': 'sams_main.session_backends.cached_db',
+    'cache': 'sams_main.session_backends.cache',
+}
+SESSION_ENGINE = SESSION_BACKENDS[
+    os.environ.get('SAMS_SESSION_BACKEND') or ('cached_db' if os.environ.get('SAMS_SESSION_CACHE_URL') else 'db')
+]
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_SKIP_UNCHANGED_WRITES = True
+
+# Face inference admission control (student_app/admission.py), per worker process.
+# At most MAX_CONCURRENCY inferences run at once and MAX_QUEUE requests wait for a slot;
+# beyond that, or when the expected wait exceeds MAX_WAIT_SECONDS, requests get a 503 + Retry-After.
+FACE_INFERENCE_MAX_CONCURRENCY = 2
+FACE_INFERENCE_MAX_QUEUE = 8
+FACE_INFERENCE_MAX_WAIT_SECONDS = 5.0
+# Load testing only: replace MTCNN/ResNet with stubs that take this many ms and always match
+# student_app.face_stub.STUB_EMBEDDING (e.g. SAMS_FACE_STUB_MS=150 for `load_class_storm`).
+FACE_INFERENCE_STUB_MS = float(os.environ['SAMS_FACE_STUB_MS']) if os.environ.get('SAMS_FACE_STUB_MS') else None
+
+# Debug/load-test headers: X-SAMS-DB-Queries, X-SAMS-DB-Writes and X-SAMS-DB-Time-Ms on every
+# response (sams_main.dbstats.QueryStatsMiddleware). Off in production.
+DB_STATS_HEADERS = os.environ.get('SAMS_DB_STATS_HEADERS') == '1'
+
+# Per-request metrics (sams_main/metrics.py): fraction of requests whose view latency, SQL count and
+# SQL time are recorded, plus face pipeline stage timers; scraped from /metrics/ (staff only), per worker.
+# 0 removes the middleware and the timers cost nothing.
+METRICS_SAMPLE_RATE = float(os.environ.get('SAMS_METRICS_SAMPLE_RATE', '0'))
+
+# On-demand profiling (sams_main/profiling.py): staff requests with `X-SAMS-Profile: 1`, plus a
+# PROFILING_SAMPLE_RATE fraction of requests to PROFILING_VIEWS (URL names; empty = all views), are
+# captured with cProfile + tracemalloc into PROFILING_ROOT, keeping the newest PROFILING_KEEP.
+# Inspect with `python manage.py show_profiles`. One capture at a time per process.
+PROFILING_SAMPLE_RATE = float(os.environ.get('SAMS_PROFILING_SAMPLE_RATE', '0'))
+PROFILING_VIEWS = tuple(filter(None, os.environ.get('SAMS_PROFILING_VIEWS', '').split(',')))
+PROFILING_ROOT = BASE_DIR / 'profiles'
+PROFILING_KEEP = 50
+PROFILING_TRACEMALLOC = True
+PROFILING_TRACEMALLOC_FRAMES = 10
+
+# Slow log (sams_main/slowlog.py): requests slower than SLOW_REQUEST_MS and SQL statements slower than
+# SLOW_QUERY_MS are written as JSON lines to SLOW_LOG_PATH (rotated at 50 MB, 5 backups) with query
+# fingerprints, call sites, row counts and the view. A negative threshold turns that half off.
+# Aggregate with `python manage.py slow_log_report`.
+SLOW_REQUEST_MS = float(os.environ.get('SAMS_SLOW_REQUEST_MS', '500'))
+SLOW_QUERY_MS = float(os.environ.get('SAMS_SLOW_QUERY_MS', '100'))
+SLOW_LOG_PATH = Path(os.environ.get('SAMS_SLOW_LOG_PATH', BASE_DIR / 'logs' / 'slow.jsonl'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'sams_main.slowlog.JsonFormatter'},
+    },
+    'handlers': {
+        'slow_log': {
+            'class': 'sams_main.slowlog.SlowLogHandler',
+            'filename': str(SLOW_LOG_PATH),
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'sams.slow': {'handlers': ['slow_log'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
+# Rate limiting (sams_main/ratelimit.py), counted in the default cache.
+# Use a shared cache backend when running several workers, otherwise limits are per process.
+RATELIMIT_ENABLE = True
+# Per-IP ceiling across every endpoint (None disables the middleware check).
+# Keep it generous: a whole campus may reach the server through a few NAT addresses.
+RATELIMIT_GLOBAL_RATE = '1200/m'
+RATELIMIT_EXEMPT_PATHS = ('/static/',)
+# Behind a reverse proxy set this to e.g. 'HTTP_X_REAL_IP'.
+RATELIMIT_IP_META_KEY = 'REMOTE_ADDR'
+# Per-endpoint overrides of the defaults given to @ratelimit ('count/period', period in s/m/h/d).
+RATELIMIT_RATES = {
+    'scan': '20/m',
+    'verify_face': '10/m',
+    'login': '10/m',
+    'otp': '10/5m',
+    'password_reset': '5/15m',
+}
+
+# Seconds a resolved Teacher/Student profile stays cached (invalidated on save/delete).
+ROLE_PROFILE_CACHE_TTL = 60
+
+# Seconds dashboard class-card data and fragments stay cached.
+# Timetable edits (ClassRoom/Section/Teacher save or delete) invalidate them immediately in every
+# worker sharing the default cache; with per-process caches the short TTL bounds staleness instead.
+DASHBOARD_CACHE_TTL = 3600 if CACHE_SHARED else 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -98,6 +303,28 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Authentication and password hashing
+# The backend loads the user with its teacher/student profile in one query and runs
+# password checks on a bounded thread pool (sams_main/auth.py).
+AUTHENTICATION_BACKENDS = ['sams_main.auth.ProfileModelBackend']
+
+# The first hasher encodes new passwords; existing hashes are upgraded on the next login.
+# Put e.g. ScryptPasswordHasher first to migrate every account to another algorithm.
+PASSWORD_HASHERS = [
+    'sams_main.auth.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# PBKDF2 cost (None = Django's default). Changing it re-encodes hashes as users log in.
+PASSWORD_HASH_ITERATIONS = int(os.environ['SAMS_PASSWORD_HASH_ITERATIONS']) if os.environ.get('SAMS_PASSWORD_HASH_ITERATIONS') else None
+# Concurrent hashes (None = CPU count) and logins allowed to wait for a hashing slot.
+PASSWORD_HASH_WORKERS = None
+PASSWORD_HASH_MAX_QUEUED = 32
+# Seconds a login waits for a slot before the login page answers 503.
+PASSWORD_HASH_QUEUE_TIMEOUT = 5
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
@@ -128,4 +355,49 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Note: EMAIL_HOST_USER is not set - code handles this gracefully with fallback
 
-
+# Email outbox: views only enqueue, delivery runs in
+#   python manage.py send_queued_emails
+# Messages are sent over one backend connection per batch and retried with exponential backoff.
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+# Deliver right after the request's transaction commits (local development without a worker).
+EMAIL_OUTBOX_EAGER = False
+
+
+# Background jobs
+# Report and bulk-admin jobs are queued in the database and executed by:
+#   python manage.py run_jobs
+# Result files (report archives) are written below this directory.
+JOB_RESULTS_ROOT = BASE_DIR / 'job_results'
+# A running job's lease, renewed by every progress update; when it runs out (the worker died)
+# another worker takes the job again, at most JOB_MAX_ATTEMPTS runs in total.
+JOB_LEASE_SECONDS = 600
+JOB_MAX_ATTEMPTS = 3
+
+# Cold storage (python manage.py archive_attendance [--before YYYY-MM-DD]): closed sessions of past
+# semesters are moved into one compressed columnar file per semester below this directory.
+# Range exports and report jobs read these files next to the live tables; keep them backed up.
+ATTENDANCE_ARCHIVE_ROOT = BASE_DIR / 'attendance_archive'
+
+
+# Bulk provisioning (admin actions): rows per INSERT batch, and the largest run done inside
+# the admin request; bigger runs are queued as background jobs.
+PROVISIONING_BATCH_SIZE = 500
+PROVISIONING_INLINE_LIMIT = 2000
+
+# Teacher/student deletion jobs: rows deleted per transaction, and the sleep between batches
+# that lets attendance writes take the database lock.
+DELETION_BATCH_SIZE = 1000
+DELETION_BATCH_PAUSE_SECONDS = 0.05
+
+
+# Timetable automation (python manage.py run_timetable_tick --loop 60)
+# Auto-start opens a live session when a timetable slot begins; auto-close ends live
+# sessions this many minutes after their slot is over.
+TIMETABLE_AUTO_START = False
+TIMETABLE_CLOSE_GRACE_MINUTES = 10
+# Seconds a worker reuses its weekday timetable index before rebuilding it even without a version
+# bump (bounds staleness when the default cache is not shared between workers).
+TIMETABLE_INDEX_TTL = 300 if CACHE_SHARED else 60
@@ -0,0 +1,206 @@
+"""
+Slow request / slow SQL log
+SlowLogMiddleware writes one JSON line to the `sams.slow` logger (settings.LOGGING, default
+logs/slow.jsonl) for every request slower than SLOW_REQUEST_MS and every SQL statement slower
+than SLOW_QUERY_MS. SQL entries carry a normalized fingerprint (literals and placeholders
+replaced, IN lists and VALUES rows collapsed), the project call site, the row count where the
+backend reports one (SQLite does not for SELECT) and the view. Statement parameters are never
+logged. Aggregate with `python manage.py slow_log_report`.
+"""
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import dbstats
+from .dbstats import install_wrapper, track_queries
+from .streaming import with_context
+
+logger = logging.getLogger("sams.slow")
+
+_request = ContextVar("sams_slow_request", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%s|\?|\$\d+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"\((?:\?|\.\.\.)(?:\s*,\s*(?:\?|\.\.\.))*\)(?:\s*,\s*\((?:\?|\.\.\.)(?:\s*,\s*(?:\?|\.\.\.))*\))+")
+_SPACE = re.compile(r"\s+")
+# Entry points and request plumbing are never the interesting caller (async ORM calls only show these).
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_INTERNAL_FILES = {
+    os.path.join(_PACKAGE_DIR, name)
+    for name in (
+        "slowlog.py", "dbstats.py", "metrics.py", "profiling.py", "middleware.py", "replicas.py", "ratelimit.py",
+        "streaming.py", "wsgi.py", "asgi.py",
+    )
+} | {os.path.join(os.path.dirname(_PACKAGE_DIR), "manage.py")}
+
+
+def fingerprint(sql):
+    """Normalize a statement so executions that differ only in values group together."""
+    text = _STRING.sub("?", sql)
+    text = _SAVEPOINT.sub('"s?"', text)
+    text = _NUMBER.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _LIST.sub("(...)", text)
+    text = _ROWS.sub("(...), ...", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def fingerprint_id(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def call_site():
+    """`path:line (function)` of the innermost project frame outside dependencies and middleware, or None."""
+    root = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(root)
+            and "site-packages" not in filename
+            and os.path.abspath(filename) not in _INTERNAL_FILES
+        ):
+            return f"{os.path.relpath(filename, root)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return None
+
+
+def _request_fields(request=None):
+    request = request or _request.get()
+    if request is None:
+        return {"view": None, "method": None, "path": None}
+    match = getattr(request, "resolver_match", None)
+    return {
+        "view": match.view_name if match is not None else None,
+        "method": request.method,
+        "path": request.path,
+    }
+
+
+def _execute(execute, sql, params, many, context):
+    threshold = getattr(settings, "SLOW_QUERY_MS", -1)
+    if threshold < 0:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed >= threshold:
+            rows = getattr(context.get("cursor"), "rowcount", -1)
+            text = fingerprint(sql)
+            logger.warning(
+                {
+                    "type": "sql",
+                    "duration_ms": round(elapsed, 3),
+                    "fingerprint": text[:4000],
+                    "fingerprint_id": fingerprint_id(text),
+                    "rows": rows if rows is not None and rows >= 0 else None,
+                    "many": many,
+                    "call_site": call_site(),
+                    "alias": context["connection"].alias,
+                    **_request_fields(),
+                }
+            )
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; dict messages are merged in, anything else goes under "message"."""
+
+    def format(self, record):
+        entry = {"ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds")}
+        if isinstance(record.msg, dict):
+            entry.update(record.msg)
+        else:
+            entry["message"] = record.getMessage()
+        return json.dumps(entry, default=str)
+
+
+class SlowLogHandler(logging.handlers.RotatingFileHandler):
+    """Rotating file handler that creates the log directory on first write."""
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+class SlowLogMiddleware:
+    """
+    Logs slow requests (with their SQL count and time) and sets the request context for slow SQL
+    entries. Streamed responses (ZIP exports) are logged when the body is finished, and their
+    SQL is counted and attributed to the request. Removed from the stack when both thresholds are negative.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.request_ms = getattr(settings, "SLOW_REQUEST_MS", -1)
+        if self.request_ms < 0 and getattr(settings, "SLOW_QUERY_MS", -1) < 0:
+            raise MiddlewareNotUsed
+        install_wrapper(_execute, "sams_slowlog")
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _log(self, request, response, started, stats):
+        elapsed = (time.perf_counter() - started) * 1000
+        if self.request_ms < 0 or elapsed < self.request_ms:
+            return
+        logger.warning(
+            {
+                "type": "request",
+                "duration_ms": round(elapsed, 3),
+                "status": response.status_code,
+                "queries": stats.queries,
+                "sql_ms": round(stats.duration * 1000, 3),
+                **_request_fields(request),
+            }
+        )
+
+    def _finish(self, request, response, started, stats):
+        if not response.streaming:
+            self._log(request, response, started, stats)
+            return response
+        return with_context(
+            response,
+            {_request: request, dbstats._current: stats},
+            on_close=lambda: self._log(request, response, started, stats),
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        started = time.perf_counter()
+        try:
+            with track_queries() as stats:
+                response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self._finish(request, response, started, stats)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        started = time.perf_counter()
+        try:
+            with track_queries() as stats:
+                response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self._finish(request, response, started, stats)
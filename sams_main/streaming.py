@@ -0,0 +1,73 @@
+"""
+Request context for streamed response bodies
+A middleware returns before the body of a StreamingHttpResponse is produced, so the ContextVars
+it set for the request (database routing, SQL tracking, the current request) are already reset
+when the body's generators run their queries. with_context() re-applies them around every chunk.
+"""
+from contextlib import contextmanager, nullcontext
+
+
+@contextmanager
+def _applied(values):
+    tokens = [(var, var.set(value)) for var, value in values.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class _ContextIterator:
+    """
+    Iterates `content` (sync or async) with `values` applied (and `around()` entered) around every step.
+    close() is registered by StreamingHttpResponse, so `on_close` also runs for bodies that were
+    never (or only partly) consumed.
+    """
+
+    def __init__(self, content, values, on_close, is_async, around):
+        self._iterator = aiter(content) if is_async else iter(content)
+        self._values = values
+        self._on_close = on_close
+        self._around = around or nullcontext
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with _applied(self._values), self._around():
+            try:
+                return next(self._iterator)
+            except StopIteration:
+                self.close()
+                raise
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        with _applied(self._values), self._around():
+            try:
+                return await anext(self._iterator)
+            except StopAsyncIteration:
+                self.close()
+                raise
+
+    def close(self):
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+
+def with_context(response, values, on_close=None, around=None):
+    """
+    Produce every chunk of a streamed `response` with the ContextVars in `values` ({var: value}) set
+    and inside the context manager returned by `around()`, if given.
+    `on_close()` runs once, when the body is exhausted or the response is closed. Other responses are
+    returned unchanged (and `on_close` is not called).
+    """
+    if not getattr(response, "streaming", False):
+        return response
+    response.streaming_content = _ContextIterator(
+        response.streaming_content, values, on_close, response.is_async, around
+    )
+    return response
@@ -0,0 +1,426 @@
+import io
+import os
+import pstats
+import shutil
+import tempfile
+import tracemalloc
+import zipfile
+from datetime import time, timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from faculty_app.models import Attendance, AttendanceSession, ClassRoom, RollingQRToken, Section, Teacher
+from student_app.models import Student
+
+from .auth import HashingBusy
+from .metrics import reset_metrics
+from .profiling import PROFILE_ID_HEADER, load_captures, profiles_root
+from .ratelimit import hit
+from .replicas import PIN_COOKIE, PRIMARY_ALIAS, REPLICA_ALIAS, ReplicaRouter, use_primary, use_replica
+from .slowlog import fingerprint
+
+
+@mock.patch("sams_main.replicas.replica_configured", return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_reads_use_primary_outside_a_routing_context(self, _configured):
+        self.assertEqual(self.router.db_for_read(Attendance), PRIMARY_ALIAS)
+
+    def test_replica_context_routes_reads_to_replica(self, _configured):
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Attendance), REPLICA_ALIAS)
+            # Excluded models never lag.
+            self.assertEqual(self.router.db_for_read(Session), PRIMARY_ALIAS)
+
+    def test_write_pins_the_rest_of_the_context_to_primary(self, _configured):
+        with use_replica():
+            self.assertEqual(self.router.db_for_write(Attendance), PRIMARY_ALIAS)
+            self.assertEqual(self.router.db_for_read(Attendance), PRIMARY_ALIAS)
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Attendance), REPLICA_ALIAS)
+
+    def test_excluded_model_write_does_not_pin(self, _configured):
+        with use_replica():
+            self.router.db_for_write(Session)
+            self.assertEqual(self.router.db_for_read(Attendance), REPLICA_ALIAS)
+
+    def test_use_primary_overrides_replica_context(self, _configured):
+        with use_replica():
+            with use_primary():
+                self.assertEqual(self.router.db_for_read(Attendance), PRIMARY_ALIAS)
+            self.assertEqual(self.router.db_for_read(Attendance), REPLICA_ALIAS)
+
+    def test_reads_use_primary_when_no_replica_is_configured(self, configured):
+        configured.return_value = False
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Attendance), PRIMARY_ALIAS)
+
+
+@mock.patch("sams_main.replicas.replica_configured", return_value=True)
+class StreamedExportRoutingTests(TestCase):
+    """
+    Streamed ZIP bodies are produced after the middleware returned; their reads must still use the
+    request's routing. The router's choices are recorded, then every query runs on the primary.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+        section = Section.objects.create(name="S1", code="CSE-01")
+        student_user = User.objects.create_user("2300001", "s@example.com", "pw")
+        student = Student.objects.create(user=student_user, name="S1", roll=2300001, section=section)
+        classroom = ClassRoom.objects.create(subject_name="Sub", section=section, teacher=cls.teacher)
+        session = AttendanceSession.objects.create(classroom=classroom, teacher=cls.teacher, is_live=False)
+        Attendance.objects.create(session=session, student=student, status=Attendance.STATUS_PRESENT)
+
+    def test_zip_body_reads_from_replica(self, _configured):
+        self.client.force_login(self.teacher.user)
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            routed.append((model._meta.label_lower, db_for_read(router, model, **hints)))
+            return PRIMARY_ALIAS
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", spy):
+            response = self.client.get(reverse("downloadAllAttendance"))
+            setup_reads = len(routed)
+            with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+                sheets = archive.namelist()
+
+        self.assertEqual(len(sheets), 1)
+        body_reads = routed[setup_reads:]
+        self.assertEqual(
+            {label for label, _alias in body_reads},
+            {"faculty_app.classroom", "student_app.student", "faculty_app.attendancesession", "faculty_app.attendance"},
+        )
+        self.assertEqual({alias for _label, alias in body_reads}, {REPLICA_ALIAS})
+
+
+@skipUnless(REPLICA_ALIAS in settings.DATABASES, "set SAMS_DB_REPLICA_URL to run the replica routing tests")
+class ReplicaRoutingRequestTests(TestCase):
+    """
+    End-to-end routing through the middleware (run with e.g. SAMS_DB_REPLICA_URL=sqlite:///replica.sqlite3).
+    The replica test database mirrors the primary; reads routed to it share the primary's test
+    transaction, and the router's decisions are recorded.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+        section = Section.objects.create(name="S1", code="CSE-01")
+        cls.classroom = ClassRoom.objects.create(
+            subject_name="Sub", section=section, teacher=cls.teacher, start_time=time(9), end_time=time(10)
+        )
+        cls.session = AttendanceSession.objects.create(classroom=cls.classroom, teacher=cls.teacher)
+        RollingQRToken.objects.create(session=cls.session, expires_at=timezone.now() + timedelta(minutes=5))
+
+    def setUp(self):
+        replica = connections[REPLICA_ALIAS]
+        connections[REPLICA_ALIAS] = connections[PRIMARY_ALIAS]
+        self.addCleanup(connections.__setitem__, REPLICA_ALIAS, replica)
+        self.client.force_login(self.teacher.user)
+
+    def replica_queries(self, method, url):
+        """Issue a request and return (response, number of reads routed to the replica)."""
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            routed.append(alias)
+            return alias
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", spy):
+            response = getattr(self.client, method)(url)
+        return response, routed.count(REPLICA_ALIAS)
+
+    def test_get_reads_from_replica(self):
+        response, replica_queries = self.replica_queries("get", reverse("fdashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(replica_queries, 0)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_primary_db_view_skips_replica(self):
+        response, replica_queries = self.replica_queries("get", reverse("currentQrToken", args=[self.session.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica_queries, 0)
+
+    def test_write_pins_client_to_primary(self):
+        response, _ = self.replica_queries("post", reverse("stopAttendanceSession", args=[self.session.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # The pin cookie keeps the next reads on the primary (read-your-writes).
+        response, replica_queries = self.replica_queries("get", reverse("fdashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica_queries, 0)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0)
+class MetricsEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+
+    def setUp(self):
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+        self.client.force_login(self.teacher.user)
+
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+    def test_sampled_requests_are_exported_per_view(self):
+        User.objects.filter(id=self.teacher.user_id).update(is_staff=True)
+        self.client.get(reverse("fdashboard"))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('sams_http_requests_total{view="fdashboard",method="GET",status="200"} 1', body)
+        self.assertIn('sams_http_request_duration_seconds_count{view="fdashboard",method="GET"} 1', body)
+        self.assertRegex(body, r'sams_http_request_db_queries_sum\{view="fdashboard"\} [1-9]')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        cls.teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(PROFILING_ROOT=Path(root), PROFILING_KEEP=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.teacher.user)
+
+    def test_header_is_ignored_for_non_staff(self):
+        response = self.client.get(reverse("fdashboard"), HTTP_X_SAMS_PROFILE="1")
+        self.assertNotIn(PROFILE_ID_HEADER, response)
+        self.assertEqual(load_captures(), [])
+
+    def test_staff_header_captures_and_rotates(self):
+        User.objects.filter(id=self.teacher.user_id).update(is_staff=True)
+        ids = [
+            self.client.get(reverse("fdashboard"), HTTP_X_SAMS_PROFILE="1")[PROFILE_ID_HEADER] for _ in range(3)
+        ]
+        captures = load_captures()
+        self.assertEqual([meta["id"] for meta in captures], ids[1:])
+        self.assertEqual(captures[-1]["view"], "fdashboard")
+        self.assertTrue((profiles_root() / f"{ids[-1]}.prof").exists())
+        self.assertTrue((profiles_root() / f"{ids[-1]}.tracemalloc").exists())
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def profiled_files(self, capture_id):
+        stats = pstats.Stats(str(profiles_root() / f"{capture_id}.prof")).stats
+        return {os.path.relpath(filename, settings.BASE_DIR) for filename, _line, _name in stats}
+
+    async def test_sync_view_is_profiled_under_asgi(self):
+        await User.objects.filter(id=self.teacher.user_id).aupdate(is_staff=True)
+        await self.async_client.aforce_login(self.teacher.user)
+        response = await self.async_client.get(reverse("fdashboard"), headers={"X-SAMS-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("faculty_app/views.py", self.profiled_files(response[PROFILE_ID_HEADER]))
+
+    def test_streamed_body_is_profiled_before_the_capture_is_written(self):
+        User.objects.filter(id=self.teacher.user_id).update(is_staff=True)
+        section = Section.objects.create(name="S1", code="CSE-01")
+        classroom = ClassRoom.objects.create(subject_name="Sub", section=section, teacher=self.teacher)
+        session = AttendanceSession.objects.create(classroom=classroom, teacher=self.teacher, is_live=False)
+        student = Student.objects.create(
+            user=User.objects.create_user("2300001", "s@example.com", "pw"), name="S1", roll=2300001, section=section
+        )
+        Attendance.objects.create(session=session, student=student, status=Attendance.STATUS_PRESENT)
+
+        response = self.client.get(reverse("downloadAllAttendance"), HTTP_X_SAMS_PROFILE="1")
+        capture_id = response[PROFILE_ID_HEADER]
+        self.assertEqual(load_captures(), [])
+        b"".join(response.streaming_content)
+        [meta] = load_captures()
+        self.assertEqual((meta["id"], meta["view"]), (capture_id, "downloadAllAttendance"))
+        self.assertIn("faculty_app/exports.py", self.profiled_files(capture_id))
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "rl-tests"}})
+class RateLimitTests(TestCase):
+    def test_denied_hits_do_not_refill_the_bucket_when_not_counted(self):
+        start = 6000.0
+        self.assertEqual([hit("t", "a", "2/m", now=start, count_denied=False) for _ in range(2)], [0, 0])
+        for second in range(1, 50):
+            self.assertGreater(hit("t", "a", "2/m", now=start + second, count_denied=False), 0)
+        # Only the two allowed hits weigh on the next window, so it opens once they slide out.
+        self.assertEqual(hit("t", "a", "2/m", now=start + 90, count_denied=False), 0)
+
+        for second in range(50):
+            hit("t", "b", "2/m", now=start + second)
+        self.assertGreater(hit("t", "b", "2/m", now=start + 90), 0)
+
+    def test_login_limit_is_per_account_and_ip(self):
+        url = reverse("login")
+        form = {"roles": "student", "roll": "2300001", "password": "wrong"}
+        with self.settings(RATELIMIT_RATES={"login": "2/m"}, RATELIMIT_GLOBAL_RATE=None):
+            statuses = [self.client.post(url, form, REMOTE_ADDR="10.0.0.9").status_code for _ in range(3)]
+            self.assertEqual(statuses[-1], 429)
+            self.assertNotEqual(self.client.post(url, form, REMOTE_ADDR="10.0.0.1").status_code, 429)
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+@mock.patch("sams_main.auth.run_hashing", side_effect=HashingBusy)
+class HashingBusyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_superuser("admin", "a@example.com", "pw")
+
+    def test_login_page_reports_busy(self, _run_hashing):
+        response = self.client.post(reverse("login"), {"roles": "student", "roll": "admin", "password": "pw"})
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.context["server_busy"])
+        self.assertFalse(response.context["credential_error"])
+
+    def test_admin_login_fails_instead_of_erroring(self, _run_hashing):
+        response = self.client.post(reverse("admin:login"), {"username": "admin", "password": "pw"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("_auth_user_id", self.client.session)
+
+
+class SlowLogTests(TestCase):
+    def test_fingerprint_groups_statements_that_differ_only_in_values(self):
+        self.assertEqual(
+            fingerprint('SELECT "a"."id" FROM "a" WHERE ("a"."id" IN (%s, %s, %s) AND "a"."name" = \'x\') LIMIT 21'),
+            'SELECT "a"."id" FROM "a" WHERE ("a"."id" IN (...) AND "a"."name" = ?) LIMIT ?',
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s)'), 'INSERT INTO "t" ("a", "b") VALUES (...), ...'
+        )
+        self.assertEqual(fingerprint('SAVEPOINT "s140103926385536_x9"'), 'SAVEPOINT "s?"')
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("TCH0001", "t@example.com", "pw")
+        teacher = Teacher.objects.create(
+            user=user, name="T1", enrollment_id="TCH0001", department="CSE", designation="AP", mail_verified=True
+        )
+        section = Section.objects.create(name="S1", code="CSE-01")
+        cls.classroom = ClassRoom.objects.create(subject_name="Sub", section=section, teacher=teacher)
+
+    def test_slow_requests_and_sql_are_logged_with_view_and_call_site(self):
+        self.client.force_login(self.classroom.teacher.user)
+        with self.settings(SLOW_REQUEST_MS=0, SLOW_QUERY_MS=0), self.assertLogs("sams.slow", "WARNING") as logs:
+            self.client.post(reverse("startAttendanceSession", args=[self.classroom.id]))
+        entries = [record.msg for record in logs.records]
+        request_entry = entries[-1]
+        self.assertEqual(request_entry["type"], "request")
+        self.assertEqual(request_entry["view"], "startAttendanceSession")
+        self.assertEqual(request_entry["queries"], len(entries) - 1)
+        insert = next(
+            entry for entry in entries
+            if entry.get("fingerprint", "").startswith('INSERT INTO "faculty_app_attendancesession"')
+        )
+        self.assertEqual(insert["view"], "startAttendanceSession")
+        self.assertTrue(insert["call_site"].startswith("faculty_app/views.py:"))
+
+    def test_streamed_export_is_logged_after_the_body(self):
+        session = AttendanceSession.objects.create(classroom=self.classroom, teacher=self.classroom.teacher, is_live=False)
+        student = Student.objects.create(
+            user=User.objects.create_user("2300001", "s@example.com", "pw"), name="S1", roll=2300001,
+            section=self.classroom.section,
+        )
+        Attendance.objects.create(session=session, student=student, status=Attendance.STATUS_PRESENT)
+        self.client.force_login(self.classroom.teacher.user)
+        with self.settings(SLOW_REQUEST_MS=0, SLOW_QUERY_MS=0), self.assertLogs("sams.slow", "WARNING") as logs:
+            response = self.client.get(reverse("downloadAllAttendance"))
+            self.assertFalse(any(record.msg["type"] == "request" for record in logs.records))
+            b"".join(response.streaming_content)
+        entries = [record.msg for record in logs.records]
+        request_entry = entries[-1]
+        self.assertEqual(request_entry["type"], "request")
+        self.assertEqual(request_entry["view"], "downloadAllAttendance")
+        self.assertEqual(request_entry["queries"], len(entries) - 1)
+        class_query = next(
+            entry for entry in entries if entry.get("fingerprint", "").startswith('SELECT "faculty_app_classroom"')
+        )
+        self.assertEqual(class_query["view"], "downloadAllAttendance")
+        self.assertTrue(class_query["call_site"].startswith("faculty_app/"))
+
+
+class SessionChangeTrackingTests(TestCase):
+    """ChangeTrackingMixin on every engine in SESSION_BACKENDS, through SessionMiddleware."""
+
+    OTP_STEP = {"otp": 123456, "email": "s@example.com", "faculty_register": False}
+
+    def run_request(self, session_key, values):
+        def view(request):
+            for key, value in values.items():
+                request.session[key] = value
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+        return SessionMiddleware(view)(request)
+
+    def create_session(self, engine):
+        """A stored session for `engine`; returns (SessionStore class, session key, Django base store)."""
+        store_class = import_string(f"{engine}.SessionStore")
+        store = store_class()
+        store.update(self.OTP_STEP)
+        store.create()
+        # The Django engine underneath the mixin does the actual write.
+        return store_class, store.session_key, store_class.__mro__[2]
+
+    def test_reassigning_identical_data_skips_the_write(self):
+        for name, engine in settings.SESSION_BACKENDS.items():
+            with self.subTest(engine=name), self.settings(SESSION_ENGINE=engine):
+                store_class, session_key, base = self.create_session(engine)
+                with mock.patch.object(base, "save", autospec=True) as save:
+                    self.run_request(session_key, self.OTP_STEP)
+                save.assert_not_called()
+
+    def test_changed_data_is_saved(self):
+        for name, engine in settings.SESSION_BACKENDS.items():
+            with self.subTest(engine=name), self.settings(SESSION_ENGINE=engine):
+                store_class, session_key, base = self.create_session(engine)
+                with mock.patch.object(base, "save", autospec=True, side_effect=base.save) as save:
+                    self.run_request(session_key, {**self.OTP_STEP, "otp": 654321})
+                save.assert_called_once()
+                self.assertEqual(store_class(session_key).load()["otp"], 654321)
+
+    def test_async_save_skips_unchanged_data(self):
+        for name, engine in settings.SESSION_BACKENDS.items():
+            with self.subTest(engine=name), self.settings(SESSION_ENGINE=engine):
+                store_class, session_key, base = self.create_session(engine)
+                store = store_class(session_key)
+                async_to_sync(store.aload)()
+                store.update(self.OTP_STEP)
+                with mock.patch.object(base, "asave", autospec=True) as asave:
+                    async_to_sync(store.asave)()
+                    asave.assert_not_called()
+                    store["otp"] = 1
+                    async_to_sync(store.asave)()
+                asave.assert_called_once()
@@ -46,10 +46,20 @@ urlpatterns = [
     path('attendance/teacher/qr/<int:session_id>/', facultyViews.current_qr_token, name='currentQrToken'),
     path('attendance/teacher/stop/<int:session_id>/', facultyViews.stop_attendance_session, name='stopAttendanceSession'),
     path('attendance/teacher/download/<int:classroom_id>/', facultyViews.download_attendance_csv, name='downloadAttendanceCsv'),
+    path('attendance/teacher/download-all/', facultyViews.download_all_attendance_zip, name='downloadAllAttendance'),
+
+    # Background report jobs
+    path('attendance/teacher/reports/', facultyViews.start_report_job, name='startReportJob'),
+    path('attendance/teacher/reports/<int:job_id>/', facultyViews.report_job_status, name='reportJobStatus'),
+    path('attendance/teacher/reports/<int:job_id>/download/', facultyViews.download_report_job, name='downloadReportJob'),
 
     # Student attendance APIs
     path('attendance/student/scan/', studentViews.scan_attendance_qr, name='scanAttendanceQr'),
     path('attendance/student/verify-face/', studentViews.verify_attendance_face, name='verifyAttendanceFace'),
+    path('attendance/student/face-admission/', studentViews.face_admission_status, name='faceAdmissionStatus'),
+
+    # Operations (staff only)
+    path('metrics/', views.metrics, name='metrics'),
 ]
 
 # Global HTML error handlers (API endpoints still return JSON in app views).
@@ -6,12 +6,17 @@ from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password
 from datetime import datetime
 from django.shortcuts import render, redirect
+from faculty_app.mail import enqueue_email
 from faculty_app.models import Teacher, MasterFaculty
 from student_app.models import Student
 from django.contrib.auth import authenticate, login as auth_login , logout
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from .auth import hashing_busy
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+from .ratelimit import ratelimit
 import secrets  # Changed from random to secrets for secure OTP generation
-from django.core.mail import send_mail
-from django.conf import settings
 from django.contrib import messages
 
 # Constants
@@ -51,12 +56,15 @@ def role(request):
     return render(request,'common/roles.html')
 
 
+@ratelimit("login", "10/m", key="account_ip", count_denied=False)
 def loginView(request):
     """
     Handle user login for both students and faculty
     Validates credentials and checks if user is registered and email verified
+    The auth backend loads the teacher/student profile together with the user.
     """
     credential_error = False
+    server_busy = False
 
     if request.method == "POST":
         role = request.POST.get("roles")
@@ -66,7 +74,7 @@ def loginView(request):
             enrollment_id = request.POST.get("enrollment_id")
             password = request.POST.get("password")
 
-            # Authenticate user with Django's built-in authentication
+            # Authenticate user (ProfileModelBackend also fetches the teacher profile)
             user = authenticate(
                 request,
                 username=enrollment_id,
@@ -77,7 +85,7 @@ def loginView(request):
                 credential_error = True
             else:
                 try:
-                    teacher = Teacher.objects.get(user=user)
+                    teacher = user.teacher
                     # Check if teacher is registered and email is verified
                     if teacher.is_registered and teacher.mail_verified:
                         auth_login(request, user)
@@ -87,20 +95,20 @@ def loginView(request):
 
                 except Teacher.DoesNotExist:
                     credential_error = True
-        
+
         # ================= STUDENT LOGIN =================
         else:
             roll = request.POST.get("roll")
             password = request.POST.get("password")
-            
-            # Authenticate user with Django's built-in authentication
+
+            # Authenticate user (ProfileModelBackend also fetches the student profile)
             user = authenticate(request, username=roll, password=password)
 
             if user is None:
                 credential_error = True
             else:
                 try:
-                    student = Student.objects.get(user=user)
+                    student = user.student
                     # Check if student email is verified
                     if student.mail_verified:
                         auth_login(request, user)
@@ -111,11 +119,18 @@ def loginView(request):
                 except Student.DoesNotExist:
                     credential_error = True
 
+        if hashing_busy(request):
+            # Hashing pool saturated (login storm): ask the user to retry instead of piling up.
+            credential_error = False
+            server_busy = True
+
     return render(request, "common/login.html", {
-        "credential_error": credential_error
-    })
+        "credential_error": credential_error,
+        "server_busy": server_busy,
+    }, status=503 if server_busy else 200)
 
 
+@ratelimit("otp", "10/5m", key="session")
 def otpVerification(request):
     """
     Verify OTP for registration or password reset
@@ -274,18 +289,15 @@ def _generate_otp():
 
 def _send_otp_email(email, otp, purpose='password reset'):
     """
-    Helper function to send OTP email
+    Helper function to queue an OTP email
+    Delivery happens in the outbox worker (send_queued_emails); only the INSERT runs here.
     """
     try:
-        # Use a default from_email if EMAIL_HOST_USER is not set
-        from_email = getattr(settings, 'EMAIL_HOST_USER', 'noreply@sams.local')
-        
-        send_mail(
+        enqueue_email(
             subject=f'OTP for {purpose} for SAMS',
-            message=f'Your OTP is {otp}. Valid for 5 minutes.',
-            from_email=from_email,
-            recipient_list=[email],
-            fail_silently=False,
+            body=f'Your OTP is {otp}. Valid for 5 minutes.',
+            to_email=email,
+            expires_in=OTP_EXPIRY_SECONDS,
         )
         return True
     except Exception as e:
@@ -293,6 +305,7 @@ def _send_otp_email(email, otp, purpose='password reset'):
         return False
 
 
+@ratelimit("password_reset", "5/15m", key="account_ip", count_denied=False)
 def passwordReset(request):
     """
     Handle password reset request
@@ -385,3 +398,12 @@ def logoutView(request):
     logout(request)
 
     return redirect('login')
+
+
+@login_required
+@require_GET
+def metrics(request):
+    """Staff-only Prometheus scrape endpoint for this worker's in-process metrics."""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff access required."}, status=403)
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
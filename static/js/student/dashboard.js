@@ -197,6 +197,15 @@
             }, 25000);
         }
 
+        function retryLaterMessage(response) {
+            // 429 (rate limited) or 503 (face service busy): tell the user how long to wait instead of retrying.
+            const seconds = parseInt(response.headers.get('Retry-After') || '0', 10) || 1;
+            if (response.status === 503) {
+                return `Face verification is busy. Please try again in ${seconds}s.`;
+            }
+            return `Too many attempts. Please wait ${seconds}s and try again.`;
+        }
+
         async function submitScannedToken(tokenText) {
             const token = (tokenText || '').trim();
             if (!token) {
@@ -217,6 +226,10 @@
                         classroom_id: selectedClassroomId,
                     }),
                 });
+                if (response.status === 429) {
+                    scanStatus.innerHTML = `<span class="text-warning">${retryLaterMessage(response)}</span>`;
+                    return;
+                }
                 const data = await response.json();
                 if (!response.ok || !data.success) {
                     if (data.error === "You don't belong to this class.") {
@@ -396,6 +409,9 @@
                     },
                     body: JSON.stringify(payload),
                 });
+                if (response.status === 429 || response.status === 503) {
+                    throw new Error(retryLaterMessage(response));
+                }
                 const data = await response.json();
                 if (!response.ok || (!data.success && data.match !== false)) {
                     throw new Error(data.error || 'Request failed');
@@ -57,6 +57,8 @@
         const qrTemplate = config.dataset.qrTemplate;
         const stopTemplate = config.dataset.stopTemplate;
         const downloadTemplate = config.dataset.downloadTemplate;
+        const downloadAllUrl = config.dataset.downloadAllUrl;
+        const reportUrl = config.dataset.reportUrl;
 
         const qrModalEl = document.getElementById('qrModal');
         const qrCanvas = document.getElementById('qrCanvas');
@@ -272,15 +274,7 @@
                         return;
                     }
 
-                    const blob = await response.blob();
-                    const fileUrl = window.URL.createObjectURL(blob);
-                    const link = document.createElement('a');
-                    link.href = fileUrl;
-                    link.download = `${downloadName}.xls`;
-                    document.body.appendChild(link);
-                    link.click();
-                    link.remove();
-                    window.URL.revokeObjectURL(fileUrl);
+                    await saveDownload(response, `${downloadName}.xls`);
                 } catch (err) {
                     alert('Network error while downloading attendance.');
                 } finally {
@@ -289,6 +283,133 @@
             });
         });
 
+        async function saveDownload(response, filename) {
+            const blob = await response.blob();
+            const fileUrl = window.URL.createObjectURL(blob);
+            const link = document.createElement('a');
+            link.href = fileUrl;
+            link.download = filename;
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+            window.URL.revokeObjectURL(fileUrl);
+        }
+
+        const downloadAllBtn = document.getElementById('downloadAllBtn');
+        if (downloadAllBtn && downloadAllUrl) {
+            downloadAllBtn.addEventListener('click', async function () {
+                const params = new URLSearchParams();
+                const fromValue = (document.getElementById('exportFromDate') || {}).value;
+                const toValue = (document.getElementById('exportToDate') || {}).value;
+                if (fromValue) {
+                    params.set('from', fromValue);
+                }
+                if (toValue) {
+                    params.set('to', toValue);
+                }
+                const query = params.toString();
+                downloadAllBtn.disabled = true;
+                try {
+                    const response = await fetch(query ? `${downloadAllUrl}?${query}` : downloadAllUrl);
+                    const contentType = response.headers.get('content-type') || '';
+
+                    if (!response.ok || contentType.includes('application/json')) {
+                        const data = await response.json().catch(function () {
+                            return {};
+                        });
+                        alert(data.error || 'Unable to download attendance right now.');
+                        return;
+                    }
+
+                    await saveDownload(response, 'attendance.zip');
+                } catch (err) {
+                    alert('Network error while downloading attendance.');
+                } finally {
+                    downloadAllBtn.disabled = false;
+                }
+            });
+        }
+
+        const startReportBtn = document.getElementById('startReportBtn');
+        const reportStatus = document.getElementById('reportStatus');
+        let reportTimer = null;
+
+        function setReportStatus(msg, isError) {
+            if (reportStatus) {
+                reportStatus.innerHTML = `<span class="${isError ? 'text-danger' : 'text-muted'}">${msg}</span>`;
+            }
+        }
+
+        function stopReportPolling() {
+            clearInterval(reportTimer);
+            reportTimer = null;
+            if (startReportBtn) {
+                startReportBtn.disabled = false;
+            }
+        }
+
+        async function pollReport(statusUrl) {
+            try {
+                const response = await fetch(statusUrl);
+                const data = await response.json();
+                if (!response.ok || data.status === 'failed') {
+                    setReportStatus(data.error || 'Report generation failed.', true);
+                    stopReportPolling();
+                    return;
+                }
+                if (data.status === 'done') {
+                    setReportStatus('Report ready.', false);
+                    stopReportPolling();
+                    if (data.download_url) {
+                        window.location.href = data.download_url;
+                    }
+                    return;
+                }
+                const label = data.status === 'queued' ? 'Queued' : `Generating ${data.progress}%`;
+                setReportStatus(label, false);
+            } catch (err) {
+                setReportStatus('Network error while checking report.', true);
+                stopReportPolling();
+            }
+        }
+
+        if (startReportBtn && reportUrl) {
+            startReportBtn.addEventListener('click', async function () {
+                const body = new FormData();
+                body.append('scope', (document.getElementById('reportScope') || {}).value || 'teacher');
+                const fromValue = (document.getElementById('exportFromDate') || {}).value;
+                const toValue = (document.getElementById('exportToDate') || {}).value;
+                if (fromValue) {
+                    body.append('from', fromValue);
+                }
+                if (toValue) {
+                    body.append('to', toValue);
+                }
+                startReportBtn.disabled = true;
+                try {
+                    const response = await fetch(reportUrl, {
+                        method: 'POST',
+                        headers: { 'X-CSRFToken': getCookie('csrftoken') },
+                        body: body,
+                    });
+                    const data = await response.json();
+                    if (!response.ok || !data.success) {
+                        setReportStatus(data.error || 'Could not start report.', true);
+                        startReportBtn.disabled = false;
+                        return;
+                    }
+                    setReportStatus('Queued', false);
+                    clearInterval(reportTimer);
+                    reportTimer = setInterval(function () {
+                        pollReport(data.status_url);
+                    }, 2000);
+                } catch (err) {
+                    setReportStatus('Network error while starting report.', true);
+                    startReportBtn.disabled = false;
+                }
+            });
+        }
+
         async function stopCurrentSession() {
             if (!sessionId) {
                 return true;
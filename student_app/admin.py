@@ -1,5 +1,8 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.models import User
+from faculty_app.deletion import deactivate_users
+from faculty_app.jobs import enqueue_job
+from faculty_app.models import BackgroundJob
 from .models import Student
 
 
@@ -33,9 +36,18 @@ class StudentAdmin(admin.ModelAdmin):
     @admin.action(description="Delete selected students and linked user accounts")
     def delete_students_with_user_accounts(self, request, queryset):
         ids = list(queryset.values_list("id", flat=True))
+        # Attendance history is removed in short batches by the job worker.
         user_ids = list(queryset.values_list("user_id", flat=True))
-        Student.objects.filter(id__in=ids).delete()
-        User.objects.filter(id__in=user_ids).delete()
+        deactivate_users(user_ids)
+        job = enqueue_job(
+            BackgroundJob.KIND_DELETE_STUDENTS, {"student_ids": ids, "user_ids": user_ids}, requested_by=request.user
+        )
+        self.message_user(
+            request,
+            f"Accounts of {len(ids)} students disabled; background job #{job.id} deletes them "
+            f"with their attendance (see Background jobs for progress).",
+            level=messages.SUCCESS,
+        )
 
     def delete_model(self, request, obj):
         user_id = obj.user_id
@@ -0,0 +1,153 @@
+"""
+Admission control for face inference
+Bounds concurrent MTCNN/ResNet runs per process and sheds load early (503 + retry hint)
+instead of letting requests queue on web workers until they time out.
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import JsonResponse
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted; carries the suggested retry delay in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Semaphore with a bounded wait queue.
+    Expected wait is estimated from an EWMA of service time; a request is shed up front when
+    the queue is full or its expected wait exceeds max_wait, and while waiting once max_wait passes.
+    """
+
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, max_concurrency, max_queue, max_wait, initial_service_time=1.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.service_time = initial_service_time
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.peak_waiting = 0
+
+    def expected_wait(self):
+        """Seconds a request arriving now would wait for a slot (caller holds the lock)."""
+        if self.active < self.max_concurrency:
+            return 0.0
+        return (self.waiting + 1) * self.service_time / self.max_concurrency
+
+    def _retry_after(self, wait):
+        return max(1, math.ceil(wait))
+
+    @contextmanager
+    def admit(self):
+        with self._cond:
+            if self.active >= self.max_concurrency or self.waiting:
+                wait = self.expected_wait()
+                if self.waiting >= self.max_queue or wait > self.max_wait:
+                    self.shed += 1
+                    raise Overloaded(self._retry_after(wait))
+
+                self.waiting += 1
+                self.peak_waiting = max(self.peak_waiting, self.waiting)
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while self.active >= self.max_concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timed_out += 1
+                            raise Overloaded(self._retry_after(self.expected_wait()))
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self.active -= 1
+                self.service_time += self.EWMA_ALPHA * (elapsed - self.service_time)
+                self._cond.notify()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "peak_queue_depth": self.peak_waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "service_time_ewma_s": round(self.service_time, 4),
+                "expected_wait_s": round(self.expected_wait(), 4),
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "timed_out": self.timed_out,
+            }
+
+
+_face_admission = None
+_face_admission_lock = threading.Lock()
+
+
+def face_admission():
+    """Process-wide controller for face inference, sized from settings on first use."""
+    global _face_admission
+    if _face_admission is None:
+        with _face_admission_lock:
+            if _face_admission is None:
+                _face_admission = AdmissionController(
+                    max_concurrency=getattr(settings, "FACE_INFERENCE_MAX_CONCURRENCY", 2),
+                    max_queue=getattr(settings, "FACE_INFERENCE_MAX_QUEUE", 8),
+                    max_wait=getattr(settings, "FACE_INFERENCE_MAX_WAIT_SECONDS", 5.0),
+                )
+    return _face_admission
+
+
+_face_executor = None
+
+
+def face_executor():
+    """
+    Threads that run face inference for async views, off the event loop.
+    Sized to admit max_concurrency running plus max_queue waiting requests; the controller
+    still decides who runs and who is shed.
+    """
+    global _face_executor
+    if _face_executor is None:
+        with _face_admission_lock:
+            if _face_executor is None:
+                workers = getattr(settings, "FACE_INFERENCE_MAX_CONCURRENCY", 2) + getattr(
+                    settings, "FACE_INFERENCE_MAX_QUEUE", 8
+                )
+                _face_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="face")
+    return _face_executor
+
+
+def overloaded_response(exc):
+    """Fast 503 with a retry hint for the student UI."""
+    response = JsonResponse(
+        {
+            "error": f"Face verification is busy. Please try again in {exc.retry_after} s.",
+            "retry_after": exc.retry_after,
+        },
+        status=503,
+    )
+    response["Retry-After"] = str(exc.retry_after)
+    return response
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class StudentConfig(AppConfig):
     name = 'student_app'
+
+    def ready(self):
+        # Register signal receivers (cache invalidation).
+        from . import signals  # noqa: F401
@@ -0,0 +1,51 @@
+"""
+Stand-in face models for load tests and benchmarks
+Same call shape as MTCNN/InceptionResnetV1 as used in views.py: detect(image) -> face,
+embed(face.unsqueeze(0)).detach().cpu().numpy() -> embedding. Enabled on a server with
+FACE_INFERENCE_STUB_MS (env SAMS_FACE_STUB_MS); never use it in production.
+"""
+import base64
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+# Every stubbed capture yields this embedding; seed students with it to get a match.
+STUB_EMBEDDING = [1.0, 0.0, 0.0, 0.0, 0.5, 0.5, 0.0, 0.0]
+
+
+class _StubFace:
+    def unsqueeze(self, _dim):
+        return self
+
+
+class _StubEmbedding:
+    def detach(self):
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.array(STUB_EMBEDDING, dtype=np.float32)
+
+
+def stub_face_models(inference_ms):
+    """(detect, embed) pair; embed blocks the calling thread for inference_ms like a real forward pass."""
+
+    def detect(_image):
+        return _StubFace()
+
+    def embed(_face):
+        time.sleep(inference_ms / 1000)
+        return _StubEmbedding()
+
+    return detect, embed
+
+
+def stub_capture_b64():
+    """A tiny valid PNG data URL, standing in for the webcam capture a student posts."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "white").save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
@@ -0,0 +1,16 @@
+"""
+Signal receivers for student_app
+Keep cached data in sync with model changes.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from sams_main.profiles import ROLE_STUDENT, invalidate_role_profile
+
+from .models import Student
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def drop_cached_student_profile(sender, instance, **kwargs):
+    invalidate_role_profile(ROLE_STUDENT, instance.user_id)
@@ -1,3 +1,220 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from faculty_app.models import Attendance, AttendanceSession, RollingQRToken
+from perf_testing import PerformanceContractMixin, clear_caches, seed_campus
+
+from .admission import AdmissionController, Overloaded, face_admission
+from .face_stub import STUB_EMBEDDING, stub_capture_b64
+
+
+@override_settings(
+    RATELIMIT_ENABLE=False, FACE_INFERENCE_STUB_MS=0, SESSION_ENGINE=settings.SESSION_BACKENDS["cached_db"]
+)
+class StudentViewPerformanceTests(PerformanceContractMixin, TestCase):
+    """Query budgets (and opt-in wall-time baselines) for the student views (see perf_testing.py)."""
+
+    perf_prefix = "student"
+
+    @classmethod
+    def setUpTestData(cls):
+        campus = seed_campus()
+        cls.student = campus["student"]
+        cls.student.face_embedding = STUB_EMBEDDING
+        cls.student.save(update_fields=["face_embedding"])
+        classroom = campus["classes"][0]
+        cls.session = AttendanceSession.objects.create(classroom=classroom, teacher=campus["teacher"])
+        cls.token = RollingQRToken.objects.create(
+            session=cls.session, token="perf-token", expires_at=timezone.now() + timedelta(hours=1)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.student.user)
+
+    def post_json(self, name, payload):
+        return self.client.post(reverse(name), payload, content_type="application/json")
+
+    def assertScanAccepted(self, payload, attendance):
+        self.assertTrue(payload["success"])
+        self.assertEqual((payload["attendance_id"], payload["session_id"]), (attendance.id, self.session.id))
+        self.assertEqual(payload["section_code"], self.student.section.code)
+        self.assertEqual(attendance.status, Attendance.STATUS_PENDING_FACE)
+        self.assertEqual(attendance.scanned_token_id, self.token.id)
+
+    def test_dashboard_cold_cache(self):
+        response = self.assertPerformance(
+            "dashboard_cold", lambda: self.client.get(reverse("sdashboard")), queries=6, setup=clear_caches
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["classes"]), 3)
+        self.assertEqual(response.context["section_code"], self.student.section.code)
+
+    def test_dashboard_warm_cache(self):
+        self.client.get(reverse("sdashboard"))
+        response = self.assertPerformance("dashboard_warm", lambda: self.client.get(reverse("sdashboard")), queries=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["classes"]), 3)
+
+    def test_scan(self):
+        payload = {"token": self.token.token, "classroom_id": self.session.classroom_id}
+        response = self.assertPerformance(
+            "scan",
+            lambda: self.post_json("scanAttendanceQr", payload),
+            queries=9,
+            setup=lambda: Attendance.objects.filter(session=self.session, student=self.student).delete(),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertScanAccepted(response.json(), Attendance.objects.get(session=self.session, student=self.student))
+
+    def test_rescan_after_failed_face_check(self):
+        attendance = Attendance.objects.create(
+            session=self.session, student=self.student, status=Attendance.STATUS_FACE_FAILED
+        )
+        payload = {"token": self.token.token, "classroom_id": self.session.classroom_id}
+        response = self.assertPerformance(
+            "rescan",
+            lambda: self.post_json("scanAttendanceQr", payload),
+            queries=7,
+            setup=lambda: Attendance.objects.filter(id=attendance.id).update(status=Attendance.STATUS_FACE_FAILED),
+        )
+        self.assertEqual(response.status_code, 200)
+        attendance.refresh_from_db()
+        self.assertScanAccepted(response.json(), attendance)
+
+    def test_verify_face(self):
+        attendance = Attendance.objects.create(session=self.session, student=self.student, scanned_token=self.token)
+        payload = {"attendance_id": attendance.id, "image": stub_capture_b64()}
+        response = self.assertPerformance(
+            "verify_face",
+            lambda: self.post_json("verifyAttendanceFace", payload),
+            queries=4,
+            setup=lambda: Attendance.objects.filter(id=attendance.id).update(status=Attendance.STATUS_PENDING_FACE),
+        )
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertTrue(payload["match"])
+        self.assertEqual(payload["status"], Attendance.STATUS_PRESENT)
+        self.assertGreaterEqual(payload["score"], payload["threshold"])
+        attendance.refresh_from_db()
+        self.assertEqual(attendance.status, Attendance.STATUS_PRESENT)
+        self.assertIsNotNone(attendance.marked_at)
+
+    def test_face_admission_status(self):
+        User.objects.filter(id=self.student.user_id).update(is_staff=True)
+        response = self.assertPerformance(
+            "face_admission_status", lambda: self.client.get(reverse("faceAdmissionStatus")), queries=1
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), face_admission().snapshot())
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def hold_slot_in_thread(self, controller):
+        """Occupy one slot from another thread until the returned event is set."""
+        admitted, release = threading.Event(), threading.Event()
+
+        def hold():
+            with controller.admit():
+                admitted.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(release.set)
+        self.assertTrue(admitted.wait(5))
+        return release
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+
+    def test_sheds_when_the_queue_is_full(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait=5, initial_service_time=0.5)
+        release = self.hold_slot_in_thread(controller)
+        def queued_request():
+            with controller.admit():
+                pass
+
+        queued = threading.Thread(target=queued_request)
+        queued.start()
+        self.wait_for(lambda: controller.waiting == 1)
+
+        with self.assertRaises(Overloaded) as caught:
+            with controller.admit():
+                pass
+        # Two requests ahead of one slot at 0.5 s each.
+        self.assertEqual(caught.exception.retry_after, 1)
+
+        release.set()
+        queued.join(5)
+        snapshot = controller.snapshot()
+        self.assertEqual(
+            (snapshot["admitted"], snapshot["shed"], snapshot["active"], snapshot["queue_depth"]), (2, 1, 0, 0)
+        )
+        self.assertEqual(snapshot["peak_queue_depth"], 1)
+
+    def test_sheds_up_front_when_the_expected_wait_exceeds_max_wait(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=8, max_wait=1, initial_service_time=3.2)
+        self.hold_slot_in_thread(controller)
+        started = time.monotonic()
+        with self.assertRaises(Overloaded) as caught:
+            with controller.admit():
+                pass
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(caught.exception.retry_after, 4)
+        self.assertEqual((controller.shed, controller.waiting), (1, 0))
+
+    def test_waiting_request_times_out_after_max_wait(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait=0.1, initial_service_time=0.01)
+        self.hold_slot_in_thread(controller)
+        started = time.monotonic()
+        with self.assertRaises(Overloaded):
+            with controller.admit():
+                pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual((controller.timed_out, controller.shed, controller.waiting), (1, 0, 0))
+
+    def test_released_slot_admits_the_next_waiter(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait=5, initial_service_time=0.01)
+        release = self.hold_slot_in_thread(controller)
+        threading.Timer(0.05, release.set).start()
+        with controller.admit():
+            self.assertEqual(controller.active, 1)
+        self.assertEqual((controller.admitted, controller.timed_out), (2, 0))
+
+
+@override_settings(RATELIMIT_ENABLE=False, FACE_INFERENCE_STUB_MS=0)
+class FaceAdmissionViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        campus = seed_campus()
+        cls.student = campus["student"]
+        cls.student.face_embedding = STUB_EMBEDDING
+        cls.student.save(update_fields=["face_embedding"])
+        session = AttendanceSession.objects.create(classroom=campus["classes"][0], teacher=campus["teacher"])
+        cls.attendance = Attendance.objects.create(session=session, student=cls.student)
+
+    def test_verify_face_returns_503_with_retry_after_when_busy(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=0, max_wait=10, initial_service_time=2.5)
+        self.client.force_login(self.student.user)
+        payload = {"attendance_id": self.attendance.id, "image": stub_capture_b64()}
+        with mock.patch("student_app.views.face_admission", return_value=controller), controller.admit():
+            response = self.client.post(reverse("verifyAttendanceFace"), payload, content_type="application/json")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(response.json()["retry_after"], 3)
+        self.attendance.refresh_from_db()
+        self.assertEqual(self.attendance.status, Attendance.STATUS_PENDING_FACE)
+        self.assertIsNone(self.attendance.face_checked_at)
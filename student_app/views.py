@@ -2,14 +2,17 @@
 Student app views for registration and dashboard
 """
 from django.shortcuts import render, redirect
+from asgiref.sync import sync_to_async
 from datetime import datetime
 import secrets
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
+import asyncio
+import contextvars
 import json
 import base64
 import io
@@ -18,8 +21,16 @@ import numpy as np
 from PIL import Image
 import cv2
 import torch
+from .admission import Overloaded, face_admission, face_executor, overloaded_response
+from .face_stub import stub_face_models
 from .models import Student
-from faculty_app.models import Attendance, ClassRoom, RollingQRToken
+from sams_main.metrics import face_stage
+from sams_main.profiling import profile_thread
+from sams_main.ratelimit import ratelimit
+from faculty_app.dashboard import SCOPE_SECTION, cards_version, section_class_cards, status_signature
+from faculty_app.mail import enqueue_email
+from faculty_app.models import Attendance, RollingQRToken
+from faculty_app.timetable import SCOPE_SECTION as TIMETABLE_SECTION, annotate_cards, now_and_next_cards
 
 # Constants
 OTP_MIN = 100000
@@ -27,17 +38,6 @@ OTP_MAX = 999999
 OTP_EXPIRY_SECONDS = 300  # 5 minutes
 
 
-def _time_status(start_time, end_time, now_time):
-    # Used by dashboard cards to show quick class state labels.
-    if not start_time or not end_time:
-        return "Timing Not Set", "secondary"
-    if start_time <= now_time <= end_time:
-        return "Ongoing", "success"
-    if now_time < start_time:
-        return "Upcoming", "warning"
-    return "Completed", "secondary"
-
-
 def studentRegister(request):
     """
     Handle student registration
@@ -70,18 +70,13 @@ def studentRegister(request):
         request.session['pass'] = password
         request.session['faculty_register'] = False  # Mark as student registration
 
-        # Send OTP email (handle missing email settings gracefully)
-        try:
-            from_email = getattr(settings, 'EMAIL_HOST_USER', 'noreply@sams.local')
-            send_mail(
-                subject="Your OTP for SAMS registration",
-                message=f"Your OTP is {otp}. This OTP will expire in 5 minutes.",
-                from_email=from_email,
-                recipient_list=[mail],
-            )
-        except Exception:
-            # Email sending failed, but continue (will be caught in OTP verification)
-            pass
+        # Queue OTP email; the outbox worker (send_queued_emails) delivers it off the request path
+        enqueue_email(
+            subject="Your OTP for SAMS registration",
+            body=f"Your OTP is {otp}. This OTP will expire in 5 minutes.",
+            to_email=mail,
+            expires_in=OTP_EXPIRY_SECONDS,
+        )
 
         return redirect('otp')
 
@@ -94,48 +89,37 @@ def renderDashboard(request):
     Render student dashboard
     Requires user to be logged in and have a Student profile
     """
-    name = ""
-    face_verified = False
     classes = []
     section_code = ""
-    user = request.user
-    
-    try:
-        # Load logged-in student's profile and classes for their section only.
-        student = Student.objects.get(user=user)
-        name = student.name
-        face_verified = student.face_verified
-        if student.section:
-            section_code = student.section.code
-            now_time = timezone.localtime().time()
-            class_qs = (
-                ClassRoom.objects.filter(section=student.section, is_active=True)
-                .select_related("section", "teacher")
-                .order_by("start_time", "subject_name")
-            )
-            for class_obj in class_qs:
-                status_text, status_color = _time_status(class_obj.start_time, class_obj.end_time, now_time)
-                classes.append(
-                    {
-                        "id": class_obj.id,
-                        "subject_name": class_obj.subject_name,
-                        "section_code": class_obj.section.code,
-                        "teacher_name": class_obj.teacher.name,
-                        "start_time": class_obj.start_time,
-                        "end_time": class_obj.end_time,
-                        "status_text": status_text,
-                        "status_color": status_color,
-                    }
-                )
-
-    except Student.DoesNotExist:
+
+    # Load logged-in student's profile and classes for their section only.
+    student = request.student
+    if not student:
         return redirect('login')
 
+    name = student.name
+    face_verified = student.face_verified
+    cards_version_value = 0
+    now_class = next_class = None
+    if student.section:
+        section_code = student.section.code
+        now = timezone.localtime()
+        # Card data is cached per section; only the time-dependent badge is computed per request.
+        classes = annotate_cards(section_class_cards(student.section_id), now)
+        cards_version_value = cards_version(SCOPE_SECTION, student.section_id)
+        now_class, next_class = now_and_next_cards(classes, TIMETABLE_SECTION, student.section_id, now)
+
     context = {
         'name': name,
         'face_verified': face_verified,
         'classes': classes,
+        'now_class': now_class,
+        'next_class': next_class,
         'section_code': section_code,
+        'cards_cache_ttl': getattr(settings, 'DASHBOARD_CACHE_TTL', 3600),
+        'cards_version': cards_version_value,
+        'cards_status': status_signature(classes),
+        'section_id': student.section_id,
     }
 
     return render(request, 'student/student_dashboard.html', context)
@@ -149,6 +133,10 @@ resnet = None
 def get_face_models():
     """Load face recognition models (lazy initialization - models loaded on first use)"""
     global mtcnn, resnet
+    stub_ms = getattr(settings, "FACE_INFERENCE_STUB_MS", None)
+    if stub_ms is not None:
+        # Load testing only (see student_app/face_stub.py).
+        return stub_face_models(stub_ms)
     try:
         from facenet_pytorch import MTCNN, InceptionResnetV1
     except Exception as exc:
@@ -170,10 +158,11 @@ def register_face(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'Only POST method allowed'}, status=405)
     
+    student = request.student
+    if not student:
+        return JsonResponse({'error': 'Student profile not found'}, status=404)
+
     try:
-        user = request.user
-        student = Student.objects.get(user=user)
-        
         # Parse JSON data
         data = json.loads(request.body)
         image_b64 = data.get('image', '')
@@ -182,22 +171,22 @@ def register_face(request):
             return JsonResponse({'error': 'No image provided'}, status=400)
         
         # Decode base64 image
-        if ',' in image_b64:
-            image_b64 = image_b64.split(',')[1]
-        
-        img_data = base64.b64decode(image_b64)
-        img = Image.open(io.BytesIO(img_data))
-        img_rgb = cv2.cvtColor(np.array(img), cv2.COLOR_BGR2RGB)
-        
-        # Get face recognition models
-        mtcnn_model, resnet_model = get_face_models()
-        
-        # Extract face and generate embedding
-        face = mtcnn_model(img_rgb)
-        if face is None:
-            return JsonResponse({'error': 'No face detected. Please ensure your face is clearly visible.'}, status=400)
+        with face_stage("decode"):
+            img_rgb = _decode_base64_image(image_b64)
         
-        embedding = resnet_model(face.unsqueeze(0)).detach().cpu().numpy().flatten()
+        # Run inference only when admitted (bounded concurrency, sheds load with 503 when saturated)
+        with face_admission().admit():
+            # Get face recognition models
+            mtcnn_model, resnet_model = get_face_models()
+
+            # Extract face and generate embedding
+            with face_stage("detect"):
+                face = mtcnn_model(img_rgb)
+            if face is None:
+                return JsonResponse({'error': 'No face detected. Please ensure your face is clearly visible.'}, status=400)
+
+            with face_stage("embed"):
+                embedding = resnet_model(face.unsqueeze(0)).detach().cpu().numpy().flatten()
         
         # Convert numpy array to list for JSON storage
         embedding_list = embedding.tolist()
@@ -205,7 +194,8 @@ def register_face(request):
         # Save to Student model (database)
         student.face_embedding = embedding_list
         student.face_verified = True
-        student.save()
+        # Limit the write to face fields: the profile may come from the request cache.
+        student.save(update_fields=["face_embedding", "face_verified", "updated_at"])
         
         
         return JsonResponse({
@@ -214,8 +204,8 @@ def register_face(request):
             'face_verified': True
         })
         
-    except Student.DoesNotExist:
-        return JsonResponse({'error': 'Student profile not found'}, status=404)
+    except Overloaded as exc:
+        return overloaded_response(exc)
     except Exception as e:
         return JsonResponse({'error': f'Error processing face: {str(e)}'}, status=500)
 
@@ -239,15 +229,41 @@ def _cosine_similarity(vec1, vec2):
     return float(np.dot(a, b) / denom)
 
 
+def _record_scan(session, student, qr_token):
+    """
+    Create or reset the student's pending attendance row for the session.
+    Returns None when the student is already marked present.
+    """
+    # One attendance record per student per session (enforced by model constraint too).
+    # Read + write run as one transaction (BEGIN IMMEDIATE on SQLite, see SQLITE_TRANSACTION_MODE).
+    with transaction.atomic():
+        attendance, created = Attendance.objects.get_or_create(
+            session=session,
+            student=student,
+            defaults={
+                "status": Attendance.STATUS_PENDING_FACE,
+                "scanned_token": qr_token,
+            },
+        )
+        if not created and attendance.status == Attendance.STATUS_PRESENT:
+            return None
+
+        if not created:
+            attendance.status = Attendance.STATUS_PENDING_FACE
+            attendance.scanned_token = qr_token
+            attendance.save(update_fields=["status", "scanned_token"])
+    return attendance
+
+
 @login_required
-def scan_attendance_qr(request):
+@ratelimit("scan", "20/m")
+async def scan_attendance_qr(request):
     """Validate scanned QR token and create/update pending attendance attempt."""
     if request.method != "POST":
         return JsonResponse({"error": "Only POST method allowed"}, status=405)
 
-    try:
-        student = Student.objects.select_related("section").get(user=request.user)
-    except Student.DoesNotExist:
+    student = await request.astudent()
+    if not student:
         return JsonResponse({"error": "Student profile not found"}, status=404)
 
     if not student.section_id:
@@ -272,10 +288,10 @@ def scan_attendance_qr(request):
 
     now = timezone.now()
     # Token must be active and unexpired at scan time.
-    qr_token = (
-        RollingQRToken.objects.select_related("session__classroom")
+    qr_token = await (
+        RollingQRToken.objects.select_related("session__classroom__section")
         .filter(token=token_value, is_active=True)
-        .first()
+        .afirst()
     )
     if not qr_token:
         return JsonResponse({"error": "Invalid QR token."}, status=400)
@@ -292,22 +308,11 @@ def scan_attendance_qr(request):
     if session.classroom.section_id != student.section_id:
         return JsonResponse({"error": "You don't belong to this class."}, status=403)
 
-    # One attendance record per student per session (enforced by model constraint too).
-    attendance, created = Attendance.objects.get_or_create(
-        session=session,
-        student=student,
-        defaults={
-            "status": Attendance.STATUS_PENDING_FACE,
-            "scanned_token": qr_token,
-        },
-    )
-    if not created and attendance.status == Attendance.STATUS_PRESENT:
+    # The async ORM has no transactions: the atomic upsert runs as one sync call.
+    attendance = await sync_to_async(_record_scan)(session, student, qr_token)
+    if attendance is None:
         return JsonResponse({"error": "Attendance already marked as present for this session."}, status=400)
 
-    attendance.status = Attendance.STATUS_PENDING_FACE
-    attendance.scanned_token = qr_token
-    attendance.save(update_fields=["status", "scanned_token"])
-
     return JsonResponse(
         {
             "success": True,
@@ -320,15 +325,35 @@ def scan_attendance_qr(request):
     )
 
 
+def _live_embedding(image_b64):
+    """
+    Decode the captured frame and compute its embedding (None when no face is found).
+    Blocking and CPU-bound: async views run it on face_executor().
+    """
+    # Included in the request's profile when it is being profiled (sams_main/profiling.py).
+    with profile_thread():
+        with face_stage("decode"):
+            img_rgb = _decode_base64_image(image_b64)
+        # Admission control: wait briefly for an inference slot or fail fast with 503 + retry hint.
+        with face_admission().admit():
+            mtcnn_model, resnet_model = get_face_models()
+            with face_stage("detect"):
+                face = mtcnn_model(img_rgb)
+            if face is None:
+                return None
+            with face_stage("embed"):
+                return resnet_model(face.unsqueeze(0)).detach().cpu().numpy().flatten().tolist()
+
+
 @login_required
-def verify_attendance_face(request):
+@ratelimit("verify_face", "10/m")
+async def verify_attendance_face(request):
     """Complete attendance by matching captured face with registered embedding."""
     if request.method != "POST":
         return JsonResponse({"error": "Only POST method allowed"}, status=405)
 
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = await request.astudent()
+    if not student:
         return JsonResponse({"error": "Student profile not found"}, status=404)
 
     try:
@@ -343,20 +368,22 @@ def verify_attendance_face(request):
     if not student.face_embedding:
         return JsonResponse({"error": "No registered face embedding found for student."}, status=400)
 
-    attendance = Attendance.objects.filter(id=attendance_id, student=student).select_related("session").first()
+    attendance = await Attendance.objects.filter(id=attendance_id, student=student).select_related("session").afirst()
     if not attendance:
         return JsonResponse({"error": "Attendance record not found."}, status=404)
 
     try:
-        # Extract live embedding from captured image.
-        img_rgb = _decode_base64_image(image_b64)
-        mtcnn_model, resnet_model = get_face_models()
-        face = mtcnn_model(img_rgb)
-        if face is None:
-            return JsonResponse({"error": "No face detected. Try again."}, status=400)
-        embedding = resnet_model(face.unsqueeze(0)).detach().cpu().numpy().flatten().tolist()
+        # Inference runs off the event loop; other requests keep being served meanwhile.
+        # The request context travels along so profiling can follow the work.
+        embedding = await asyncio.get_running_loop().run_in_executor(
+            face_executor(), contextvars.copy_context().run, _live_embedding, image_b64
+        )
+    except Overloaded as exc:
+        return overloaded_response(exc)
     except Exception as exc:
         return JsonResponse({"error": f"Error processing face: {exc}"}, status=500)
+    if embedding is None:
+        return JsonResponse({"error": "No face detected. Try again."}, status=400)
 
     # Default threshold can be tuned via settings.py (FACE_MATCH_THRESHOLD).
     threshold = float(getattr(settings, "FACE_MATCH_THRESHOLD", 0.70))
@@ -368,7 +395,7 @@ def verify_attendance_face(request):
     if score >= threshold:
         attendance.status = Attendance.STATUS_PRESENT
         attendance.marked_at = now
-        attendance.save(update_fields=["face_checked_at", "face_score", "status", "marked_at"])
+        await attendance.asave(update_fields=["face_checked_at", "face_score", "status", "marked_at"])
         return JsonResponse(
             {
                 "success": True,
@@ -381,7 +408,7 @@ def verify_attendance_face(request):
         )
 
     attendance.status = Attendance.STATUS_FACE_FAILED
-    attendance.save(update_fields=["face_checked_at", "face_score", "status"])
+    await attendance.asave(update_fields=["face_checked_at", "face_score", "status"])
     return JsonResponse(
         {
             "success": True,
@@ -392,3 +419,12 @@ def verify_attendance_face(request):
             "message": "Face verification failed.",
         }
     )
+
+
+@login_required
+async def face_admission_status(request):
+    """Staff-only snapshot of this worker's face inference admission metrics."""
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({"error": "Staff access required."}, status=403)
+    return JsonResponse(face_admission().snapshot())